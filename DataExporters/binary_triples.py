@@ -0,0 +1,258 @@
+"""
+dictionary encoded binary triple files: every distinct term is stored once and the triples are a packed array of term
+ids, so loading a file needs no RDF parsing
+
+layout, all integers little endian:
+    header      magic 'RDFB', version (uint16), reserved (uint16), terms count, triples count, terms blob length (uint64)
+    offsets     terms count + 1 uint64, the start of every term in the terms blob and the blob length
+    ids         triples count * 3 uint32, the (subject, predicate, object) term ids
+    padding     up to the next multiple of 8 bytes
+    terms blob  the N-Triples forms of the terms in UTF-8, e.g. <http://...>, "text"@en, _:b1
+"""
+import mmap
+import os
+import shutil
+import struct
+import sys
+from array import array
+
+from rdflib.util import from_n3
+
+from DataExporters.ntriples_writer import ntriples_term
+from utils.compression import open_file, open_output, detect_compression
+
+MAGIC = b'RDFB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQQ')
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def write_array(arr, stream):
+    """
+    writes an array in little endian byte order
+    """
+    if sys.byteorder != 'little':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    stream.write(arr.tobytes())
+
+
+class BinaryTriplesWriter:
+    """
+    writes triples to a binary triples file. It has the interface of NTriplesWriter. The term ids and the terms are
+    appended to two temporary files next to the output as the batches arrive, only the term dictionary is kept in
+    memory, and both are copied after the header and the term offsets when the writer is closed
+    """
+
+    def __init__(self, filepath, compression=None, compression_level=None):
+        """
+        :param filepath: the output file path
+        :param compression: one of utils.compression.Compressions.output_codecs or None. Compressed files cannot be
+        memory mapped by the reader
+        :param compression_level: the compression level. Default the codec's default level
+        """
+        self.filepath = filepath
+        self.compression = compression
+        self.compression_level = compression_level
+        self.ids_file = open(filepath + '.ids.tmp', 'wb')
+        self.terms_file = open(filepath + '.terms.tmp', 'wb')
+        self.term_ids = {}
+        self.offsets = array('Q', [0])
+        self.triples_count = 0
+        self.skipped_count = 0
+
+    def write(self, triples):
+        """
+        appends the triples' term ids, adding their new terms to the dictionary
+        :param triples: list of RDFTriple objects
+        :return: the number of triples written
+        """
+        ids = array('I')
+        new_terms = []
+
+        for triple in triples:
+            triple_ids = []
+
+            for node in (triple.subject, triple.predicate, triple.object):
+                term = ntriples_term(node)
+                if term is None:
+                    break
+
+                idx = self.term_ids.get(term)
+                if idx is None:
+                    idx = len(self.term_ids)
+                    self.term_ids[term] = idx
+                    encoded = term.encode('utf-8', 'surrogatepass')
+                    new_terms.append(encoded)
+                    self.offsets.append(self.offsets[-1] + len(encoded))
+                triple_ids.append(idx)
+
+            if len(triple_ids) == 3:
+                ids.extend(triple_ids)
+            else:
+                self.skipped_count += 1
+                print('skipping triple with a term that cannot be serialized {}'.format(triple))
+
+        write_array(ids, self.ids_file)
+        self.terms_file.write(b''.join(new_terms))
+        self.triples_count += len(ids) // 3
+
+        return len(ids) // 3
+
+    def close(self):
+        """
+        assembles the output file and removes the temporary files
+        :return: None
+        """
+        self.ids_file.close()
+        self.terms_file.close()
+        stream, compressed_writer = open_output(self.filepath, 'wb', self.compression, self.compression_level)
+
+        try:
+            stream.write(HEADER.pack(MAGIC, VERSION, 0, len(self.term_ids), self.triples_count, self.offsets[-1]))
+            write_array(self.offsets, stream)
+            for name in (self.filepath + '.ids.tmp', self.filepath + '.terms.tmp'):
+                with open(name, 'rb') as f:
+                    shutil.copyfileobj(f, stream, COPY_BUFFER_SIZE)
+                if name.endswith('.ids.tmp'):
+                    stream.write(b'\0' * (-self.triples_count * 3 * 4 % 8))
+        finally:
+            stream.close()
+            if compressed_writer is not None:
+                compressed_writer.wait()
+            os.remove(self.filepath + '.ids.tmp')
+            os.remove(self.filepath + '.terms.tmp')
+
+        self.term_ids = {}
+
+
+class BinaryTriplesReader:
+    """
+    reads a binary triples file. Uncompressed files are memory mapped so opening a file costs nothing whatever its size,
+    compressed files are decompressed into memory
+    """
+
+    def __init__(self, filepath):
+        """
+        :param filepath: the binary triples file path
+        """
+        self.file = None
+        self.mmap = None
+
+        if detect_compression(filepath) is None:
+            self.file = open(filepath, 'rb')
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buffer = memoryview(self.mmap)
+        else:
+            with open_file(filepath, 'rb') as f:
+                self.buffer = memoryview(f.read())
+
+        magic, version, _, self.terms_count, self.triples_count, blob_length = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('{} is not a binary triples file'.format(filepath))
+
+        offset = HEADER.size
+        self.offsets = self.__get_array('Q', offset, self.terms_count + 1)
+        offset += (self.terms_count + 1) * 8
+        self.ids = self.__get_array('I', offset, self.triples_count * 3)
+        offset += self.triples_count * 3 * 4
+        offset += -offset % 8
+        self.blob = self.buffer[offset:offset + blob_length]
+
+    def __len__(self):
+        return self.triples_count
+
+    def get_term(self, term_id):
+        """
+        :param term_id: the term id
+        :return: the N-Triples form of the term
+        """
+        return str(self.blob[self.offsets[term_id]:self.offsets[term_id + 1]], 'utf-8', 'surrogatepass')
+
+    def get_terms(self):
+        """
+        :return: list of the N-Triples forms of all the terms, indexed by term id
+        """
+        blob = str(self.blob, 'utf-8', 'surrogatepass')
+        if len(blob) == self.blob.nbytes:
+            # the byte offsets of an ascii blob are its character offsets
+            return [blob[self.offsets[i]:self.offsets[i + 1]] for i in range(self.terms_count)]
+        return [self.get_term(i) for i in range(self.terms_count)]
+
+    def triple_ids(self):
+        """
+        :return: generator of (subject id, predicate id, object id) tuples
+        """
+        ids = self.ids
+        return ((ids[i], ids[i + 1], ids[i + 2]) for i in range(0, len(ids), 3))
+
+    def triples(self):
+        """
+        :return: generator of (subject, predicate, object) rdflib node tuples
+        """
+        nodes = [from_n3(term) for term in self.get_terms()]
+        return ((nodes[s], nodes[p], nodes[o]) for s, p, o in self.triple_ids())
+
+    def ntriples_lines(self):
+        """
+        :return: generator of N-Triples lines
+        """
+        terms = self.get_terms()
+        return ('{} {} {} .\n'.format(terms[s], terms[p], terms[o]) for s, p, o in self.triple_ids())
+
+    def close(self):
+        for view in ('offsets', 'ids', 'blob', 'buffer'):
+            if isinstance(getattr(self, view, None), memoryview):
+                getattr(self, view).release()
+        if self.mmap is not None:
+            self.mmap.close()
+        if self.file is not None:
+            self.file.close()
+
+    def __get_array(self, typecode, offset, count):
+        size = array(typecode).itemsize
+        view = self.buffer[offset:offset + count * size]
+
+        if sys.byteorder != 'little':
+            swapped = array(typecode, view.tobytes())
+            swapped.byteswap()
+            return swapped
+        return view.cast(typecode)
+
+
+def convert_to_ntriples(input_files, output_file, compression=None, compression_level=None, batch_size=100000):
+    """
+    converts binary triples files into a single N-Triples file
+    :param input_files: list of binary triples file paths
+    :param output_file: the N-Triples file path
+    :param compression: compress the output with one of Compressions.output_codecs. Default guessed from the output
+    file extension
+    :param compression_level: the compression level
+    :param batch_size: the number of lines written at once
+    :return: the number of triples written
+    """
+    compression = compression if compression is not None else detect_compression(output_file)
+    stream, compressed_writer = open_output(output_file, 'wb', compression, compression_level)
+    triples_count = 0
+
+    try:
+        for filepath in input_files:
+            reader = BinaryTriplesReader(filepath)
+            try:
+                lines = []
+                for line in reader.ntriples_lines():
+                    lines.append(line)
+                    if len(lines) == batch_size:
+                        stream.write(''.join(lines).encode('utf-8', 'surrogatepass'))
+                        lines = []
+                stream.write(''.join(lines).encode('utf-8', 'surrogatepass'))
+                triples_count += len(reader)
+            finally:
+                reader.close()
+    finally:
+        stream.close()
+        if compressed_writer is not None:
+            compressed_writer.wait()
+
+    return triples_count
@@ -2,19 +2,28 @@
 stores triples into rdf graphs and exports them in multiple formats
 """
 
+import glob
 import multiprocessing as mp
 import os
 import pickle
+import resource
 import time
 
+from DataExporters.binary_triples import BinaryTriplesWriter
+from DataExporters.graph_store import GraphStore
+from DataExporters.ntriples_writer import NTriplesWriter
+from DataExporters.sparql_sink import SparqlSink
 from DataTransformers.Entity import *
-from manager.transformation_metrics import ExportationBatchInfo, TimeStampMessage
+from DataTransformers.triple_codec import TripleBatchCodec, EncodedNTriples
+from manager.transformation_metrics import ExportationBatchInfo, TimeStampMessage, SerializationInfo, GraphStoreInfo
+from utils.compression import open_output
 from utils.convenience import vectorize_object, create_directory
 
 
 class RDFExportFormats:
     """
     'xml', 'n3', 'turtle', 'nt', 'pretty-xml', 'trix', 'trig' and 'nquads' are supported by rdflib
+    'rdfb' is the dictionary encoded binary format of DataExporters.binary_triples
     """
     Turtle = 'turtle'
     XML = 'xml'
@@ -24,13 +33,24 @@ class RDFExportFormats:
     TRIX = 'trix'
     TRIG = 'trig'
     NQUADS = 'nquads'
+    BINARY = 'rdfb'
 
-    all_formats = [Turtle, XML, PRETTYXML, N3, NT, TRIG, TRIX, NQUADS]
+    all_formats = [Turtle, XML, PRETTYXML, N3, NT, TRIG, TRIX, NQUADS, BINARY]
+    line_based_formats = [NT, NQUADS]     # written by the NTriplesWriter without building an rdflib graph
+    streamed_formats = [NT, NQUADS, BINARY]     # written batch by batch without building an rdflib graph
 
     @staticmethod
     def is_recognized_format(format):
         return format in RDFExportFormats.all_formats
 
+    @staticmethod
+    def is_line_based_format(format):
+        return format in RDFExportFormats.line_based_formats
+
+    @staticmethod
+    def is_streamed_format(format):
+        return format in RDFExportFormats.streamed_formats
+
 
 class DataExporter:
     """
@@ -53,16 +73,41 @@ class DataExporter:
         """
         self.input_queue = input_queue if input_queue is not None else mp.Queue()
         self.stats_queue = stats_queue
-        self.filepath = manager.output_file if manager.output_file is not None else manager.graph_iden
+        self.filepath = manager.output_file if manager.output_file is not None else manager.graph_identifier
         self.graph_identifier = manager.graph_identifier
         self.export_format = manager.export_format
         self.max_graph_size = max_graph_size
-        self.graph = rdflib.Graph(store='IOMemory', identifier='Twitter')
+        # the graph is created on first use so disk graphs are opened by the process writing them
+        self.graph = None
+        self.graph_store = GraphStore(manager.graph_store, manager.graph_store_dir)
+        self.graph_triples_count = 0
+        self.serialized_graphs_count = 0
+        self.serialized_triples_count = 0
+        self.serialize_time = 0.0
         self.runner = mp.Process(target=self.run, args=(self.input_queue, self.stats_queue, ))
         self.save_counter = 0
         self.exporter_no = DataExporter.get_next_exporter_no()
         self.buffer_size = manager.buffer_size
         self.triples_buffer = []
+        self.stream_writer = None
+        self.output_compression = manager.output_compression
+        self.compression_level = manager.compression_level
+        self.pending_compressions = []
+        self.sparql_endpoint = manager.sparql_endpoint
+        self.sparql_protocol = manager.sparql_protocol
+        self.sparql_batch_size = manager.sparql_batch_size
+        self.sparql_connections = manager.sparql_connections
+        # set once a batch could not be loaded into the SPARQL endpoint, which stops committing units of work
+        self.load_failed = False
+        self.service_mode = manager.service_mode
+        # with partitioning by subject every transformer sends its triples and its control messages to every exporter
+        self.producers_count = manager.parallelism if manager.partition_by_subject else 1
+        self.received_messages = {EndMessage: 0, JobMessage: 0, ShutdownMessage: 0}
+        self.checkpoint = manager.checkpoint
+        self.checkpoint_state = None
+        self.pending_units = {}
+        self.uncommitted_chunks = []
+        self.last_checkpoint_time = time.time()
 
     def run(self, input_queue, stats_queue):
         """
@@ -72,17 +117,76 @@ class DataExporter:
         :return: None
         """
         self.stats_queue = stats_queue
-        self.__send_stats_obj(TimeStampMessage(self.exporter_no, 'exporter', 'start', time.time()))
+        self.restore_checkpoint()
+        # in service mode the job start is reported when the JobMessage arrives
+        if not self.service_mode:
+            self.__send_stats_obj(TimeStampMessage(self.exporter_no, 'exporter', 'start', time.time()))
 
         while True:
-            message = pickle.loads(input_queue.get())
+            payload = input_queue.get()
+
+            if TripleBatchCodec.is_encoded(payload):
+                self.receive_encoded_triples(payload)
+                continue
+
+            start_time = time.time()
+            message = pickle.loads(payload)
 
             if type(message) is EndMessage:
-                self.finish_exportation()
-                break
+                # the exportation is over once every transformer sent its EndMessage
+                if self.count_producers_message(message):
+                    self.finish_exportation()
+                    if not self.service_mode:
+                        break
+            elif type(message) is JobMessage:
+                # the job starts on the first JobMessage since no transformer sends triples before its JobMessage
+                if self.received_messages[JobMessage] == 0:
+                    self.start_job(message.settings)
+                self.count_producers_message(message)
+            elif type(message) is ShutdownMessage:
+                if self.count_producers_message(message):
+                    break
+            elif type(message) is UnitDoneMessage:
+                self.unit_done(message.unit_no, message.position)
             else:
+                self.__send_stats_obj(SerializationInfo(self.exporter_no, 'exporter', 1, len(payload),
+                                                        time.time() - start_time))
                 self.receive_triples(message)
 
+    def start_job(self, settings):
+        """
+        points the exporter to the output of a new service mode job
+        :param settings: the job settings dictionary carried by the JobMessage
+        :return: None
+        """
+        self.filepath = settings['output_file'] if settings['output_file'] is not None \
+            else settings['graph_identifier']
+        self.graph_identifier = settings['graph_identifier']
+        self.export_format = settings['export_format']
+        self.output_compression = settings['output_compression']
+        self.save_counter = 0
+        self.stream_writer = None
+        self.load_failed = False
+        self.triples_buffer = []
+        self.reset_graph()
+        self.serialized_graphs_count = 0
+        self.serialized_triples_count = 0
+        self.serialize_time = 0.0
+        self.__send_stats_obj(TimeStampMessage(self.exporter_no, 'exporter', 'start', time.time()))
+
+    def count_producers_message(self, message):
+        """
+        counts a control message sent by every transformer connected to this exporter
+        :param message: EndMessage, JobMessage or ShutdownMessage
+        :return: True once the message was received from all of them
+        """
+        self.received_messages[type(message)] += 1
+
+        if self.received_messages[type(message)] == self.producers_count:
+            self.received_messages[type(message)] = 0
+            return True
+        return False
+
     def receive_triples(self, message):
         """
         start processing received triples
@@ -93,6 +197,24 @@ class DataExporter:
         self.triples_buffer += message
         self.save_if_needed()
 
+    def receive_encoded_triples(self, payload):
+        """
+        decodes a triples batch encoded by TripleBatchCodec. Pre-serialized N-Triples batches are appended to the output
+        file as they are while dictionary encoded batches are buffered like any other list of triples
+        :param payload: bytes
+        :return: None
+        """
+        start_time = time.time()
+        decoded = TripleBatchCodec.decode(payload)
+        self.__send_stats_obj(SerializationInfo(self.exporter_no, 'exporter', 1, len(payload), time.time() - start_time))
+
+        if type(decoded) is EncodedNTriples:
+            self.write_buffer_to_stream()
+            triples_count = self.get_stream_writer().write_text(decoded.text, decoded.triples_count)
+            self.__send_stats_obj(ExportationBatchInfo(self.exporter_no, self.save_counter, triples_count))
+        else:
+            self.receive_triples(decoded)
+
     def force_save(self, message):
         """
         bypasses the graph size limit and forces save the current graph to the disk. This is needed in the case when
@@ -103,8 +225,8 @@ class DataExporter:
         message = vectorize_object(message)
         self.triples_buffer += message
         self.save()
-        self.graph.close()
-        self.graph = rdflib.Graph(identifier=self.graph_identifier)
+        if self.stream_writer is None:
+            self.reset_graph()
 
     def finish_exportation(self):
         """
@@ -112,19 +234,121 @@ class DataExporter:
         its job and will exit
         :return: None
         """
-        self.save()
+        self.close_chunks(finished=True)
+        if self.checkpoint is not None:
+            self.commit_units()
+        self.__send_stats_obj(GraphStoreInfo(self.exporter_no, self.graph_store.store, self.serialized_graphs_count,
+                                             self.serialized_triples_count, self.serialize_time,
+                                             resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
         self.__send_stats_obj(TimeStampMessage(self.exporter_no, 'exporter', 'end', time.time()))
         self.__send_stats_obj(EndMessage('END'))
 
+    def close_chunks(self, finished=False):
+        """
+        saves the buffered triples and closes the open output chunk file so all the triples received so far are in
+        complete files. A SPARQL sink is only drained until the exportation is finished so its connections stay open
+        between checkpoints
+        :param finished: the exportation is finished
+        :return: None
+        """
+        self.save()
+        if type(self.stream_writer) is SparqlSink and not finished:
+            self.stream_writer.drain()
+            self.load_failed = self.load_failed or self.stream_writer.failed_count > 0
+        elif self.stream_writer is not None:
+            self.stream_writer.close()
+            if self.stream_writer.skipped_count > 0:
+                self.__send_stats_obj(SerializationInfo(self.exporter_no, 'exporter', 0, 0, 0.0,
+                                                        self.stream_writer.skipped_count))
+            if type(self.stream_writer) is SparqlSink:
+                self.load_failed = self.load_failed or self.stream_writer.failed_count > 0
+                self.__send_stats_obj(self.stream_writer.get_info(self.exporter_no))
+            self.stream_writer = None
+        self.wait_for_compressions()
+
+    def restore_checkpoint(self):
+        """
+        continues the chunk file numbering after the last chunk file committed by this exporter in the checkpoint of
+        a resumed run. The state is written back right away so a later resume knows this exporter may have written
+        chunk files
+        :return: None
+        """
+        if self.checkpoint is None:
+            return
+
+        self.checkpoint_state = self.checkpoint.get_exporter_state(self.exporter_no)
+        self.save_counter = self.checkpoint_state['save_counter']
+        self.checkpoint.save_exporter_state(self.checkpoint_state)
+
+    def unit_done(self, unit_no, position):
+        """
+        all the triples of a unit of work were received. The pending units are committed at most every checkpoint
+        interval, which closes the current chunk file so the next triples go to a new one
+        :param unit_no: the sequence number of the unit of work
+        :param position: the input position of the unit of work
+        :return: None
+        """
+        self.pending_units[unit_no] = position
+
+        if time.time() - self.last_checkpoint_time >= self.checkpoint.interval:
+            self.close_chunks()
+            self.commit_units()
+
+    def commit_units(self):
+        """
+        commits the pending units of work and the closed chunk files holding their triples to the checkpoint. The
+        chunks have to be closed before. Nothing is committed any more once a batch failed to load into the SPARQL
+        endpoint, so a resumed run sends all the units of work that may have lost triples again
+        :return: None
+        """
+        if self.load_failed:
+            print('exporter {} does not commit {} units of work, some triples could not be loaded into {}'.format(
+                self.exporter_no, len(self.pending_units), self.sparql_endpoint))
+            self.pending_units = {}
+            self.uncommitted_chunks = []
+            self.last_checkpoint_time = time.time()
+            return
+
+        self.checkpoint_state['units'].update(self.pending_units)
+        self.checkpoint_state['chunks'] += self.uncommitted_chunks
+        self.checkpoint_state['save_counter'] = self.save_counter
+        self.checkpoint.save_exporter_state(self.checkpoint_state)
+        print('exporter {} committed {} units of work'.format(self.exporter_no, len(self.pending_units)))
+
+        self.pending_units = {}
+        self.uncommitted_chunks = []
+        self.last_checkpoint_time = time.time()
+
     def flush_buffer_to_graph(self):
         """
         flushes the records buffer to the rdflib.Graph object and resets the triples buffer
         :return:
         """
+        graph = self.get_graph()
         for triple in self.triples_buffer:
-            self.graph.add(triple.to_tuple())
+            graph.add(triple.to_tuple())
+        self.graph_triples_count += len(self.triples_buffer)
         self.triples_buffer = []
 
+    def get_graph(self):
+        """
+        returns the graph accumulating the triples of the next output file, creating it in the exporter's graph store
+        :return: rdflib.Graph
+        """
+        if self.graph is None:
+            self.graph = self.graph_store.new_graph(self.graph_identifier)
+        return self.graph
+
+    def reset_graph(self):
+        """
+        drops the current graph, removing its files if it is on disk
+        :return: None
+        """
+        if self.graph is not None:
+            self.graph_store.destroy_graph(self.graph)
+            self.graph = None
+        self.graph_triples_count = 0
+
     def start(self):
         """
         starts the exporter process if inline_exporters flag is disabled
@@ -139,24 +363,108 @@ class DataExporter:
         :param export_format: the exportation format as defined in RDFExportFormats
         :return: None
         """
+        exp_format = export_format if export_format is not None else self.export_format
+
+        if RDFExportFormats.is_streamed_format(exp_format):
+            self.write_buffer_to_stream(filepath, exp_format)
+            return
+
         self.flush_buffer_to_graph()
+        graph_size = len(self.graph)
 
-        if len(self.graph) > 0:
+        if graph_size > 0:
             fp = filepath if filepath is not None else self.filepath
             create_directory(fp)
             fp = self.get_next_filename(fp)
-            exp_format = export_format if export_format is not None else self.export_format
 
-            print('saving {} triples to {}'.format(len(self.graph), fp))
+            print('saving {} triples to {}'.format(graph_size, fp))
 
             try:
-                self.graph.serialize(fp, exp_format)
-                self.__send_stats_obj(ExportationBatchInfo(self.exporter_no, self.save_counter, len(self.graph)))
-                self.graph.close()
-                self.graph = rdflib.Graph(identifier=self.graph_identifier)
+                start_time = time.time()
+                if self.output_compression is None:
+                    self.graph.serialize(fp, exp_format)
+                else:
+                    self.serialize_compressed(fp, exp_format)
+                self.serialize_time += time.time() - start_time
+                self.serialized_graphs_count += 1
+                self.serialized_triples_count += graph_size
+                self.__send_stats_obj(ExportationBatchInfo(self.exporter_no, self.save_counter, graph_size))
+                self.reset_graph()
             except Exception as ex:
                 print(str(ex))
 
+    def serialize_compressed(self, filepath, export_format):
+        """
+        serializes the graph into a compressed file. The compression runs on a background thread that keeps going after
+        this method returns so it overlaps with accumulating the next graph. Only the previous file's compression is
+        waited for, which bounds the memory held by pending compressions
+        :param filepath: the compressed file path
+        :param export_format: the exportation format as defined in RDFExportFormats
+        :return: None
+        """
+        self.wait_for_compressions()
+        stream, compressed_writer = open_output(filepath, 'wb', self.output_compression, self.compression_level)
+        self.graph.serialize(stream, export_format)
+        stream.close()
+        self.pending_compressions.append(compressed_writer)
+
+    def wait_for_compressions(self):
+        """
+        blocks until the background compression of the previously saved files is done
+        :return: None
+        """
+        while len(self.pending_compressions) > 0:
+            self.pending_compressions.pop(0).wait()
+
+    def write_buffer_to_stream(self, filepath=None, export_format=None):
+        """
+        appends the triples buffer to the exporter's N-Triples/N-Quads/binary output file. The file is opened on the
+        first write and stays open until the exportation finishes so all triples of this exporter go to a single file
+        :param filepath: the exportation file path
+        :param export_format: one of RDFExportFormats.streamed_formats
+        :return: None
+        """
+        if len(self.triples_buffer) == 0:
+            return
+
+        self.get_stream_writer(filepath, export_format)
+
+        try:
+            triples_count = self.stream_writer.write(self.triples_buffer)
+            self.__send_stats_obj(ExportationBatchInfo(self.exporter_no, self.save_counter, triples_count))
+        except Exception as ex:
+            print(str(ex))
+
+        self.triples_buffer = []
+
+    def get_stream_writer(self, filepath=None, export_format=None):
+        """
+        returns the exporter's NTriplesWriter, or BinaryTriplesWriter for the binary format, opening the next output
+        file on the first call. With a SPARQL endpoint the triples are sent to the endpoint by a SparqlSink instead
+        :param filepath: the exportation file path
+        :param export_format: one of RDFExportFormats.streamed_formats
+        :return: NTriplesWriter, BinaryTriplesWriter or SparqlSink
+        """
+        if self.stream_writer is None and self.sparql_endpoint is not None:
+            print('loading triples into {}'.format(self.sparql_endpoint))
+            self.stream_writer = SparqlSink(self.sparql_endpoint, self.graph_identifier, self.sparql_protocol,
+                                            self.sparql_batch_size, self.sparql_connections)
+        elif self.stream_writer is None:
+            fp = filepath if filepath is not None else self.filepath
+            exp_format = export_format if export_format is not None else self.export_format
+            create_directory(fp)
+            fp = self.get_next_filename(fp)
+            graph_identifier = self.graph_identifier if exp_format == RDFExportFormats.NQUADS else None
+            print('streaming triples to {}'.format(fp))
+            if exp_format == RDFExportFormats.BINARY:
+                self.stream_writer = BinaryTriplesWriter(fp, compression=self.output_compression,
+                                                         compression_level=self.compression_level)
+            else:
+                self.stream_writer = NTriplesWriter(fp, graph_identifier, compression=self.output_compression,
+                                                    compression_level=self.compression_level)
+
+        return self.stream_writer
+
     def save_if_needed(self, filepath=None, export_format=None):
         """
         if the graph size goes beyond the save threshold (GRAPH_MAX_SIZE), this methods spills the graph to disk and
@@ -165,30 +473,70 @@ class DataExporter:
         :param export_format: the exportation format as defined in RDFExportFormats
         :return: None
         """
-        if len(self.triples_buffer) > self.max_graph_size:
+        exp_format = export_format if export_format is not None else self.export_format
+
+        # disk graphs take the buffered triples right away so only the graph grows up to max_graph_size
+        if self.graph_store.is_on_disk() and not RDFExportFormats.is_streamed_format(exp_format) and \
+                len(self.triples_buffer) >= self.buffer_size:
+            self.flush_buffer_to_graph()
+
+        if len(self.triples_buffer) + self.graph_triples_count > self.max_graph_size:
             self.save(filepath, export_format)
 
     def get_next_filename(self, filepath=None):
         """
         since the graph is saved in batches, this method, whenever called, returns sequential file names based on the
-        passed export file path
+        passed export file path. The compression extension is appended when the output is compressed
         :param filepath: the exportation file path
         :return: None
         """
         fp = filepath if filepath is not None else self.filepath
-        directory = os.path.dirname(fp)
-        basename = os.path.basename(fp)
         self.save_counter += 1
+        filename = DataExporter.get_chunk_filename(fp, self.exporter_no, self.save_counter, self.export_format,
+                                                   self.output_compression)
+
+        if self.checkpoint is not None:
+            self.uncommitted_chunks.append(filename)
+
+        return filename
+
+    @staticmethod
+    def get_chunk_files(filepath, export_format, output_compression=None):
+        """
+        finds the output chunk files written by all the exporters
+        :param filepath: the exportation file path
+        :param export_format: the exportation format as defined in RDFExportFormats
+        :param output_compression: one of Compressions.output_codecs or None
+        :return: sorted list of file paths
+        """
+        pattern = DataExporter.get_chunk_filename(filepath, '*', '*', export_format, output_compression)
+        return sorted(glob.glob(pattern))
+
+    @staticmethod
+    def get_chunk_filename(filepath, exporter_no, save_counter, export_format, output_compression=None):
+        """
+        the name of an exporter's output chunk file
+        :param filepath: the exportation file path
+        :param exporter_no: the exporter number
+        :param save_counter: the sequence number of the chunk file
+        :param export_format: the exportation format as defined in RDFExportFormats
+        :param output_compression: one of Compressions.output_codecs or None
+        :return: the chunk file path
+        """
+        directory = os.path.dirname(filepath)
+        basename = os.path.basename(filepath)
 
         directory = directory + '/' if len(directory) > 0 and not directory.endswith('/') else directory
+        compression_ext = '.' + output_compression if output_compression is not None else ''
 
         if '.' in basename:
             filename = '.'.join(basename.split('.')[:-1])
             extension = basename.split('.')[-1]
-            return '{}{}/{}_{}_{}.{}'.format(directory, basename, filename, self.exporter_no, self.save_counter, extension)
+            return '{}{}/{}_{}_{}.{}{}'.format(directory, basename, filename, exporter_no, save_counter,
+                                               extension, compression_ext)
         else:
             filename = basename
-            return '{}{}_{}.{}'.format(directory, filename, self.save_counter, self.export_format)
+            return '{}{}_{}.{}{}'.format(directory, filename, save_counter, export_format, compression_ext)
 
     def __send_stats_obj(self, stats_obj):
         self.stats_queue.put(pickle.dumps(stats_obj))
@@ -0,0 +1,219 @@
+"""
+rdflib stores holding the exporters' graphs between saves, in memory or on disk
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import rdflib
+from rdflib.store import Store, VALID_STORE
+
+# rows inserted into the sqlite store at once
+SQLITE_INSERT_BATCH = 10000
+# the sqlite page cache of every graph in KB, which bounds the memory of a disk graph
+SQLITE_CACHE_SIZE = 64 * 1024
+
+
+class GraphStores:
+    """
+    Memory: rdflib's IOMemory store
+    SQLite: a sqlite database in a temporary directory, built on the standard library
+    Sleepycat: rdflib's Berkeley DB store, needs the bsddb3 package
+    """
+    Memory = 'memory'
+    SQLite = 'sqlite'
+    Sleepycat = 'sleepycat'
+
+    all_stores = [Memory, SQLite, Sleepycat]
+
+    @staticmethod
+    def resolve(store):
+        """
+        checks that the store's dependencies are installed
+        :param store: one of GraphStores or None for Memory
+        :return: the requested store, or SQLite if Sleepycat is requested but bsddb3 is not installed
+        """
+        if store is None:
+            return GraphStores.Memory
+
+        if store == GraphStores.Sleepycat:
+            from rdflib.plugins.sleepycat import has_bsddb
+            if not has_bsddb:
+                print('the {} graph store needs bsddb3, falling back to {}'.format(store, GraphStores.SQLite))
+                return GraphStores.SQLite
+
+        if store not in GraphStores.all_stores:
+            print('{} graph store is not supported, use one of {}'.format(store, GraphStores.all_stores))
+            return GraphStores.Memory
+
+        return store
+
+
+def encode_term(term):
+    if isinstance(term, rdflib.Literal):
+        return 'L{}\x1f{}\x1f{}'.format(term.datatype or '', term.language or '', term)
+    if isinstance(term, rdflib.BNode):
+        return 'B' + term
+    return 'U' + term
+
+
+def decode_term(text):
+    if text[0] == 'L':
+        datatype, language, value = text[1:].split('\x1f', 2)
+        return rdflib.Literal(value, lang=language or None, datatype=datatype or None)
+    if text[0] == 'B':
+        return rdflib.BNode(text[1:])
+    return rdflib.URIRef(text[1:])
+
+
+class SQLiteStore(Store):
+    """
+    a triples only rdflib store in a sqlite database. Added triples are inserted in batches and the database runs
+    without a journal, it only lives until its graph is serialized
+    """
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        self.connection = None
+        self.path = None
+        self.pending = []
+        self.namespace_prefixes = {}
+        self.prefix_namespaces = {}
+        super().__init__(configuration, identifier)
+
+    def open(self, configuration, create=False):
+        """
+        :param configuration: the directory holding the database file
+        :param create: create the database if it does not exist
+        :return: VALID_STORE
+        """
+        self.path = os.path.join(configuration, 'graph.sqlite')
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode = OFF')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.execute('PRAGMA cache_size = -{}'.format(SQLITE_CACHE_SIZE))
+        if create:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS triples (s TEXT, p TEXT, o TEXT, '
+                                    'PRIMARY KEY (s, p, o)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS triples_o ON triples (o)')
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction=False):
+        if self.connection is not None:
+            self.__flush()
+            self.connection.close()
+            self.connection = None
+
+    def destroy(self, configuration):
+        self.close()
+        if os.path.exists(os.path.join(configuration, 'graph.sqlite')):
+            os.remove(os.path.join(configuration, 'graph.sqlite'))
+
+    def add(self, triple, context, quoted=False):
+        self.pending.append((encode_term(triple[0]), encode_term(triple[1]), encode_term(triple[2])))
+
+        if len(self.pending) >= SQLITE_INSERT_BATCH:
+            self.__flush()
+
+    def addN(self, quads):
+        for s, p, o, context in quads:
+            self.add((s, p, o), context)
+
+    def remove(self, triple_pattern, context=None):
+        self.__flush()
+        where, params = SQLiteStore.__get_conditions(triple_pattern)
+        self.connection.execute('DELETE FROM triples' + where, params)
+
+    def triples(self, triple_pattern, context=None):
+        self.__flush()
+        where, params = SQLiteStore.__get_conditions(triple_pattern)
+
+        for s, p, o in self.connection.execute('SELECT s, p, o FROM triples' + where, params):
+            yield (decode_term(s), decode_term(p), decode_term(o)), iter(())
+
+    def __len__(self, context=None):
+        self.__flush()
+        return self.connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+
+    def bind(self, prefix, namespace):
+        self.prefix_namespaces[prefix] = namespace
+        self.namespace_prefixes[namespace] = prefix
+
+    def namespace(self, prefix):
+        return self.prefix_namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        return self.namespace_prefixes.get(namespace)
+
+    def namespaces(self):
+        for prefix, namespace in self.prefix_namespaces.items():
+            yield prefix, namespace
+
+    def __flush(self):
+        if len(self.pending) == 0:
+            return
+
+        self.connection.execute('BEGIN')
+        self.connection.executemany('INSERT OR IGNORE INTO triples VALUES (?, ?, ?)', self.pending)
+        self.connection.execute('COMMIT')
+        self.pending = []
+
+    @staticmethod
+    def __get_conditions(triple_pattern):
+        columns = [(column, encode_term(term)) for column, term in zip(('s', 'p', 'o'), triple_pattern)
+                   if term is not None]
+        where = ' WHERE ' + ' AND '.join(['{} = ?'.format(column) for column, _ in columns]) if columns else ''
+
+        return where, [value for _, value in columns]
+
+
+class GraphStore:
+    """
+    creates the graphs an exporter accumulates triples in. Disk graphs live in their own temporary directory, removed
+    when the graph is destroyed after it was serialized
+    """
+
+    def __init__(self, store=GraphStores.Memory, directory=None):
+        """
+        :param store: one of GraphStores
+        :param directory: the directory of the disk graphs' temporary directories. Default the system temp directory
+        """
+        self.store = store
+        self.directory = directory
+        self.paths = {}
+
+    def is_on_disk(self):
+        return self.store != GraphStores.Memory
+
+    def new_graph(self, identifier):
+        """
+        :param identifier: the graph identifier
+        :return: an empty rdflib.Graph
+        """
+        if not self.is_on_disk():
+            return rdflib.Graph(store='IOMemory', identifier=identifier)
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        path = tempfile.mkdtemp(prefix='graph_', dir=self.directory)
+        graph = rdflib.Graph(store=SQLiteStore() if self.store == GraphStores.SQLite else 'Sleepycat',
+                             identifier=identifier)
+        graph.open(path, create=True)
+        self.paths[id(graph)] = path
+
+        return graph
+
+    def destroy_graph(self, graph):
+        """
+        closes the graph and removes its files
+        :param graph: rdflib.Graph created by new_graph
+        :return: None
+        """
+        graph.close()
+        path = self.paths.pop(id(graph), None)
+        if path is not None:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,179 @@
+"""
+merges the N-Triples/N-Quads output files of the exporters into a single sorted file without duplicates
+"""
+import heapq
+import itertools
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+
+from utils.compression import open_file, open_output, detect_compression
+
+SORT_MEMORY_BUDGET = 256 * 1024 * 1024
+# the maximum number of sorted runs merged at once. More runs are merged in several passes
+MAX_FAN_IN = 64
+RUN_BUFFER_SIZE = 1024 * 1024
+
+
+class SortStats:
+    """
+    the counts and timings of an external merge sort
+    """
+    def __init__(self, input_files_count=0):
+        self.input_files_count = input_files_count
+        self.input_triples = 0
+        self.output_triples = 0
+        self.runs_count = 0
+        self.merge_passes = 0
+        self.sort_time = 0.0
+        self.merge_time = 0.0
+
+    def get_duplicates_count(self):
+        return self.input_triples - self.output_triples
+
+
+def sort_file(filepath, runs_prefix, memory_budget):
+    """
+    splits an N-Triples file into sorted runs without duplicates. Every run holds up to memory_budget bytes of lines
+    :param filepath: the (possibly compressed) N-Triples file
+    :param runs_prefix: the path prefix of the run files
+    :param memory_budget: the bytes of lines sorted in memory at a time
+    :return: tuple(list of run file paths, number of lines read)
+    """
+    runs = []
+    lines_count = 0
+
+    with open_file(filepath, 'rb') as f:
+        while True:
+            lines = f.readlines(memory_budget)
+            if len(lines) == 0:
+                break
+
+            if not lines[-1].endswith(b'\n'):
+                lines[-1] += b'\n'
+            lines.sort()
+
+            # blank lines sort first
+            blank_count = 0
+            while blank_count < len(lines) and len(lines[blank_count].strip()) == 0:
+                blank_count += 1
+            lines_count += len(lines) - blank_count
+
+            run_path = '{}_{}'.format(runs_prefix, len(runs))
+            with open(run_path, 'wb', buffering=RUN_BUFFER_SIZE) as run:
+                write_unique(itertools.islice(lines, blank_count, None), run)
+            runs.append(run_path)
+
+    return runs, lines_count
+
+
+def merge_files(input_paths, output_path, compression=None, level=None):
+    """
+    k-way merge of sorted files into a sorted file without duplicates
+    :param input_paths: the sorted files
+    :param output_path: the merged file
+    :param compression: compress the merged file with one of Compressions.output_codecs
+    :param level: the compression level
+    :return: the number of lines written
+    """
+    inputs = [open(path, 'rb', buffering=RUN_BUFFER_SIZE) for path in input_paths]
+    stream, compressed_writer = open_output(output_path, 'wb', compression, level)
+
+    try:
+        lines_count = write_unique(heapq.merge(*inputs), stream)
+    finally:
+        for f in inputs:
+            f.close()
+        stream.close()
+        if compressed_writer is not None:
+            compressed_writer.wait()
+
+    return lines_count
+
+
+def write_unique(sorted_lines, stream):
+    """
+    writes the sorted lines skipping the repeated ones
+    :param sorted_lines: iterable of sorted lines as bytes
+    :param stream: binary file object
+    :return: the number of lines written
+    """
+    previous = None
+    lines_count = 0
+
+    for line in sorted_lines:
+        if line != previous:
+            stream.write(line)
+            previous = line
+            lines_count += 1
+
+    return lines_count
+
+
+class NTriplesSorter:
+    """
+    external merge sort of N-Triples/N-Quads files under a fixed memory budget. The input files are split into sorted
+    runs in parallel, the runs are merged in parallel groups of max_fan_in runs until few enough remain, then the last
+    merge writes a single sorted file without duplicates. Lines are compared as UTF-8 bytes, the order of `LC_ALL=C sort`
+    """
+
+    def __init__(self, memory_budget=SORT_MEMORY_BUDGET, workers=1, max_fan_in=MAX_FAN_IN, temp_dir=None):
+        """
+        :param memory_budget: the bytes of lines all workers together sort in memory at a time. Python objects add
+        about 50 bytes per line on top of it
+        :param workers: the number of processes splitting and merging runs in parallel
+        :param max_fan_in: the maximum number of runs merged at once
+        :param temp_dir: the directory of the temporary runs. Default next to the output file
+        """
+        self.memory_budget = memory_budget
+        self.workers = max(workers, 1)
+        self.max_fan_in = max(max_fan_in, 2)
+        self.temp_dir = temp_dir
+
+    def sort(self, input_files, output_file, compression=None, level=None):
+        """
+        sorts the lines of the input files into the output file and removes duplicates
+        :param input_files: the N-Triples or N-Quads files, possibly compressed
+        :param output_file: the sorted file path
+        :param compression: compress the sorted file with one of Compressions.output_codecs. Default guessed from the
+        output file extension
+        :param level: the compression level
+        :return: SortStats
+        """
+        stats = SortStats(len(input_files))
+        compression = compression if compression is not None else detect_compression(output_file)
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        runs_dir = tempfile.mkdtemp(prefix='sort_runs_', dir=self.temp_dir if self.temp_dir else output_dir)
+
+        try:
+            with mp.Pool(self.workers) as pool:
+                start_time = time.time()
+                worker_budget = max(self.memory_budget // self.workers, 1)
+                sorted_files = pool.starmap(sort_file, [(path, os.path.join(runs_dir, 'run_{}'.format(i)),
+                                                         worker_budget) for i, path in enumerate(input_files)])
+                runs = [run for file_runs, _ in sorted_files for run in file_runs]
+                stats.input_triples = sum([lines_count for _, lines_count in sorted_files])
+                stats.runs_count = len(runs)
+                stats.sort_time = time.time() - start_time
+
+                start_time = time.time()
+                while len(runs) > self.max_fan_in:
+                    stats.merge_passes += 1
+                    groups = [runs[i: i + self.max_fan_in] for i in range(0, len(runs), self.max_fan_in)]
+                    merged_runs = [os.path.join(runs_dir, 'merge_{}_{}'.format(stats.merge_passes, i))
+                                   for i in range(len(groups))]
+                    pool.starmap(merge_files, zip(groups, merged_runs))
+                    for run in runs:
+                        os.remove(run)
+                    runs = merged_runs
+
+            stats.merge_passes += 1
+            stats.output_triples = merge_files(runs, output_file, compression, level)
+            stats.merge_time = time.time() - start_time
+        finally:
+            shutil.rmtree(runs_dir, ignore_errors=True)
+
+        return stats
@@ -0,0 +1,127 @@
+"""
+writes triples directly as N-Triples / N-Quads lines without building an rdflib.Graph
+"""
+import re
+
+from rdflib import BNode, Literal
+
+from utils.compression import open_output
+
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+# characters that make rdflib refuse to serialize a URI (see rdflib.term._is_valid_uri)
+INVALID_URI_CHARACTERS = re.compile('[<>" {}|\\\\^`]')
+
+
+def quote_literal(literal):
+    """
+    returns the N-Triples form of an rdflib.Literal: the escaped lexical form followed by its language tag or data type
+    :param literal: rdflib.Literal
+    :return: string
+    """
+    encoded = '"{}"'.format(literal.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+                            .replace('\r', '\\r'))
+
+    if literal.language:
+        return '{}@{}'.format(encoded, literal.language)
+    elif literal.datatype:
+        return '{}^^<{}>'.format(encoded, literal.datatype)
+    else:
+        return encoded
+
+
+def ntriples_term(node):
+    """
+    returns the N-Triples form of an rdflib node
+    :param node: rdflib.URIRef, rdflib.BNode or rdflib.Literal
+    :return: string or None if the node is a URI that cannot be written in N-Triples
+    """
+    if isinstance(node, Literal):
+        return quote_literal(node)
+    elif isinstance(node, BNode):
+        return '_:{}'.format(node)
+    elif INVALID_URI_CHARACTERS.search(node) is None:
+        return '<{}>'.format(node)
+
+
+def ntriples_line(triple, graph_term=None):
+    """
+    returns the N-Triples (or N-Quads if graph_term is passed) line of a single triple
+    :param triple: RDFTriple object
+    :param graph_term: the N-Triples form of the graph name or None
+    :return: the line string ending with a new line or None if one of the triple terms is not serializable
+    """
+    subj = ntriples_term(triple.subject)
+    pred = ntriples_term(triple.predicate)
+    obj = ntriples_term(triple.object)
+
+    if subj is None or pred is None or obj is None:
+        return None
+    elif graph_term is None:
+        return '{} {} {} .\n'.format(subj, pred, obj)
+    else:
+        return '{} {} {} {} .\n'.format(subj, pred, obj, graph_term)
+
+
+class NTriplesWriter:
+    """
+    writes triples to an N-Triples or N-Quads file through a large write buffer. Nothing is kept in memory apart from
+    the current batch so memory stays flat whatever the size of the generated graph
+    """
+
+    def __init__(self, filepath, graph_identifier=None, write_buffer_size=WRITE_BUFFER_SIZE, compression=None,
+                 compression_level=None):
+        """
+        opens the output file, truncating the file of a previous run with the same chunk name
+        :param filepath: the output file path
+        :param graph_identifier: the graph name written as the fourth term of every line. None for N-Triples
+        :param write_buffer_size: the size of the file write buffer in bytes
+        :param compression: one of utils.compression.Compressions.output_codecs to compress the file on a background
+        thread or None
+        :param compression_level: the compression level
+        """
+        self.filepath = filepath
+        self.graph_term = '<{}>'.format(graph_identifier) if graph_identifier else None
+        self.file, self.compressed_writer = open_output(filepath, 'w', compression, compression_level,
+                                                        write_buffer_size)
+        self.triples_count = 0
+        self.skipped_count = 0
+
+    def write(self, triples):
+        """
+        serializes the passed triples and appends them to the output file
+        :param triples: list of RDFTriple objects
+        :return: the number of written triples
+        """
+        lines = []
+
+        for triple in triples:
+            line = ntriples_line(triple, self.graph_term)
+            if line is not None:
+                lines.append(line)
+            else:
+                self.skipped_count += 1
+                print('skipping triple with a term that cannot be serialized {}'.format(triple))
+
+        self.file.write(''.join(lines))
+        self.triples_count += len(lines)
+
+        return len(lines)
+
+    def write_text(self, text, triples_count):
+        """
+        appends already serialized N-Triples/N-Quads lines to the output file
+        :param text: the serialized lines
+        :param triples_count: the number of triples in text
+        :return: the number of written triples
+        """
+        self.file.write(text)
+        self.triples_count += triples_count
+
+        return triples_count
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        if self.compressed_writer is not None:
+            self.compressed_writer.wait()
@@ -0,0 +1,254 @@
+"""
+loads triples into a triple store over HTTP instead of writing them to files
+"""
+import http.client
+import queue
+import threading
+import time
+import urllib.parse
+
+from DataExporters.ntriples_writer import ntriples_line
+from manager.transformation_metrics import SparqlLoadInfo
+
+BATCH_SIZE = 10000
+CONNECTIONS_COUNT = 4
+MAX_RETRIES = 3
+RETRY_DELAY = 0.5
+REQUEST_TIMEOUT = 120
+
+
+class SparqlProtocols:
+    """
+    GraphStore: POST N-Triples batches to a SPARQL 1.1 Graph Store HTTP Protocol endpoint
+    Update: POST INSERT DATA batches to a SPARQL 1.1 Update endpoint
+    """
+    GraphStore = 'gsp'
+    Update = 'update'
+
+    all_protocols = [GraphStore, Update]
+
+
+class SparqlSink:
+    """
+    sends triples to a SPARQL endpoint in batches of batch_size triples. It has the interface of NTriplesWriter so the
+    exporters stream to it the same way they stream to files. Every connection thread keeps its own keep-alive HTTP
+    connection and takes the next batch from a bounded queue, so up to connections_count requests are in flight while
+    the exporter keeps serializing and a slow endpoint blocks the exporter instead of growing memory. Failed requests
+    are retried with exponential backoff on a new connection
+    """
+
+    def __init__(self, endpoint, graph_identifier=None, protocol=SparqlProtocols.GraphStore, batch_size=BATCH_SIZE,
+                 connections_count=CONNECTIONS_COUNT, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY,
+                 timeout=REQUEST_TIMEOUT):
+        """
+        :param endpoint: the endpoint URL, e.g. http://localhost:8890/sparql-graph-crud or http://localhost:3030/ds/update
+        :param graph_identifier: the graph the triples are loaded into. Default the endpoint's default graph
+        :param protocol: one of SparqlProtocols
+        :param batch_size: the number of triples sent per request
+        :param connections_count: the number of keep-alive connections, which is also the number of requests in flight
+        :param max_retries: the number of times a failed request is sent again
+        :param retry_delay: the delay before the first retry in seconds, doubled for every following retry
+        :param timeout: the request timeout in seconds
+        """
+        url = urllib.parse.urlsplit(endpoint)
+        self.endpoint = endpoint
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.path = url.path or '/'
+        self.graph_identifier = graph_identifier
+        self.protocol = protocol
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+
+        query = [url.query] if url.query else []
+        if protocol == SparqlProtocols.GraphStore:
+            query.append(urllib.parse.urlencode({'graph': graph_identifier}) if graph_identifier else 'default')
+            self.content_type = 'application/n-triples'
+        else:
+            self.content_type = 'application/sparql-update'
+        if len(query) > 0:
+            self.path += '?' + '&'.join(query)
+
+        self.lines = []
+        self.buffered_count = 0
+        self.triples_count = 0
+        self.skipped_count = 0
+        self.requests_count = 0
+        self.sent_triples_count = 0
+        self.payload_bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.retries_count = 0
+        self.failed_count = 0
+        # the load is timed from the first request so the time the exporter waited for triples is not counted
+        self.start_time = None
+        self.elapsed_time = 0.0
+        self.stats_lock = threading.Lock()
+        self.batches = queue.Queue(connections_count)
+        self.threads = [threading.Thread(target=self.__send_batches, daemon=True) for _ in range(connections_count)]
+        self.closed = False
+
+        for thread in self.threads:
+            thread.start()
+
+    def write(self, triples):
+        """
+        serializes the passed triples and sends them once a batch is full
+        :param triples: list of RDFTriple objects
+        :return: the number of triples accepted
+        """
+        lines = []
+
+        for triple in triples:
+            line = ntriples_line(triple)
+            if line is not None:
+                lines.append(line)
+            else:
+                self.skipped_count += 1
+                print('skipping triple with a term that cannot be serialized {}'.format(triple))
+
+        return self.write_text(''.join(lines), len(lines))
+
+    def write_text(self, text, triples_count):
+        """
+        buffers already serialized N-Triples lines and sends them once a batch is full
+        :param text: the serialized lines
+        :param triples_count: the number of triples in text
+        :return: the number of triples accepted
+        """
+        self.lines.append(text)
+        self.buffered_count += triples_count
+        self.triples_count += triples_count
+
+        if self.buffered_count >= self.batch_size:
+            self.flush()
+
+        return triples_count
+
+    def flush(self):
+        """
+        queues the buffered triples as a request. Blocks while all the connections are busy and the queue is full
+        :return: None
+        """
+        if self.buffered_count == 0:
+            return
+
+        if self.start_time is None:
+            self.start_time = time.time()
+        self.batches.put((self.__build_body(''.join(self.lines)), self.buffered_count))
+        self.lines = []
+        self.buffered_count = 0
+
+    def drain(self):
+        """
+        sends the buffered triples and waits until all requests are done, keeping the connections open for the next
+        triples. After it returns failed_count tells whether all the triples written so far were loaded
+        :return: None
+        """
+        self.flush()
+        self.batches.join()
+
+    def close(self):
+        """
+        sends the buffered triples, waits until all requests are done and closes the connections
+        :return: None
+        """
+        if self.closed:
+            return
+
+        self.flush()
+        for _ in self.threads:
+            self.batches.put(None)
+        for thread in self.threads:
+            thread.join()
+
+        self.closed = True
+        self.elapsed_time = time.time() - self.start_time if self.start_time is not None else 0.0
+
+        if self.failed_count > 0:
+            print('{} batches could not be loaded into {}'.format(self.failed_count, self.endpoint))
+
+    def get_info(self, exporter_no):
+        """
+        :param exporter_no: the number of the exporter owning the sink
+        :return: SparqlLoadInfo with the requests statistics
+        """
+        return SparqlLoadInfo(exporter_no, self.requests_count, self.sent_triples_count, self.payload_bytes,
+                              self.latency_sum, self.latency_max, self.retries_count, self.failed_count,
+                              self.elapsed_time)
+
+    def __build_body(self, text):
+        if self.protocol == SparqlProtocols.Update:
+            if self.graph_identifier:
+                text = 'INSERT DATA {{ GRAPH <{}> {{\n{}}} }}'.format(self.graph_identifier, text)
+            else:
+                text = 'INSERT DATA {{\n{}}}'.format(text)
+
+        return text.encode('utf-8')
+
+    def __create_connection(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def __send_batches(self):
+        connection = self.__create_connection()
+
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                self.batches.task_done()
+                break
+
+            body, triples_count = batch
+            if not self.__send(connection, body, triples_count):
+                with self.stats_lock:
+                    self.failed_count += 1
+            self.batches.task_done()
+
+        connection.close()
+
+    def __send(self, connection, body, triples_count):
+        """
+        posts a batch, retrying on connection errors, server errors and throttling
+        :return: True if the endpoint accepted the batch
+        """
+        headers = {'Content-Type': self.content_type, 'Connection': 'keep-alive'}
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                with self.stats_lock:
+                    self.retries_count += 1
+
+            start_time = time.time()
+            try:
+                connection.request('POST', self.path, body, headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as ex:
+                print('request to {} failed: {}'.format(self.endpoint, str(ex)))
+                connection.close()
+                continue
+
+            latency = time.time() - start_time
+            with self.stats_lock:
+                self.requests_count += 1
+                self.latency_sum += latency
+                self.latency_max = max(self.latency_max, latency)
+
+            if 200 <= response.status < 300:
+                with self.stats_lock:
+                    self.sent_triples_count += triples_count
+                    self.payload_bytes += len(body)
+                return True
+
+            print('{} rejected a batch of {} triples: {} {}'.format(self.endpoint, triples_count, response.status,
+                                                                  response.reason))
+            if response.status < 500 and response.status != 429:
+                return False
+
+        return False
@@ -0,0 +1,200 @@
+import csv
+import itertools
+import os
+import re
+import time
+
+from json_object import JsonReader
+from utils.compression import ReadStats, detect_compression, open_file, strip_compression_extension
+
+READ_BLOCK_SIZE = 1024 * 1024
+BATCH_ROWS = 10000
+
+INTEGER_PATTERN = re.compile(r'-?(0|[1-9][0-9]*)$')
+FLOAT_PATTERN = re.compile(r'-?((0|[1-9][0-9]*)?\.[0-9]+|(0|[1-9][0-9]*)\.?)([eE][-+]?[0-9]+)?$')
+BOOLEANS = {'true': True, 'false': False, 'TRUE': True, 'FALSE': False, 'True': True, 'False': False}
+
+
+def coerce_value(value):
+    """
+    converts a csv cell to int, float or bool if it looks like one. Integers with leading zeros (zip codes, padded ids)
+    stay strings and empty cells become None so they produce no triple
+    :param value: the cell string
+    :return: int, float, bool, str or None
+    """
+    if value == '':
+        return None
+    elif INTEGER_PATTERN.match(value):
+        return int(value)
+    elif FLOAT_PATTERN.match(value):
+        return float(value)
+    return BOOLEANS.get(value, value)
+
+
+class CsvDataImporter:
+    """
+    This class imports the rows of a csv or tsv table into the transformation pipeline. The first row is the header and
+    every row becomes a flat dictionary keyed by the column names, so the descriptor refers to columns with key paths like
+    /column_name. Rows are read and converted in column batches of batch_rows rows
+    """
+    def __init__(self, filepath, delimiter=None, coerce_types=False, batch_rows=BATCH_ROWS):
+        """
+        :param filepath: the input file path
+        :param delimiter: the field delimiter. Default tab for .tsv files and comma otherwise
+        :param coerce_types: convert numeric and boolean cells to int, float and bool and drop empty cells. Otherwise
+        all cells are strings
+        :param batch_rows: the number of rows converted at a time
+        """
+        self.filepath = filepath
+        self.compression = detect_compression(filepath)
+        self.delimiter = delimiter if delimiter else self.__guess_delimiter(filepath)
+        self.coerce_types = coerce_types
+        self.batch_rows = batch_rows
+        self.read_stats = ReadStats(self.compression, os.path.getsize(filepath) if os.path.exists(filepath) else 0)
+        self.is_streamed = JsonReader.should_be_streamed(filepath)
+        self.header, self.data_offset = self.__read_header()
+
+    def get_records(self):
+        """
+        retrieve the rows of the input file as dictionaries
+        :return: if streamed a records generator, if not a list of all records
+        """
+        records = self.__get_records_streamed()
+        return records if self.is_streamed else list(records)
+
+    def supports_ranges(self):
+        """
+        uncompressed tables can be split into line aligned byte ranges read by the transformers. Quoted cells spanning
+        multiple lines are not supported in this mode
+        :return: True for uncompressed files
+        """
+        return self.compression is None
+
+    def get_ranges(self, ranges_count):
+        """
+        splits the rows after the header into line aligned byte ranges
+        :param ranges_count: the number of ranges
+        :return: list of tuple(start, end)
+        """
+        return JsonReader.get_line_aligned_ranges(self.filepath, ranges_count, self.data_offset)
+
+    def get_records_in_range(self, start, end):
+        """
+        reads and converts the rows of a byte range. This runs in the transformer processes
+        :param start: the range start offset
+        :param end: the range end offset
+        :return: records generator
+        """
+        with open(self.filepath, 'rb') as f:
+            f.seek(start)
+            position = start
+
+            while position < end:
+                lines = f.readlines(min(READ_BLOCK_SIZE, end - position))
+                if len(lines) == 0:
+                    break
+
+                # readlines may read one line past the hint, which belongs to the next range
+                block = []
+                for line in lines:
+                    if position >= end:
+                        break
+                    block.append(line)
+                    position += len(line)
+
+                for record in self.decode_raw_block(block):
+                    yield record
+
+    def supports_raw_blocks(self):
+        """
+        compressed tables are decompressed by the manager and parsed by the transformers in blocks of raw lines. Quoted
+        cells spanning multiple lines are not supported in this mode
+        :return: True
+        """
+        return True
+
+    def get_raw_blocks(self):
+        """
+        reads and decompresses the rows after the header in blocks of raw lines without parsing them
+        :return: generator of lists of lines as bytes
+        """
+        for i, lines in enumerate(JsonReader.get_line_blocks(self.filepath, read_stats=self.read_stats)):
+            yield lines[1:] if i == 0 else lines
+
+    def decode_raw_block(self, lines):
+        """
+        parses a block of raw lines returned by get_raw_blocks or read from a byte range
+        :param lines: list of lines as bytes
+        :return: records generator
+        """
+        rows = csv.reader([line.decode('utf-8') for line in lines], delimiter=self.delimiter)
+
+        for record in self.rows_to_records(list(rows)):
+            yield record
+
+    def rows_to_records(self, rows):
+        """
+        converts a batch of rows into records. With type coercion the batch is transposed into columns so every column is
+        converted in a single pass before the records are built
+        :param rows: list of rows as lists of cells
+        :return: list of dictionaries
+        """
+        header = self.header
+        columns_count = len(header)
+        rows = [row if len(row) == columns_count else (row + [''] * columns_count)[:columns_count]
+                for row in rows if len(row) > 0]
+
+        if len(rows) == 0:
+            return []
+
+        if self.coerce_types:
+            columns = [list(map(coerce_value, column)) for column in zip(*rows)]
+            rows = zip(*columns)
+
+        return [dict(zip(header, row)) for row in rows]
+
+    def __get_records_streamed(self):
+        lines = itertools.chain.from_iterable(self.__read_line_blocks())
+        reader = csv.reader(lines, delimiter=self.delimiter)
+        next(reader, None)  # the header
+
+        while True:
+            rows = list(itertools.islice(reader, self.batch_rows))
+            if len(rows) == 0:
+                break
+
+            for record in self.rows_to_records(rows):
+                yield record
+
+    def __read_line_blocks(self):
+        if JsonReader.check_file_exists(self.filepath):
+            with open_file(self.filepath, 'r', newline='') as f:
+                self.read_stats.track(f)
+                while True:
+                    start_time = time.time()
+                    lines = f.readlines(READ_BLOCK_SIZE)
+                    self.read_stats.read_time += time.time() - start_time
+                    self.read_stats.bytes_read += sum(len(line) for line in lines)
+
+                    if len(lines) == 0:
+                        break
+                    yield lines
+
+    def __read_header(self):
+        """
+        reads the column names from the first line of the file
+        :return: tuple(list of column names, byte offset of the first row)
+        """
+        if not JsonReader.check_file_exists(self.filepath):
+            return [], 0
+
+        with open_file(self.filepath, 'rb') as f:
+            line = f.readline()
+
+        header = next(csv.reader([line.decode('utf-8-sig')], delimiter=self.delimiter), [])
+
+        return [column.strip() for column in header], len(line)
+
+    @staticmethod
+    def __guess_delimiter(filepath):
+        return '\t' if strip_compression_extension(filepath).split('.')[-1].lower() == 'tsv' else ','
@@ -1,25 +1,109 @@
-from json_object import JsonReader
+import os
+
+from json_object import JsonReader, JsonLayouts, JsonDecoders
+from utils.compression import ReadStats, detect_compression
 
 
 class ImportFormats:
     Json = 'json'
     XML = 'xml'
+    Csv = 'csv'
+    Tsv = 'tsv'
 
 
 class JsonDataImporter:
     """
     This class imports a list of json data into the transformation pipeline
     """
-    def __init__(self, filepath):
+    def __init__(self, filepath, json_backend=None):
+        """
+        :param filepath: the input file path
+        :param json_backend: the json decoding backend as defined in JsonDecoders. Defaults to the fastest installed one
+        """
         self.filepath = filepath
+        self.compression = detect_compression(filepath)
+        self.read_stats = ReadStats(self.compression, os.path.getsize(filepath) if os.path.exists(filepath) else 0)
         self.is_streamed = JsonReader.should_be_streamed(filepath)
+        self.layout = JsonReader.get_layout(filepath)
+
+        if self.is_parsed_incrementally():
+            # the incremental parser needs raw_decode, which only the standard library json module offers
+            if json_backend not in (None, JsonDecoders.Auto, JsonDecoders.Stdlib):
+                print('json backend {} does not support {} layouts, using {}'.format(json_backend, self.layout,
+                                                                                     JsonDecoders.Stdlib))
+            json_backend = JsonDecoders.Stdlib
+        self.json_backend, self.json_decoder = JsonDecoders.get_decoder(json_backend)
+
+    def is_parsed_incrementally(self):
+        """
+        checks if the records are parsed by the incremental parser, which always decodes with the standard library json
+        module: streamed json arrays and concatenated or pretty printed objects
+        :return: True if the json backend is not used
+        """
+        return self.layout != JsonLayouts.Lines and (self.is_streamed or self.layout != JsonLayouts.Array)
 
     def get_records(self):
         """
-        retrieve the json data from an input file
+        retrieve the json data from an input file. Json lines are streamed line by line while json arrays and
+        concatenated or pretty printed objects are parsed incrementally. Compressed files are always streamed
         :return: if streamed a records generator, if not a list of all records
         """
         if self.is_streamed:
-            return JsonReader.get_as_dict_streamed(self.filepath)
+            if self.layout == JsonLayouts.Lines:
+                return JsonReader.get_as_dict_streamed(self.filepath, self.json_decoder, self.read_stats)
+            else:
+                return JsonReader.get_as_dict_incremental(self.filepath, read_stats=self.read_stats)
         else:
-            return JsonReader.get_as_object(self.filepath)
+            if self.layout == JsonLayouts.Array:
+                return JsonReader.get_as_object(self.filepath, self.json_decoder)
+            elif self.layout == JsonLayouts.Lines:
+                return list(JsonReader.get_as_dict_streamed(self.filepath, self.json_decoder))
+            else:
+                return list(JsonReader.get_as_dict_incremental(self.filepath))
+
+    def supports_ranges(self):
+        """
+        checks if the input can be split into byte ranges that transformers read and parse on their own
+        :return: True for uncompressed json lines files
+        """
+        return self.layout == JsonLayouts.Lines and self.compression is None
+
+    def supports_raw_blocks(self):
+        """
+        checks if the input can be read as blocks of raw lines that transformers parse on their own. This is how
+        compressed json lines files are ingested in parallel: the manager only decompresses
+        :return: True for json lines files
+        """
+        return self.layout == JsonLayouts.Lines
+
+    def get_raw_blocks(self):
+        """
+        reads and decompresses the input file in blocks of raw json lines without parsing them
+        :return: generator of lists of lines as bytes
+        """
+        return JsonReader.get_line_blocks(self.filepath, read_stats=self.read_stats)
+
+    def decode_raw_block(self, lines):
+        """
+        parses a block of raw json lines returned by get_raw_blocks. This runs in the transformer processes
+        :param lines: list of lines as bytes
+        :return: records generator
+        """
+        return JsonReader.decode_lines(lines, self.json_decoder)
+
+    def get_ranges(self, ranges_count):
+        """
+        splits the input file into line aligned byte ranges
+        :param ranges_count: the number of ranges
+        :return: list of tuple(start, end)
+        """
+        return JsonReader.get_line_aligned_ranges(self.filepath, ranges_count)
+
+    def get_records_in_range(self, start, end):
+        """
+        reads and parses the records of a byte range. This runs in the transformer processes
+        :param start: the range start offset
+        :param end: the range end offset
+        :return: records generator
+        """
+        return JsonReader.get_as_dict_streamed_range(self.filepath, start, end, self.json_decoder)
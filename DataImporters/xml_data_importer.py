@@ -0,0 +1,125 @@
+import os
+from xml.etree import ElementTree
+
+from json_object import JsonReader
+from utils.compression import ReadStats, TimedReader, detect_compression, open_file
+
+ATTRIBUTE_PREFIX = '@'
+TEXT_KEY = '#text'
+
+
+def local_name(tag):
+    """
+    removes the namespace of an ElementTree tag or attribute name, for example '{http://www.w3.org/2005/Atom}entry' =>
+    'entry'
+    :param tag: the tag
+    :return: the tag without its namespace
+    """
+    return tag.rsplit('}', 1)[-1] if tag[0] == '{' else tag
+
+
+def element_to_object(element, list_elements=frozenset()):
+    """
+    converts an xml element into the dictionaries and lists the key paths work on. Child elements become keys,
+    repeated children become lists, attributes become '@name' keys and the text of elements having children or attributes
+    becomes the '#text' key. Elements with text only become strings and empty elements become None
+    :param element: xml.etree.ElementTree.Element
+    :param list_elements: tags that always become lists even if the element has a single child with that tag
+    :return: dictionary, string or None
+    """
+    text = element.text.strip() if element.text is not None else ''
+
+    if len(element) == 0 and len(element.attrib) == 0:
+        return text if len(text) > 0 else None
+
+    obj = {ATTRIBUTE_PREFIX + local_name(name): value for name, value in element.attrib.items()}
+
+    for child in element:
+        tag = local_name(child.tag)
+        value = element_to_object(child, list_elements)
+        existing = obj.get(tag)
+
+        if type(existing) is list:
+            existing.append(value)
+        elif tag in obj:
+            obj[tag] = [existing, value]
+        elif tag in list_elements:
+            obj[tag] = [value]
+        else:
+            obj[tag] = value
+
+    if len(text) > 0:
+        obj[TEXT_KEY] = text
+
+    return obj
+
+
+class XmlDataImporter:
+    """
+    This class streams the records of an xml file into the transformation pipeline. The file is parsed incrementally
+    and every record element is converted to a dictionary then removed from the tree so memory stays flat whatever the
+    file size
+    """
+    def __init__(self, filepath, record_element=None, list_elements=frozenset()):
+        """
+        :param filepath: the input file path
+        :param record_element: the tag (without namespace) of the elements that are records. Default the children of
+        the root element
+        :param list_elements: tags that are always converted to lists, see element_to_object
+        """
+        self.filepath = filepath
+        self.record_element = record_element
+        self.list_elements = frozenset(list_elements)
+        self.compression = detect_compression(filepath)
+        self.read_stats = ReadStats(self.compression, os.path.getsize(filepath) if os.path.exists(filepath) else 0)
+        self.is_streamed = True
+
+    def get_records(self):
+        """
+        incrementally parses the xml file and yields the records one by one
+        :return: records generator
+        """
+        if JsonReader.check_file_exists(self.filepath):
+            with open_file(self.filepath, 'rb') as f:
+                self.read_stats.track(f)
+                try:
+                    for record in self.__parse_records(TimedReader(f, self.read_stats)):
+                        yield record
+                except ElementTree.ParseError as ex:
+                    print('failed to parse {}: {}'.format(self.filepath, str(ex)))
+
+    def supports_ranges(self):
+        return False
+
+    def supports_raw_blocks(self):
+        return False
+
+    def __parse_records(self, source):
+        ancestors = []
+        record_depth = None
+
+        for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                ancestors.append(element)
+                if record_depth is None and self.__is_record(element, len(ancestors)):
+                    record_depth = len(ancestors)
+                continue
+
+            depth = len(ancestors)
+            ancestors.pop()
+
+            if depth == record_depth:
+                record = element_to_object(element, self.list_elements)
+                yield record if type(record) is dict else {TEXT_KEY: record}
+                record_depth = None
+
+            if record_depth is None:
+                # the element and its children are processed, drop them from the tree
+                element.clear()
+                if len(ancestors) > 0:
+                    ancestors[-1].remove(element)
+
+    def __is_record(self, element, depth):
+        if self.record_element is None:
+            return depth == 2
+        return local_name(element.tag) == self.record_element
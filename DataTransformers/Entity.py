@@ -43,6 +43,66 @@ class EndMessage(Message):
     pass
 
 
+class InputRangeMessage(Message):
+    """
+    asks a transformer to read, parse and transform the records in a byte range of the input file by itself so no
+    record data has to cross the queues
+    """
+    def __init__(self, start, end):
+        Message.__init__(self, (start, end))
+        self.start = start
+        self.end = end
+
+
+class RawRecordsMessage(Message):
+    """
+    carries a block of raw, not yet parsed json lines the manager read (and decompressed) from the input file. The
+    transformer parses them itself so decompression in the manager overlaps with parsing in the transformers
+    """
+    def __init__(self, lines):
+        Message.__init__(self, lines)
+        self.lines = lines
+
+
+class JobMessage(Message):
+    """
+    starts a new transformation job on the warm workers of a service mode manager. Carries the job settings (input,
+    output, export format ...) the workers copy before processing the job's records
+    """
+    def __init__(self, settings):
+        Message.__init__(self, settings)
+        self.settings = settings
+
+
+class ShutdownMessage(Message):
+    """
+    stops the workers of a service mode manager
+    """
+    pass
+
+
+class CheckpointedUnitMessage(Message):
+    """
+    wraps a unit of work (list of records, InputRangeMessage or RawRecordsMessage) with its sequence number and input
+    position when checkpointing is enabled, so the unit can be committed once its triples are in complete output files
+    """
+    def __init__(self, unit_no, position, unit):
+        Message.__init__(self, unit)
+        self.unit_no = unit_no
+        self.position = position
+        self.unit = unit
+
+
+class UnitDoneMessage(Message):
+    """
+    tells the exporter that all the triples of a checkpointed unit of work were sent to it
+    """
+    def __init__(self, unit_no, position):
+        Message.__init__(self, (unit_no, position))
+        self.unit_no = unit_no
+        self.position = position
+
+
 class Entity:
     """
     Represents an entity created from an input record. It encapsulates all its properties and triples
@@ -58,9 +118,9 @@ class Entity:
         """
         self.name = name
         self.uri = uri
-        self.subj = self.__get_as_rdflib_node(uri)
-        self.type = en_type
         self.descriptor = descriptor
+        self.subj = descriptor.get_entity_uri_node(uri) if uri is not None else None
+        self.type = en_type
         self.triples = []
         self.add_property(RDF.type, en_type)
 
@@ -99,14 +159,10 @@ class Entity:
         :return: rdflib node
         """
         if term is not None:
-            if object_type is None or object_type == 'entity':
-                if Entity.__is_prefixed(term):
-                    prefix, iden = Entity.__get_term_components(term)
-                    ns = self.descriptor.get_namespace(prefix)
-                    if ns is not None:
-                        return ns[iden]
-                else:
-                    return rdflib.URIRef(term)
+            if object_type is None:
+                return self.descriptor.get_uri_node(term)
+            elif object_type == 'entity':
+                return self.descriptor.get_entity_uri_node(term)
             else:   # in case of literals
                 if function is not None:
                     try:
@@ -119,26 +175,4 @@ class Entity:
                                                                                                  str(function),
                                                                                                  str(ex)))
 
-                return rdflib.Literal(term, datatype=data_type)
-
-    @staticmethod
-    def __is_prefixed(term):
-        """
-        checks if the passed uri is in prefixed format or a normal URI
-        :param term: the term to check if prefixed
-        :return: True if in prefix format or False if a normal URI
-        """
-        return ':' in term and not (term.startswith('http:') or term.startswith('https:'))
-
-    @staticmethod
-    def __get_term_components(term):
-        """
-        if the term is prefixed, this method returns a tuple (prefix, term_name) else returns the same URI
-        :param term: the uri to decompose into prefix and term name if prefixed
-        :return: tuple(prefix, term_name) if prefixed else term which is a normal URI
-        """
-        if Entity.__is_prefixed(term):
-            comps = term.split(':')
-            return comps[0], comps[1]
-        else:
-            return term
+                return self.descriptor.term_cache.get_literal(term, data_type)
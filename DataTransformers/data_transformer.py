@@ -1,11 +1,14 @@
 import multiprocessing as mp
 import pickle
 import time
+import zlib
 
 from DataTransformers.Entity import *
-from descriptor import Descriptor
-from manager.transformation_metrics import TransformationBatchInfo, TimeStampMessage
-from utils.MultilevelDictionary import MultilevelDictionary
+from DataTransformers.entity_cache import DedupPolicies, SeenEntityCache
+from DataTransformers.transformation_profiler import TransformationProfiler
+from DataTransformers.triple_codec import TripleBatchCodec, WireFormats
+from manager.transformation_metrics import TransformationBatchInfo, TimeStampMessage, TermCacheInfo, \
+    SerializationInfo, SchedulingInfo, QueueDepthTracker, DedupInfo, InputProgressInfo
 from utils.convenience import vectorize_object
 
 
@@ -16,17 +19,20 @@ class DataTransformer:
 
     transformer_no = 0
 
-    def __init__(self, manager, stats_queue, out_queue=None):
+    def __init__(self, manager, stats_queue, out_queue=None, in_queue=None):
         """
         Initializes the transformer object with the TransformationManager and the input and stats queues
         :param manager: TransformationManager object that manages the whole transformation pipeline
         :param stats_queue: the statistics multiprocessing.Queue where stats messages are sent to
         :param out_queue: the multiprocessing.Queue that connects the transformer with the exporter if inline_exporters
         is False
+        :param in_queue: the multiprocessing.Queue the transformer pulls its work from. It is shared by all the
+        transformers of the manager. Default a queue of its own
         """
         self.manager = manager
         self.descriptor = manager.descriptor
-        self.in_queue = mp.Queue()
+        self.plan = self.descriptor.get_transformation_plan()
+        self.in_queue = in_queue if in_queue is not None else mp.Queue()
         self.out_queue = out_queue
         self.stats_queue = stats_queue
         self.exporter = None if manager.inline_exporters is False else manager.exporters
@@ -34,6 +40,21 @@ class DataTransformer:
         self.batch_no = 0
         self.buffer_size = manager.buffer_size
         self.records_buffer = []
+        self.pulled_count = 0
+        self.wait_time = 0.0
+        self.out_queue_tracker = QueueDepthTracker('exporter', self.transformer_no, manager.exporter_queue_size)
+        # the input queues of all the exporters when the triples are partitioned by subject
+        self.partition_queues = None
+        self.partition_trackers = None
+        # the entities of the plan that are emitted only the first time the transformer sees their URI
+        default_dedup = manager.dedup_policy or self.descriptor.get_default_dedup_policy()
+        self.dedup_flags = tuple((entity_plan.dedup or default_dedup) == DedupPolicies.FirstWins
+                                 for entity_plan in self.plan.entities)
+        self.seen_entities = SeenEntityCache(manager.dedup_cache_size) if any(self.dedup_flags) else None
+        # in profiling mode the plan's apply functions are timed and every record goes through profile_transform
+        self.profiler = TransformationProfiler(self.plan) if manager.profile else None
+        if self.profiler is not None:
+            self.plan = self.profiler.plan
         self.runner = mp.Process(target=self.run, args=(self.in_queue, self.exporter, self.stats_queue, ))
 
     def run(self, in_queue, exporter, stats_queue):
@@ -48,27 +69,157 @@ class DataTransformer:
         if exporter is not None:
             self.exporter = exporter
             self.exporter.exporter_no = self.transformer_no
+            self.exporter.restore_checkpoint()
 
         self.stats_queue = stats_queue
 
-        self.__send_stats_obj(TimeStampMessage(self.transformer_no, 'transformer', 'start', time.time()))
+        # in service mode the workers start before any job, the job start is reported when its JobMessage arrives
+        if not self.manager.service_mode:
+            self.__send_stats_obj(TimeStampMessage(self.transformer_no, 'transformer', 'start', time.time()))
 
         while True:
+            wait_start = time.time()
             msg = in_queue.get()
+            self.wait_time += time.time() - wait_start
             message = pickle.loads(msg)
 
             if type(message) is EndMessage:
-                self.transform_records()
-                self.__send_stats_obj(TimeStampMessage(self.transformer_no, 'transformer', 'end', time.time()))
+                self.finish_job(msg)
+                if not self.manager.service_mode:
+                    break
+                self.manager.job_barrier.wait()
+                continue
+
+            if type(message) is JobMessage:
+                self.start_job(message, msg)
+                self.manager.job_barrier.wait()
+                continue
+
+            if type(message) is ShutdownMessage:
                 if not self.manager.inline_exporters:
-                    self.out_queue.put(msg)
-                else:
-                    self.exporter.finish_exportation()
+                    self.send_to_exporters(msg)
                 break
+
+            self.pulled_count += 1
+
+            if type(message) is CheckpointedUnitMessage:
+                self.transform_unit(message.unit)
+                self.unit_done(message.unit_no, message.position)
             else:
-                message = vectorize_object(message)
-                self.records_buffer += message
-                self.transform_records_if_needed()
+                self.transform_unit(message)
+
+    def transform_unit(self, message):
+        """
+        transforms a unit of work pulled from the work queue
+        :param message: list of records, InputRangeMessage or RawRecordsMessage
+        :return: None
+        """
+        if type(message) is InputRangeMessage:
+            self.transform_input_range(message.start, message.end)
+        elif type(message) is RawRecordsMessage:
+            self.transform_raw_records(message.lines)
+        else:
+            message = vectorize_object(message)
+            self.records_buffer += message
+            self.transform_records_if_needed()
+
+        # finish the pulled work before asking for more so no records wait here while other transformers are idle
+        if len(self.records_buffer) > 0:
+            self.transform_records()
+
+    def unit_done(self, unit_no, position):
+        """
+        tells the exporter that all the triples of a checkpointed unit of work were forwarded to it
+        :param unit_no: the sequence number of the unit of work
+        :param position: the input position of the unit of work
+        :return: None
+        """
+        if self.manager.inline_exporters:
+            self.exporter.unit_done(unit_no, position)
+        else:
+            self.send_to_exporters(pickle.dumps(UnitDoneMessage(unit_no, position)))
+
+    def start_job(self, message, payload):
+        """
+        takes over the settings of a service mode job, resets the per job statistics and passes the job on to the
+        exporter
+        :param message: the JobMessage
+        :param payload: the pickled JobMessage as received from the work queue
+        :return: None
+        """
+        self.manager.apply_job_settings(message.settings)
+        self.batch_no = 0
+        self.pulled_count = 0
+        self.wait_time = 0.0
+        self.out_queue_tracker = QueueDepthTracker('exporter', self.transformer_no, self.manager.exporter_queue_size)
+        if self.partition_queues is not None:
+            self.partition_trackers = [QueueDepthTracker('exporter', self.transformer_no, self.manager.exporter_queue_size)
+                                       for _ in self.partition_queues]
+        self.descriptor.term_cache.hits = 0
+        self.descriptor.term_cache.misses = 0
+        if self.seen_entities is not None:
+            self.seen_entities.clear()
+        if self.profiler is not None:
+            self.profiler.reset()
+        self.__send_stats_obj(TimeStampMessage(self.transformer_no, 'transformer', 'start', time.time()))
+
+        if self.manager.inline_exporters:
+            self.exporter.start_job(message.settings)
+        else:
+            self.send_to_exporters(payload)
+
+    def finish_job(self, payload):
+        """
+        transforms the buffered records, sends the transformer statistics and signals the end of the input to the
+        exporter
+        :param payload: the pickled EndMessage as received from the work queue
+        :return: None
+        """
+        self.transform_records()
+        self.__send_stats_obj(SchedulingInfo(self.transformer_no, self.pulled_count, self.wait_time))
+        if not self.manager.inline_exporters:
+            for tracker in self.partition_trackers or [self.out_queue_tracker]:
+                self.__send_stats_obj(tracker.get_info())
+        term_cache = self.descriptor.term_cache
+        self.__send_stats_obj(TermCacheInfo(self.transformer_no, term_cache.hits, term_cache.misses,
+                                            len(term_cache)))
+        if self.seen_entities is not None:
+            self.__send_stats_obj(DedupInfo(self.transformer_no, self.seen_entities.hits, self.seen_entities.misses,
+                                            self.seen_entities.evictions))
+        if self.profiler is not None:
+            self.__send_stats_obj(self.profiler.get_info(self.transformer_no))
+        self.__send_stats_obj(TimeStampMessage(self.transformer_no, 'transformer', 'end', time.time()))
+        if not self.manager.inline_exporters:
+            self.send_to_exporters(payload)
+        else:
+            self.exporter.finish_exportation()
+
+    def transform_input_range(self, start, end):
+        """
+        reads the records of a byte range of the input file through the manager's importer and transforms them in
+        batches of buffer_size records
+        :param start: the range start offset
+        :param end: the range end offset
+        :return: None
+        """
+        print('transformer {} started reading input range {}-{}'.format(self.transformer_no, start, end))
+
+        for record in self.manager.importer.get_records_in_range(start, end):
+            self.records_buffer.append(record)
+            self.transform_records_if_needed()
+
+        self.__send_stats_obj(InputProgressInfo(self.transformer_no, end - start))
+
+    def transform_raw_records(self, lines):
+        """
+        parses a block of raw json lines through the manager's importer and transforms the records in batches of
+        buffer_size records
+        :param lines: list of raw lines as bytes
+        :return: None
+        """
+        for record in self.manager.importer.decode_raw_block(lines):
+            self.records_buffer.append(record)
+            self.transform_records_if_needed()
 
     def transform_records_if_needed(self):
         """
@@ -90,8 +241,9 @@ class DataTransformer:
                                                                                      current_batch_no,
                                                                                      len(self.records_buffer)))
         triples = []
+        transform = self.transform if self.profiler is None else self.profile_transform
         for record in self.records_buffer:
-            record_triples = self.transform(record)
+            record_triples = transform(record)
             triples += record_triples
 
         self.__send_stats_obj(
@@ -105,67 +257,124 @@ class DataTransformer:
 
     def transform(self, record):
         """
-        This is where all the magic happens. Takes a single record and applies the descriptor transformation rules on it
+        This is where all the magic happens. Takes a single record and executes the descriptor's compiled
+        TransformationPlan on it
         :param record: the input record as dictionary
         :return: list of RDFTriple objects resulted from transforming the passed record
         """
-        record_dict = MultilevelDictionary(record)
         record_triples = []
 
-        for en_name in self.descriptor.entities.keys():
-            ent_uris = self.descriptor.build_entity_uri(en_name, record_dict)
-            ent_type = self.descriptor.get_entity_type(en_name)
+        for entity_plan, dedup in zip(self.plan.entities, self.dedup_flags):
+            ent_uris = self.get_entity_uris(entity_plan, dedup, record)
+            if len(ent_uris) == 0:
+                continue
+
+            properties = []
+            for prop in entity_plan.properties:
+                obj_vals = DataTransformer.get_property_values(prop, record)
+                if len(obj_vals) > 0:
+                    properties.append((prop, obj_vals))
+
+            for ent_uri in ent_uris:
+                entity = Entity(entity_plan.name, ent_uri, entity_plan.type, self.descriptor)
 
-            for ent_uri in vectorize_object(ent_uris):
+                for prop, obj_vals in properties:
+                    DataTransformer.add_property_values(entity, prop, obj_vals)
+
+                record_triples += entity.triples
 
-                entity = Entity(en_name, ent_uri, ent_type, self.descriptor)
+        return record_triples
 
-                for property_path, predicates in self.descriptor.get_all_entity_features(en_name).items():
-                    object_values = record_dict.get(property_path)
-                    object_values = vectorize_object(object_values)
+    def profile_transform(self, record):
+        """
+        transform with the profiler counting the wall time, key path matches and triples of every entity and property.
+        It runs the same steps as transform, only timed. Building the entity objects of a property's values is timed
+        with the property
+        :param record: the input record as dictionary
+        :return: list of RDFTriple objects resulted from transforming the passed record
+        """
+        clock = time.perf_counter
+        record_triples = []
 
-                    if len(object_values) > 0:
-                        sorted_predicates = sorted(predicates, key=lambda p: p['score'])
-                        predicate = sorted_predicates[-1]
-                        predicate_uri = predicate.get('predicate')
-                        object_type = predicate.get('object_type')
-                        object_data_type = predicate.get('data_type')
-                        pred_func = self.descriptor.get_predicate_function(predicate)
+        for entity_plan, dedup, entity_stats, properties_stats in zip(self.plan.entities, self.dedup_flags,
+                                                                      self.profiler.entities,
+                                                                      self.profiler.properties):
+            entity_start = clock()
+            entity_stats[0] += 1
+            ent_uris = self.get_entity_uris(entity_plan, dedup, record)
+            if len(ent_uris) == 0:
+                entity_stats[1] += clock() - entity_start
+                continue
+
+            properties = []
+            for prop, prop_stats in zip(entity_plan.properties, properties_stats):
+                prop_start = clock()
+                obj_vals = DataTransformer.get_property_values(prop, record)
+                if len(obj_vals) > 0:
+                    properties.append((prop, obj_vals, prop_stats))
+                prop_stats[0] += 1
+                prop_stats[1] += clock() - prop_start
+                prop_stats[2] += len(obj_vals)
+
+            entity_triples = len(record_triples)
+            for ent_uri in ent_uris:
+                entity = Entity(entity_plan.name, ent_uri, entity_plan.type, self.descriptor)
+
+                for prop, obj_vals, prop_stats in properties:
+                    prop_start = clock()
+                    triples_count = len(entity.triples)
+                    DataTransformer.add_property_values(entity, prop, obj_vals)
+                    prop_stats[1] += clock() - prop_start
+                    prop_stats[3] += len(entity.triples) - triples_count
 
-                        obj_entity_name = self.descriptor.entity_with_type(object_data_type)
+                record_triples += entity.triples
 
-                        for obj_val in object_values:
-                            obj_val_match = obj_val.match
+            entity_stats[1] += clock() - entity_start
+            entity_stats[2] += len(ent_uris)
+            entity_stats[3] += len(record_triples) - entity_triples
 
-                            if obj_val_match is None:
-                                continue
+        return record_triples
 
-                            if obj_entity_name is not None:     # if the object is an entity
-                                obj_ml_dict = MultilevelDictionary(obj_val_match)
-                                subs = predicate['substitutions']
-                                subs_processed = {}
-                                subs_count = 0
+    def get_entity_uris(self, entity_plan, dedup, record):
+        """
+        builds the URIs of an entity from a record, without the URIs already emitted if the entity is deduplicated
+        :param entity_plan: the EntityPlan
+        :param dedup: True if the entity is emitted only the first time its URI is seen
+        :param record: the input record as dictionary
+        :return: list of URIs
+        """
+        ent_uris = entity_plan.uri_template.build_uris(record)
 
-                                for key, val in subs.items():
-                                    path = key if len(val) == 0 else val
-                                    path = Descriptor.get_relative_path(path, property_path)
-                                    subs_processed[key] = [x.match for x in obj_ml_dict.get(path) if x.match is not None]
-                                    subs_count = len(subs_processed[key])
-                                    if subs_count == 0:
-                                        break
+        if dedup:
+            ent_uris = [ent_uri for ent_uri in ent_uris if not self.seen_entities.seen(entity_plan.name, ent_uri)]
 
-                                obj_uri_template = self.descriptor.get_entity_uri_template(obj_entity_name)
-                                object_val = Descriptor.construct_uri_from_template(subs_processed, obj_uri_template,
-                                                                                    subs_count) if subs_count > 0 else \
-                                                                                    None
-                            else:                               # if the object is literal
-                                object_val = obj_val_match
+        return ent_uris
 
-                            entity.add_property(predicate_uri, object_val, object_type, object_data_type, pred_func)
+    @staticmethod
+    def get_property_values(prop, record):
+        """
+        matches a property key path in a record
+        :param prop: the PropertyPlan
+        :param record: the input record as dictionary
+        :return: list of the matched values, or of the object entity URIs built from them
+        """
+        if prop.object_entity is None:
+            return prop.keypath.values(record)
 
-                record_triples += entity.triples
+        # if the object is an entity
+        return [prop.object_entity.build_uri(obj_val) for obj_val in prop.keypath.values(record)]
 
-        return record_triples
+    @staticmethod
+    def add_property_values(entity, prop, obj_vals):
+        """
+        adds the triples of a property's values to an entity
+        :param entity: the Entity
+        :param prop: the PropertyPlan
+        :param obj_vals: list of values returned by get_property_values
+        :return: None
+        """
+        for object_val in obj_vals:
+            entity.add_property(prop.predicate, object_val, prop.object_type, prop.data_type, prop.function)
 
     def forward_created_triples(self, triples):
         """
@@ -176,8 +385,66 @@ class DataTransformer:
         if len(triples) > 0:
             if self.manager.inline_exporters:
                 self.exporter.receive_triples(triples)
+            elif self.partition_queues is not None:
+                for i, partition in enumerate(self.partition_triples(triples, len(self.partition_queues))):
+                    if len(partition) > 0:
+                        self.partition_trackers[i].put(self.partition_queues[i], self.encode_triples(partition))
             else:
-                self.out_queue.put(pickle.dumps(triples))
+                self.out_queue_tracker.put(self.out_queue, self.encode_triples(triples))
+
+    @staticmethod
+    def partition_triples(triples, partitions_count):
+        """
+        splits the triples by the crc32 hash of their subject so all the triples of a subject go to the same exporter
+        :param triples: list of RDFTriple objects
+        :param partitions_count: the number of partitions
+        :return: list of partitions_count lists of RDFTriple objects
+        """
+        partitions = [[] for _ in range(partitions_count)]
+        last_subject = None
+        partition = None
+
+        for triple in triples:
+            # the triples of an entity are consecutive so most subjects are hashed once per entity
+            if triple.subject is not last_subject:
+                last_subject = triple.subject
+                partition = partitions[zlib.crc32(last_subject.encode('utf-8')) % partitions_count]
+            partition.append(triple)
+
+        return partitions
+
+    def send_to_exporters(self, payload):
+        """
+        sends a control message to the exporter or, when the triples are partitioned by subject, to all the exporters
+        :param payload: the pickled message
+        :return: None
+        """
+        if self.partition_queues is None:
+            self.out_queue_tracker.put(self.out_queue, payload)
+        else:
+            for queue, tracker in zip(self.partition_queues, self.partition_trackers):
+                tracker.put(queue, payload)
+
+    def encode_triples(self, triples):
+        """
+        encodes the triples batch in the manager's wire format before putting it on the exporter queue and reports the
+        payload size and the encoding time
+        :param triples: list of RDFTriple objects
+        :return: bytes
+        """
+        start_time = time.time()
+        skipped_count = 0
+
+        if self.manager.wire_format == WireFormats.NTriples:
+            payload, skipped_count = TripleBatchCodec.encode_ntriples(triples, self.manager.get_quads_graph_identifier())
+        elif self.manager.wire_format == WireFormats.Dictionary:
+            payload = TripleBatchCodec.encode_dictionary(triples)
+        else:
+            payload = pickle.dumps(triples)
+
+        self.__send_stats_obj(SerializationInfo(self.transformer_no, 'transformer', 1, len(payload),
+                                                time.time() - start_time, skipped_count))
+        return payload
 
     def start(self):
         """
@@ -197,6 +464,18 @@ class DataTransformer:
         else:
             self.out_queue = exporter.input_queue
 
+    def connect_to_all_exporters(self, exporters):
+        """
+        connects self to the multiprocessing.Queue of every exporter to route the triples to the exporter owning their
+        subject
+        :param exporters: list of DataExporter objects
+        :return: None
+        """
+        self.out_queue = None
+        self.partition_queues = [exporter.input_queue for exporter in exporters]
+        self.partition_trackers = [QueueDepthTracker('exporter', self.transformer_no, self.manager.exporter_queue_size)
+                                   for _ in exporters]
+
     def send_me_message(self, message):
         """
         send a message to self on the input queue. This message could be EndMessage or list of records
@@ -212,7 +491,7 @@ class DataTransformer:
         :param triples: list of RDFTriple objects
         :return: None
         """
-        self.out_queue.put(pickle.dumps(triples))
+        self.out_queue_tracker.put(self.out_queue, self.encode_triples(triples))
 
     def __get_next_batch_no(self):
         self.batch_no += 1
@@ -0,0 +1,66 @@
+"""
+remembers the entities a transformer already emitted so repeated entities are not transformed and exported again
+"""
+from collections import OrderedDict
+
+
+class DedupPolicies:
+    """
+    what a transformer does with an entity URI it already emitted
+    FirstWins: the entity's triples are generated from the first record it appears in only
+    AlwaysEmit: the entity's triples are generated from every record (no deduplication)
+    """
+    FirstWins = 'first_wins'
+    AlwaysEmit = 'always_emit'
+
+    all_policies = [FirstWins, AlwaysEmit]
+
+
+class SeenEntityCache:
+    """
+    bounded LRU set of the (entity name, entity URI) pairs emitted by a transformer. Entities evicted from the cache are
+    emitted again when they reappear, so the output may hold a few duplicates but never misses an entity. Hits and
+    misses are counted per entity name
+    """
+
+    def __init__(self, max_size=100000):
+        """
+        :param max_size: the maximum number of entities remembered
+        """
+        self.max_size = max_size
+        self.entities = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def seen(self, entity_name, uri):
+        """
+        checks whether the entity was emitted before and remembers it as emitted
+        :param entity_name: the entity name in the descriptor
+        :param uri: the entity URI
+        :return: True if the entity is in the cache
+        """
+        key = (entity_name, uri)
+
+        if key in self.entities:
+            self.entities.move_to_end(key)
+            self.hits[entity_name] = self.hits.get(entity_name, 0) + 1
+            return True
+
+        self.misses[entity_name] = self.misses.get(entity_name, 0) + 1
+        self.entities[key] = None
+
+        if len(self.entities) > self.max_size:
+            self.entities.popitem(last=False)
+            self.evictions += 1
+
+        return False
+
+    def clear(self):
+        self.entities.clear()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entities)
@@ -0,0 +1,98 @@
+"""
+interns the rdflib nodes created during the transformation so that repeated URIs, data types and low cardinality
+literals are created once per process and shared by all the triples that use them
+"""
+import rdflib
+
+
+class TermCache:
+    """
+    bounded intern cache of rdflib nodes. Every cache is a plain dictionary that is cleared when it reaches max_size so
+    memory stays bounded without paying for LRU bookkeeping on every lookup. Only literals up to max_literal_length
+    characters and booleans are interned since long literals (texts, descriptions) rarely repeat
+    """
+
+    def __init__(self, max_size=100000, max_literal_length=16):
+        """
+        :param max_size: the maximum number of nodes kept in each of the uris, data types and literals caches
+        :param max_literal_length: string literals longer than this are not interned
+        """
+        self.max_size = max_size
+        self.max_literal_length = max_literal_length
+        self.uris = {}
+        self.datatypes = {}
+        self.literals = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_uri(self, term, resolver=rdflib.URIRef):
+        """
+        returns the interned rdflib node of the passed uri
+        :param term: uri string or prefixed uri
+        :param resolver: function used to create the node on cache misses
+        :return: rdflib.URIRef
+        """
+        node = self.uris.get(term)
+
+        if node is None:
+            self.misses += 1
+            node = resolver(term)
+            if node is not None:
+                self.__put(self.uris, term, node)
+        else:
+            self.hits += 1
+
+        return node
+
+    def get_datatype(self, data_type):
+        """
+        returns the interned rdflib node of a literal data type
+        :param data_type: the data type as string
+        :return: rdflib.URIRef or None if no data type is passed
+        """
+        if data_type is None:
+            return None
+
+        node = self.datatypes.get(data_type)
+
+        if node is None:
+            self.misses += 1
+            node = rdflib.URIRef(data_type)
+            self.__put(self.datatypes, data_type, node)
+        else:
+            self.hits += 1
+
+        return node
+
+    def get_literal(self, value, data_type=None):
+        """
+        returns the rdflib literal of the passed value. Booleans and short strings are interned, other values are
+        created every time
+        :param value: the literal value
+        :param data_type: the data type of the literal
+        :return: rdflib.Literal
+        """
+        value_type = type(value)
+
+        if value_type is bool or (value_type is str and len(value) <= self.max_literal_length):
+            key = (value_type, value, data_type)
+            node = self.literals.get(key)
+
+            if node is None:
+                self.misses += 1
+                node = rdflib.Literal(value, datatype=data_type)
+                self.__put(self.literals, key, node)
+            else:
+                self.hits += 1
+
+            return node
+
+        return rdflib.Literal(value, datatype=data_type)
+
+    def __len__(self):
+        return len(self.uris) + len(self.datatypes) + len(self.literals)
+
+    def __put(self, cache, key, node):
+        if len(cache) >= self.max_size:
+            cache.clear()
+        cache[key] = node
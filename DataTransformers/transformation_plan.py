@@ -0,0 +1,145 @@
+"""
+compiles the descriptor rules once into an immutable execution plan that the transformer runs on every record
+"""
+from collections import namedtuple
+
+from utils.MultilevelDictionary import KeyPath
+from utils.convenience import devectorize_list
+
+
+class ObjectEntityPlan(namedtuple('ObjectEntityPlan', ['entity_name', 'uri_template', 'substitutions'])):
+    """
+    how to build the URI of an entity referenced as the object of a property
+    entity_name: the name of the referenced entity in the descriptor
+    uri_template: the referenced entity's compiled UriTemplate
+    substitutions: tuple of (template variable, KeyPath relative to the property's matched value)
+    """
+    __slots__ = ()
+
+    def build_uri(self, obj_value):
+        """
+        builds the object entity URI from the value matched by the property key path
+        :param obj_value: the matched property value
+        :return: URI string, list of URIs or None if any substitution has no matches
+        """
+        subs_processed = {}
+        subs_count = 0
+
+        for variable, keypath in self.substitutions:
+            subs_processed[variable] = keypath.values(obj_value)
+            subs_count = len(subs_processed[variable])
+            if subs_count == 0:
+                return None
+
+        if subs_count == 0:
+            return None
+
+        return devectorize_list(self.uri_template.expand_all(subs_processed, subs_count))
+
+
+class PropertyPlan(namedtuple('PropertyPlan', ['keypath', 'predicate', 'object_type', 'data_type', 'function',
+                                               'object_entity'])):
+    """
+    the winning predicate of a single entity property with all its terms resolved
+    keypath: compiled KeyPath of the property in the input record
+    predicate: rdflib.URIRef of the predicate
+    object_type: 'entity' or 'literal'
+    data_type: rdflib.URIRef of the literal data type or None
+    function: PredicateFunction applied on literal objects or None
+    object_entity: ObjectEntityPlan if the object is another entity, None otherwise
+    """
+    __slots__ = ()
+
+
+class EntityPlan(namedtuple('EntityPlan', ['name', 'type', 'uri_template', 'properties', 'dedup'])):
+    """
+    everything needed to generate the triples of a single descriptor entity from a record
+    name: the entity name in the descriptor
+    type: rdflib.URIRef of the entity's rdf:type
+    uri_template: the entity's compiled UriTemplate
+    properties: tuple of PropertyPlan
+    dedup: the entity's policy for repeated entities as defined in DedupPolicies or None for the transformation option
+    or the descriptor default
+    """
+    __slots__ = ()
+
+
+class TransformationPlan:
+    """
+    immutable list of EntityPlan objects compiled from the descriptor. Compilation picks the highest scoring predicate
+    of every property, resolves predicates, types and data types to rdflib terms, binds the predicate functions and
+    makes the object entities substitutions relative to their property key paths so none of this work is repeated per
+    record
+    """
+
+    def __init__(self, entities):
+        self.entities = tuple(entities)
+
+    def __repr__(self):
+        return 'TransformationPlan({})'.format(', '.join(entity.name for entity in self.entities))
+
+    def get_keypaths(self):
+        """
+        returns every compiled KeyPath the plan applies on records: uri template variables, property key paths and object
+        entities substitutions
+        :return: list of KeyPath objects
+        """
+        keypaths = []
+
+        for entity in self.entities:
+            keypaths += [keypath for _, keypath in entity.uri_template.keypaths]
+            for prop in entity.properties:
+                keypaths.append(prop.keypath)
+                if prop.object_entity is not None:
+                    keypaths += [keypath for _, keypath in prop.object_entity.substitutions]
+
+        return keypaths
+
+    @staticmethod
+    def compile(descriptor):
+        """
+        compiles the passed descriptor into a TransformationPlan
+        :param descriptor: the Descriptor object
+        :return: TransformationPlan
+        """
+        entities = []
+
+        for en_name in descriptor.entities.keys():
+            properties = tuple(TransformationPlan.__compile_property(descriptor, property_path, predicates)
+                               for property_path, predicates in
+                               (descriptor.get_all_entity_features(en_name) or {}).items()
+                               if len(predicates) > 0)
+
+            entities.append(EntityPlan(name=en_name,
+                                       type=descriptor.get_uri_node(descriptor.get_entity_type(en_name)),
+                                       uri_template=descriptor.get_compiled_uri_template(en_name),
+                                       properties=properties,
+                                       dedup=descriptor.get_entity_dedup_policy(en_name)))
+
+        return TransformationPlan(entities)
+
+    @staticmethod
+    def __compile_property(descriptor, property_path, predicates):
+        predicate = sorted(predicates, key=lambda p: p['score'])[-1]
+        object_data_type = predicate.get('data_type')
+        obj_entity_name = descriptor.entity_with_type(object_data_type)
+        object_entity = None
+
+        if obj_entity_name is not None:
+            substitutions = []
+
+            for key, val in predicate.get('substitutions', {}).items():
+                path = key if len(val) == 0 else val
+                path = descriptor.get_relative_path(path, property_path)
+                substitutions.append((key, KeyPath.compile(path)))
+
+            object_entity = ObjectEntityPlan(entity_name=obj_entity_name,
+                                             uri_template=descriptor.get_compiled_uri_template(obj_entity_name),
+                                             substitutions=tuple(substitutions))
+
+        return PropertyPlan(keypath=KeyPath.compile(property_path),
+                            predicate=descriptor.get_uri_node(predicate.get('predicate')),
+                            object_type=predicate.get('object_type'),
+                            data_type=descriptor.term_cache.get_datatype(object_data_type),
+                            function=descriptor.get_predicate_function(predicate),
+                            object_entity=object_entity)
@@ -0,0 +1,94 @@
+"""
+measures what every rule of the transformation plan costs a transformer so slow descriptor rules can be found
+"""
+import time
+
+from DataTransformers.Entity import PredicateFunction
+from DataTransformers.transformation_plan import TransformationPlan
+from manager.transformation_metrics import TransformationProfileInfo
+
+
+class ProfiledFunction(PredicateFunction):
+    """
+    a PredicateFunction counting its calls, the time they take and the values it fails to convert
+    """
+
+    def __init__(self, function, stats):
+        """
+        :param function: the profiled PredicateFunction
+        :param stats: list of [calls, wall time, errors] shared by all the properties applying the same function
+        """
+        super().__init__(function.key, self.timed_call, function.parameters)
+        self.function = function.func
+        self.stats = stats
+
+    def timed_call(self, *args):
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        except Exception:
+            self.stats[2] += 1
+            raise
+        finally:
+            self.stats[0] += 1
+            self.stats[1] += time.perf_counter() - start
+
+
+class TransformationProfiler:
+    """
+    holds the counters of a transformer's profiling mode: for every entity and every property of the plan the number of
+    records it was evaluated on, its wall time, its key path matches (the entity URIs for entities) and the triples it
+    produced, and for every apply function its calls, wall time and errors. The counters are lists indexed like the
+    plan so the profiled transform loop does not hash anything per record
+    """
+
+    def __init__(self, plan):
+        """
+        :param plan: the transformer's TransformationPlan
+        """
+        self.functions = {}
+        self.plan = TransformationPlan([entity._replace(properties=tuple(self.__profile_property(prop)
+                                                                         for prop in entity.properties))
+                                        for entity in plan.entities])
+        self.entities = [[0, 0.0, 0, 0] for _ in self.plan.entities]
+        self.properties = [[[0, 0.0, 0, 0] for _ in entity.properties] for entity in self.plan.entities]
+
+    def reset(self):
+        """
+        zeroes all the counters, e.g. at the start of a service mode job
+        :return: None
+        """
+        for stats in self.entities + [stats for entity in self.properties for stats in entity]:
+            stats[:] = [0, 0.0, 0, 0]
+        for stats in self.functions.values():
+            stats[:] = [0, 0.0, 0]
+
+    def get_info(self, transformer_no):
+        """
+        :param transformer_no: the transformer index
+        :return: TransformationProfileInfo with the counters keyed by entity name, by (entity name, key path, predicate)
+        and by function name
+        """
+        entities = {}
+        properties = {}
+
+        for entity, entity_stats, properties_stats in zip(self.plan.entities, self.entities, self.properties):
+            TransformationProfiler.__add(entities, entity.name, entity_stats)
+            for prop, stats in zip(entity.properties, properties_stats):
+                TransformationProfiler.__add(properties, (entity.name, prop.keypath.keypath, str(prop.predicate)),
+                                             stats)
+
+        return TransformationProfileInfo(transformer_no, entities, properties,
+                                         {key: tuple(stats) for key, stats in self.functions.items()})
+
+    def __profile_property(self, prop):
+        if prop.function is None:
+            return prop
+
+        stats = self.functions.setdefault(prop.function.key, [0, 0.0, 0])
+        return prop._replace(function=ProfiledFunction(prop.function, stats))
+
+    @staticmethod
+    def __add(counters, key, stats):
+        # descriptors may repeat a key path under an entity, their counters are summed
+        counters[key] = tuple(x + y for x, y in zip(counters.get(key, (0, 0.0, 0, 0)), stats))
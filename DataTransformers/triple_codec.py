@@ -0,0 +1,178 @@
+"""
+compact encodings of triple batches passed from the transformers to the exporters over multiprocessing queues
+"""
+import struct
+from array import array
+
+from rdflib import BNode, Literal, URIRef
+
+from DataExporters.ntriples_writer import ntriples_line
+from DataTransformers.Entity import RDFTriple
+
+
+class WireFormats:
+    """
+    pickle: the batch is pickled as a list of RDFTriple objects
+    dictionary: every distinct term of the batch is written once to a term table and the triples are packed as an array
+    of term ids
+    ntriples: the batch is pre-serialized to N-Triples/N-Quads lines the exporter appends to its output file as is. Only
+    usable with the line based export formats
+    auto: ntriples for the line based export formats and dictionary for the others
+    """
+    Pickle = 'pickle'
+    Dictionary = 'dictionary'
+    NTriples = 'ntriples'
+    Auto = 'auto'
+
+    all_formats = [Pickle, Dictionary, NTriples, Auto]
+
+
+class EncodedNTriples:
+    """
+    decoded form of an ntriples encoded batch
+    """
+    def __init__(self, triples_count, text):
+        self.triples_count = triples_count
+        self.text = text
+
+
+class TripleBatchCodec:
+    """
+    encodes lists of RDFTriple objects into bytes and decodes them back. Encoded batches start with a 4 bytes magic
+    number so they can be told apart from pickled messages on the same queue
+    """
+
+    DICTIONARY_MAGIC = b'RDFD'
+    NTRIPLES_MAGIC = b'RDFN'
+
+    # magic, strings count, terms count, triples count, strings blob length
+    DICTIONARY_HEADER = struct.Struct('<4sIIII')
+    # magic, triples count
+    NTRIPLES_HEADER = struct.Struct('<4sI')
+
+    URI = 0
+    BNODE = 1
+    LITERAL = 2
+
+    @staticmethod
+    def is_encoded(payload):
+        return type(payload) is bytes and payload[:4] in (TripleBatchCodec.DICTIONARY_MAGIC,
+                                                          TripleBatchCodec.NTRIPLES_MAGIC)
+
+    @staticmethod
+    def encode_ntriples(triples, graph_identifier=None):
+        """
+        encodes the triples as N-Triples lines, or N-Quads lines if graph_identifier is passed. Triples with a term that
+        cannot be serialized are skipped like NTriplesWriter skips them
+        :param triples: list of RDFTriple objects
+        :param graph_identifier: the graph name of N-Quads lines
+        :return: tuple(bytes, the number of skipped triples)
+        """
+        graph_term = '<{}>'.format(graph_identifier) if graph_identifier else None
+        lines = []
+
+        for triple in triples:
+            line = ntriples_line(triple, graph_term)
+            if line is not None:
+                lines.append(line)
+            else:
+                print('skipping triple with a term that cannot be serialized {}'.format(triple))
+
+        payload = TripleBatchCodec.NTRIPLES_HEADER.pack(TripleBatchCodec.NTRIPLES_MAGIC, len(lines)) + \
+            ''.join(lines).encode('utf-8')
+
+        return payload, len(triples) - len(lines)
+
+    @staticmethod
+    def encode_dictionary(triples):
+        """
+        encodes the triples as a term table followed by an array of (subject, predicate, object) term ids
+        :param triples: list of RDFTriple objects
+        :return: bytes
+        """
+        strings = []
+        string_ids = {}
+        terms = array('I')
+        term_ids = {}
+        ids = array('I')
+
+        def string_id(value):
+            idx = string_ids.get(value)
+            if idx is None:
+                idx = len(strings)
+                string_ids[value] = idx
+                strings.append(value.encode('utf-8', 'surrogatepass'))
+            return idx
+
+        for triple in triples:
+            for node in (triple.subject, triple.predicate, triple.object):
+                idx = term_ids.get(id(node))
+
+                if idx is None:
+                    idx = len(terms) // 4
+                    term_ids[id(node)] = idx
+
+                    if isinstance(node, Literal):
+                        terms.extend((TripleBatchCodec.LITERAL, string_id(str(node)),
+                                      string_id(node.datatype) + 1 if node.datatype else 0,
+                                      string_id(node.language) + 1 if node.language else 0))
+                    elif isinstance(node, BNode):
+                        terms.extend((TripleBatchCodec.BNODE, string_id(str(node)), 0, 0))
+                    else:
+                        terms.extend((TripleBatchCodec.URI, string_id(str(node)), 0, 0))
+
+                ids.append(idx)
+
+        lengths = array('I', [len(s) for s in strings])
+        blob = b''.join(strings)
+        header = TripleBatchCodec.DICTIONARY_HEADER.pack(TripleBatchCodec.DICTIONARY_MAGIC, len(strings),
+                                                         len(terms) // 4, len(ids) // 3, len(blob))
+
+        return b''.join([header, lengths.tobytes(), blob, terms.tobytes(), ids.tobytes()])
+
+    @staticmethod
+    def decode(payload):
+        """
+        decodes an encoded batch
+        :param payload: bytes created by one of the encode methods
+        :return: list of RDFTriple objects for dictionary encoded batches or EncodedNTriples for ntriples batches
+        """
+        if payload[:4] == TripleBatchCodec.NTRIPLES_MAGIC:
+            _, triples_count = TripleBatchCodec.NTRIPLES_HEADER.unpack_from(payload)
+            return EncodedNTriples(triples_count, payload[TripleBatchCodec.NTRIPLES_HEADER.size:].decode('utf-8'))
+
+        _, strings_count, terms_count, triples_count, blob_len = TripleBatchCodec.DICTIONARY_HEADER.unpack_from(payload)
+        offset = TripleBatchCodec.DICTIONARY_HEADER.size
+
+        lengths = array('I')
+        lengths.frombytes(payload[offset:offset + strings_count * lengths.itemsize])
+        offset += strings_count * lengths.itemsize
+
+        strings = []
+        pos = offset
+        for length in lengths:
+            strings.append(payload[pos:pos + length].decode('utf-8', 'surrogatepass'))
+            pos += length
+        offset += blob_len
+
+        terms = array('I')
+        terms.frombytes(payload[offset:offset + terms_count * 4 * terms.itemsize])
+        offset += terms_count * 4 * terms.itemsize
+
+        ids = array('I')
+        ids.frombytes(payload[offset:offset + triples_count * 3 * ids.itemsize])
+
+        nodes = []
+        for i in range(0, len(terms), 4):
+            kind, value, data_type, lang = terms[i], terms[i + 1], terms[i + 2], terms[i + 3]
+
+            if kind == TripleBatchCodec.LITERAL:
+                nodes.append(Literal(strings[value],
+                                     lang=strings[lang - 1] if lang else None,
+                                     datatype=URIRef(strings[data_type - 1]) if data_type else None))
+            elif kind == TripleBatchCodec.BNODE:
+                nodes.append(BNode(strings[value]))
+            else:
+                nodes.append(URIRef(strings[value]))
+
+        return [RDFTriple(nodes[ids[i]], nodes[ids[i + 1]], nodes[ids[i + 2]]) for i in range(0, len(ids), 3)]
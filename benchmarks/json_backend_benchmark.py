@@ -0,0 +1,34 @@
+"""
+compares the records/s of JsonReader.get_as_dict_streamed with every installed json decoding backend
+
+usage: python benchmarks/json_backend_benchmark.py path/to/tweets.json [repeats]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_object import JsonDecoders, JsonReader
+
+
+def run_benchmark(filepath, repeats):
+    for backend in JsonDecoders.get_available_backends():
+        name, decoder = JsonDecoders.get_decoder(backend)
+        best = None
+        records_count = 0
+
+        for _ in range(repeats):
+            start_time = time.time()
+            records_count = sum(1 for _ in JsonReader.get_as_dict_streamed(filepath, decoder))
+            elapsed = time.time() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+
+        print('{:<10} {:>10} records {:>12.0f} records/s'.format(name, records_count, records_count / best))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    run_benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,104 @@
+"""
+micro-benchmark of the compiled key path matcher against the anytree based key path expansion it replaced
+
+usage: python benchmarks/keypath_benchmark.py [records.json] [iterations]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.MultilevelDictionary import KeyPath, MultilevelDictionary
+
+try:
+    import anytree
+except ImportError:
+    anytree = None
+
+
+SAMPLE_RECORD = {
+    'id_str': '1234567890',
+    'text': 'sample tweet #one #two',
+    'lang': 'en',
+    'user': {'id_str': '42', 'screen_name': 'someone', 'name': 'Some One', 'lang': 'en', 'verified': False},
+    'place': {'id': 'abc', 'full_name': 'Doha, Qatar', 'country_code': 'QA'},
+    'entities': {
+        'hashtags': [{'text': 'one'}, {'text': 'two'}],
+        'user_mentions': [{'screen_name': 'other'}],
+        'urls': [],
+        'media': [{'expanded_url': 'http://example.com/1', 'type': 'photo', 'id': 1}],
+    },
+}
+
+KEYPATHS = ['/id_str', '/user/screen_name', '/user/', '/place/country_code', '/entities/hashtags/[*]',
+            '/entities/hashtags/[*]/text', '/entities/media/[0]/expanded_url', '/quoted_status/user/screen_name', '/']
+
+
+def legacy_get_from_dict(dictionary, keypath):
+    """
+    the key path lookup as it was implemented before compiled key paths: an anytree expansion tree is built per call
+    """
+    if keypath == '/':
+        return [dictionary]
+
+    def is_list_comp(comp):
+        return comp.startswith('[') and comp.endswith(']') and (comp[1:-1].isdigit() or comp[1:-1] == '*')
+
+    def expand(parent, kp_list, obj):
+        comp = kp_list[0] if len(kp_list) > 0 else None
+        if comp is None or obj is None or not (is_list_comp(comp) or comp in obj):
+            return
+        if type(obj) is list and is_list_comp(comp):
+            indices = range(len(obj)) if comp == '[*]' else [int(comp[1:-1])] if int(comp[1:-1]) < len(obj) else []
+            for i in indices:
+                node = anytree.AnyNode(parent, keypath='{}{}/'.format(parent.keypath, i), keypath_value=obj[i],
+                                       tree_level=parent.tree_level + 1)
+                expand(node, kp_list[1:], obj[i])
+        elif type(obj) is dict and comp in obj:
+            node = anytree.AnyNode(parent, keypath='{}{}/'.format(parent.keypath, comp), keypath_value=obj[comp],
+                                   tree_level=parent.tree_level + 1)
+            expand(node, kp_list[1:], obj[comp])
+
+    kp_list = KeyPath.split(keypath)
+    root = anytree.AnyNode(keypath='/', keypath_value=None, tree_level=0)
+    expand(root, kp_list, dictionary)
+
+    return [node.keypath_value for node in anytree.PreOrderIter(root)
+            if node.is_leaf and node.tree_level == len(kp_list) and node.keypath_value is not None]
+
+
+def load_records(filepath, limit=1000):
+    records = []
+    with open(filepath) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{') and line.endswith('}'):
+                records.append(json.loads(line))
+            if len(records) >= limit:
+                break
+    return records
+
+
+def run_benchmark(records, iterations):
+    def bench(fn):
+        return timeit.timeit(lambda: [fn(rec, kp) for rec in records for kp in KEYPATHS], number=iterations)
+
+    lookups = len(records) * len(KEYPATHS) * iterations
+    results = [('compiled KeyPath.values', bench(lambda rec, kp: KeyPath.compile(kp).values(rec))),
+               ('MultilevelDictionary.get_from_dict', bench(MultilevelDictionary.get_from_dict))]
+
+    if anytree is not None:
+        results.append(('legacy anytree expansion', bench(legacy_get_from_dict)))
+    else:
+        print('anytree is not installed, skipping the legacy implementation')
+
+    for name, elapsed in results:
+        print('{:<40} {:>10.0f} lookups/s'.format(name, lookups / elapsed))
+
+
+if __name__ == '__main__':
+    recs = load_records(sys.argv[1]) if len(sys.argv) > 1 else [SAMPLE_RECORD]
+    its = int(sys.argv[2]) if len(sys.argv) > 2 else max(1, 20000 // len(recs))
+    run_benchmark(recs, its)
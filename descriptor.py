@@ -1,7 +1,11 @@
 from json_object import JsonReader
 from utils.MultilevelDictionary import MultilevelDictionary
-from utils.convenience import vectorize_object, devectorize_list
+from utils.convenience import devectorize_list
+from utils.uri_template import UriTemplate
 from DataTransformers.Entity import PredicateFunction
+from DataTransformers.term_cache import TermCache
+from DataTransformers.entity_cache import DedupPolicies
+from DataTransformers.transformation_plan import TransformationPlan
 import rdflib
 
 
@@ -25,8 +29,11 @@ class Descriptor:
         self.prefixes = {}
         self.namespaces = {}
         self.entities = {}      # Dictionary entity name => uri
+        self.uri_templates = {}     # Dictionary entity name => UriTemplate
         self.descriptor_types = {}
         self.predicate_functions = {}
+        self.transformation_plan = None
+        self.term_cache = TermCache()
 
         if self.desc_dict is not None:
             self.load_prefixes()
@@ -39,12 +46,23 @@ class Descriptor:
     def load_entities(self):
         self.entities = self.get_all_entities()
         self.descriptor_types = {entity['type']: en_name for en_name, entity in self.entities.items()}
+        self.uri_templates = {en_name: UriTemplate.compile(entity['uri_template'], self.get_entity_uri_encoding(en_name))
+                              for en_name, entity in self.entities.items() if 'uri_template' in entity}
 
         for entity in self.entities.values():
             for property_preds in entity.get('properties', {}).values():
                 for predicate in property_preds:
                     self.load_predicate_function(predicate)
 
+    def get_transformation_plan(self):
+        """
+        compiles the descriptor rules into a TransformationPlan on the first call and returns the same plan afterwards
+        :return: TransformationPlan
+        """
+        if self.transformation_plan is None:
+            self.transformation_plan = TransformationPlan.compile(self)
+        return self.transformation_plan
+
     def load_all_prefixes(self):
         if 'prefixes' in self.desc_dict:
             return self.desc_dict['prefixes']
@@ -62,11 +80,67 @@ class Descriptor:
         else:
             raise DescriptorException('undefined prefix {}. Only prefixes defined in the descriptor\'s prefixes section can be used'.format(prefix))
 
+    def get_uri_node(self, term):
+        """
+        wraps the passed uri in rdflib node. The uri could be in prefixed form (sioc:id) or a normal uri. Terms that are
+        already rdflib URIRefs are returned as is and the created nodes are interned in the descriptor's TermCache
+        :param term: uri or prefixed uri
+        :return: rdflib.URIRef
+        """
+        if isinstance(term, rdflib.URIRef):
+            return term
+        elif type(term) is str:
+            return self.term_cache.get_uri(term, self.__resolve_uri)
+        else:
+            return self.__resolve_uri(term)
+
+    def get_entity_uri_node(self, term):
+        """
+        wraps the URI of an entity, as built from a record by its uri template, in rdflib node. Entity URIs are not
+        interned: they are mostly unique per record (e.g. one per tweet), so they would only fill up the TermCache and
+        push out the low cardinality terms it is meant for
+        :param term: uri or prefixed uri
+        :return: rdflib.URIRef
+        """
+        if isinstance(term, rdflib.URIRef):
+            return term
+        return self.__resolve_uri(term)
+
+    def __resolve_uri(self, term):
+        if Descriptor.is_prefixed(term):
+            prefix, iden = Descriptor.get_term_components(term)
+            ns = self.get_namespace(prefix)
+            if ns is not None:
+                return ns[iden]
+        else:
+            return rdflib.URIRef(term)
+
     def get_graph_uri(self):
         if 'graph' in self.desc_dict:
             return self.desc_dict['graph']
         # return self.desc_dict.get('/graph').match
 
+    def get_xml_record_element(self):
+        """
+        the tag of the xml elements that are transformed as records, as set in the descriptor's 'xml' section
+        :return: the tag name or None to use the children of the root element
+        """
+        return self.desc_dict['xml'].get('record_element') if 'xml' in self.desc_dict else None
+
+    def get_xml_list_elements(self):
+        """
+        the tags of the xml elements that are always converted to lists, even when a record has a single one of them, so
+        the [*] and [index] key paths match them. These are the tags listed in the descriptor's 'xml' section plus the
+        keys followed by [*] or [index] in the descriptor key paths
+        :return: set of tag names
+        """
+        list_elements = set(self.desc_dict['xml'].get('list_elements', [])) if 'xml' in self.desc_dict else set()
+
+        for keypath in self.get_transformation_plan().get_keypaths():
+            list_elements.update(keypath.get_list_keys())
+
+        return list_elements
+
     def get_all_entities(self):
         if 'entities' in self.desc_dict:
             return self.desc_dict['entities']
@@ -82,21 +156,54 @@ class Descriptor:
             return self.entities[entity_name]['uri_template']
         # return self.desc_dict.get('/entities/{}/template'.format(entity_name)).match
 
-    def build_entity_uri(self, entity_name, record_dict):
-        uri_template = self.get_entity_uri_template(entity_name)
-        uri_pathes = Descriptor.extract_variables_from_uri_template(uri_template)
+    def get_entity_uri_encoding(self, entity_name):
+        """
+        whether the values substituted in the entity's uri template are percent-encoded. The entity's 'uri_encode' key
+        overrides the descriptor level 'uri_encode' key. Defaults to False
+        :param entity_name: the entity name
+        :return: bool
+        """
+        default = self.desc_dict['uri_encode'] if 'uri_encode' in self.desc_dict else False
+        return bool(self.entities.get(entity_name, {}).get('uri_encode', default))
 
-        sub_dict = {}
-        subs_count = 0
-        for path in uri_pathes.keys():
-            path_vals = [val.match for val in vectorize_object(record_dict.get(path))]
-            if subs_count == 0 or subs_count == len(path_vals):
-                subs_count = len(path_vals)
-            else:
-                raise Exception('all variables in uri template {} must have the same number of substitutions'.format(uri_template))
-            sub_dict[path] = path_vals
+    def get_entity_dedup_policy(self, entity_name):
+        """
+        what transformers do with entities they already emitted, as defined in DedupPolicies. The entity's 'dedup' key
+        overrides the --dedup transformation option, which overrides the descriptor level 'dedup' key
+        :param entity_name: the entity name
+        :return: one of DedupPolicies or None if the entity has no 'dedup' key
+        """
+        return Descriptor.__check_dedup_policy(self.entities.get(entity_name, {}).get('dedup'),
+                                               'entity {}'.format(entity_name))
 
-        return Descriptor.construct_uri_from_template(sub_dict, uri_template, subs_count)
+    def get_default_dedup_policy(self):
+        """
+        the descriptor level 'dedup' key, the policy of the entities without a 'dedup' key when the transformation
+        options do not set one
+        :return: one of DedupPolicies or None
+        """
+        return Descriptor.__check_dedup_policy(self.desc_dict.get('dedup'), 'the descriptor')
+
+    @staticmethod
+    def __check_dedup_policy(policy, owner):
+        if policy is not None and policy not in DedupPolicies.all_policies:
+            raise DescriptorException('unknown dedup policy {} of {}, use one of {}'.format(
+                policy, owner, DedupPolicies.all_policies))
+
+        return policy
+
+    def get_compiled_uri_template(self, entity_name):
+        if entity_name in self.uri_templates:
+            return self.uri_templates[entity_name]
+
+    def build_entity_uri(self, entity_name, record_dict):
+        """
+        builds the entity URIs from the passed record using the entity's compiled uri template
+        :param entity_name: the entity name
+        :param record_dict: MultilevelDictionary wrapping the input record
+        :return: URI string, list of URIs or empty list if the template variables have no matches in the record
+        """
+        return devectorize_list(self.get_compiled_uri_template(entity_name).build_uris(record_dict.dict))
 
     def get_entity_path(self, entity_name):
         if entity_name in self.entities and 'path' in self.entities[entity_name]:
@@ -203,18 +310,29 @@ class Descriptor:
         :param subs_count: The number of uris that will be returned after the substitution
         :return: list of URIs [URI]
         """
-        if subs_count == 0:
-            return []
-
-        uris = [uri_template for _ in range(subs_count)]
+        return devectorize_list(UriTemplate.compile(uri_template).expand_all(substitutions, subs_count))
 
-        for path, subs in substitutions.items():
-            for i in range(len(uris)):
-                to_sub = '{{{}}}'.format(path)
-                sub = subs[i]
-                uris[i] = uris[i].replace(to_sub, sub if type(sub) is str else str(sub))
+    @staticmethod
+    def is_prefixed(term):
+        """
+        checks if the passed uri is in prefixed format or a normal URI
+        :param term: the term to check if prefixed
+        :return: True if in prefix format or False if a normal URI
+        """
+        return ':' in term and not (term.startswith('http:') or term.startswith('https:'))
 
-        return devectorize_list(uris)
+    @staticmethod
+    def get_term_components(term):
+        """
+        if the term is prefixed, this method returns a tuple (prefix, term_name) else returns the same URI
+        :param term: the uri to decompose into prefix and term name if prefixed
+        :return: tuple(prefix, term_name) if prefixed else term which is a normal URI
+        """
+        if Descriptor.is_prefixed(term):
+            comps = term.split(':')
+            return comps[0], comps[1]
+        else:
+            return term
 
     @staticmethod
     def get_relative_path(path, relative_to_path):
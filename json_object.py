@@ -1,6 +1,116 @@
-import json, os
+import json, os, re, time
+
+from utils.compression import open_file, detect_compression
 
 FILE_SIZE_STREAMING_THRESHOLD = 20 * 1024.0 * 1024.0
+READ_CHUNK_SIZE = 1024 * 1024
+MAX_RECORD_SIZE = 256 * 1024 * 1024
+
+# the characters that open and close values or start strings, and the rest of a string up to its closing quote
+STRUCTURE_RE = re.compile(r'[{}\[\]"]')
+STRING_END_RE = re.compile(r'(?:[^"\\]|\\.)*"', re.S)
+# the end of a top level value that is not an object, array or string
+SCALAR_END_RE = re.compile(r'[\s,\[\]{}]')
+
+
+def find_value_end(buffer, pos):
+    """
+    finds where the json value starting at pos ends by following the strings and the depth of the objects and arrays,
+    without checking the value is valid json
+    :param buffer: the json text
+    :param pos: the offset of the value's first character
+    :return: the offset after the value or None if the value does not end in the buffer
+    """
+    if buffer[pos] == '"':
+        string_end = STRING_END_RE.match(buffer, pos + 1)
+        return string_end.end() if string_end is not None else None
+
+    if buffer[pos] not in '{[':
+        if buffer[pos] in '}]':
+            return pos + 1
+        scalar_end = SCALAR_END_RE.search(buffer, pos)
+        return scalar_end.start() if scalar_end is not None else None
+
+    depth = 0
+    while True:
+        match = STRUCTURE_RE.search(buffer, pos)
+        if match is None:
+            return None
+
+        pos = match.end()
+        if match.group() == '"':
+            string_end = STRING_END_RE.match(buffer, pos)
+            if string_end is None:
+                return None
+            pos = string_end.end()
+        elif match.group() in '{[':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+class JsonLayouts:
+    """
+    how the records are laid out in a json file
+    Lines: one json object per line
+    Array: a top level json array of objects
+    Objects: concatenated or pretty printed json objects
+    """
+    Lines = 'lines'
+    Array = 'array'
+    Objects = 'objects'
+
+
+class JsonDecoders:
+    """
+    json decoding backends. Auto picks the first installed backend in the preference order and falls back to the
+    standard library json module. All the backends accept bytes so lines read in binary mode are decoded directly
+    """
+    Auto = 'auto'
+    Orjson = 'orjson'
+    Simdjson = 'simdjson'
+    Ujson = 'ujson'
+    Stdlib = 'json'
+
+    preference = [Orjson, Simdjson, Ujson, Stdlib]
+    all_backends = [Auto] + preference
+
+    @staticmethod
+    def get_decoder(backend=None):
+        """
+        imports the requested json backend
+        :param backend: one of JsonDecoders or None for Auto
+        :return: tuple(backend name, loads function accepting str or bytes)
+        """
+        candidates = JsonDecoders.preference if backend in (None, JsonDecoders.Auto) else [backend]
+
+        for name in candidates:
+            try:
+                module = __import__(name)
+                return name, module.loads
+            except ImportError:
+                if backend not in (None, JsonDecoders.Auto):
+                    print('json backend {} is not installed, falling back to {}'.format(name, JsonDecoders.Stdlib))
+
+        return JsonDecoders.Stdlib, json.loads
+
+    @staticmethod
+    def get_available_backends():
+        """
+        :return: list of the installed backend names
+        """
+        available = []
+
+        for name in JsonDecoders.preference:
+            try:
+                __import__(name)
+                available.append(name)
+            except ImportError:
+                pass
+
+        return available
 
 
 class JsonReader:
@@ -9,10 +119,10 @@ class JsonReader:
         self.filepath = filepath
 
     @staticmethod
-    def get_as_object(filepath):
+    def get_as_object(filepath, decoder=None):
         object_type = 0     #0 => wrong input, 1 => dictionary, 2 => list
         if JsonReader.check_file_exists(filepath):
-            with open(filepath) as f:
+            with open_file(filepath, 'r') as f:
                 for line in f:
                     line = line.strip()
 
@@ -23,59 +133,271 @@ class JsonReader:
                             object_type = 2
                         break
             if object_type == 1:
-                return JsonReader.get_as_dict(filepath)
+                return JsonReader.get_as_dict(filepath, decoder)
             elif object_type == 2:
-                return JsonReader.get_as_list(filepath)
+                return JsonReader.get_as_list(filepath, decoder)
             else:
                 return None
 
     @staticmethod
-    def get_as_dict(filepath):
+    def get_as_dict(filepath, decoder=None):
         if JsonReader.check_file_exists(filepath):
-            with open(filepath, 'r') as f:
+            with open_file(filepath, 'rb') as f:
                 try:
-                    return json.load(f)
+                    return (decoder or json.loads)(f.read())
                 except Exception as ex:
                     print(str(ex))
 
     @staticmethod
-    def get_as_list(filepath):
+    def get_as_list(filepath, decoder=None):
         if JsonReader.check_file_exists(filepath):
-            with open(filepath, 'r') as f:
+            with open_file(filepath, 'rb') as f:
                 try:
-                    return json.load(f)
+                    return (decoder or json.loads)(f.read())
                 except Exception as ex:
                     print(str(ex))
 
     @staticmethod
-    def get_as_dict_streamed(filepath):
+    def get_as_dict_streamed(filepath, decoder=None, read_stats=None):
+        """
+        streams the json lines of the file. Lines are read in blocks and decoded as bytes. Compressed files are
+        decompressed on the fly
+        :param filepath: the json lines file path
+        :param decoder: loads function of one of JsonDecoders. Defaults to the standard library json
+        :param read_stats: utils.compression.ReadStats accumulating the bytes read and the read time
+        :return: generator of dictionaries
+        """
+        for lines in JsonReader.get_line_blocks(filepath, read_stats=read_stats):
+            for record in JsonReader.decode_lines(lines, decoder):
+                yield record
+
+    @staticmethod
+    def get_line_blocks(filepath, block_size=READ_CHUNK_SIZE, read_stats=None):
+        """
+        reads the (decompressed) lines of the file in blocks of about block_size bytes
+        :param filepath: the file path
+        :param block_size: the approximate size of a block in bytes
+        :param read_stats: utils.compression.ReadStats accumulating the bytes read and the read time
+        :return: generator of lists of lines as bytes
+        """
         if JsonReader.check_file_exists(filepath):
-            with open(filepath, 'r') as f:
-                for line in f:
+            with open_file(filepath, 'rb') as f:
+                if read_stats is not None:
+                    read_stats.track(f)
+
+                while True:
+                    start_time = time.time()
+                    lines = f.readlines(block_size)
+
+                    if read_stats is not None:
+                        read_stats.read_time += time.time() - start_time
+                        read_stats.bytes_read += sum(len(line) for line in lines)
+
+                    if len(lines) == 0:
+                        break
+                    yield lines
+
+    @staticmethod
+    def decode_lines(lines, decoder=None):
+        """
+        decodes the json objects of a block of json lines. Lines that are not json objects are skipped
+        :param lines: list of lines as bytes
+        :param decoder: loads function of one of JsonDecoders. Defaults to the standard library json
+        :return: generator of dictionaries
+        """
+        loads = decoder if decoder is not None else json.loads
+
+        for line in lines:
+            try:
+                line = line.strip()
+                if line.startswith(b'{') and line.endswith(b'}'):
+                    yield loads(line)
+            except Exception as ex:
+                print(str(ex))
+
+    @staticmethod
+    def get_as_dict_streamed_range(filepath, start, end, decoder=None):
+        """
+        streams the json lines that start within the byte range [start, end) of the file. The range boundaries must be
+        line aligned as returned by get_line_aligned_ranges
+        :param filepath: the json lines file path
+        :param start: the offset of the first line of the range
+        :param end: the offset after the last line of the range
+        :param decoder: loads function of one of JsonDecoders. Defaults to the standard library json
+        :return: generator of dictionaries
+        """
+        loads = decoder if decoder is not None else json.loads
+
+        if JsonReader.check_file_exists(filepath):
+            with open(filepath, 'rb') as f:
+                f.seek(start)
+                position = start
+
+                while position < end:
+                    line = f.readline()
+                    if len(line) == 0:
+                        break
+                    position += len(line)
+
                     try:
                         line = line.strip()
-                        if line.startswith('{') and line.endswith('}'):
-                            yield json.loads(line)
+                        if line.startswith(b'{') and line.endswith(b'}'):
+                            yield loads(line)
                     except Exception as ex:
                         print(str(ex))
 
+    @staticmethod
+    def get_line_aligned_ranges(filepath, ranges_count, offset=0):
+        """
+        splits the file into ranges_count byte ranges of about the same size. Every range starts at the beginning of a
+        line and ends after the end of a line so every line belongs to exactly one range
+        :param filepath: the file path
+        :param ranges_count: the number of ranges to split the file into
+        :param offset: the line aligned offset the first range starts at, e.g. after a header line
+        :return: list of tuple(start, end) byte offsets
+        """
+        ranges = []
+
+        if JsonReader.check_file_exists(filepath):
+            file_size = os.path.getsize(filepath)
+            range_size = max(1, (file_size - offset) // max(1, ranges_count))
+
+            with open(filepath, 'rb') as f:
+                start = offset
+                while start < file_size:
+                    f.seek(min(start + range_size, file_size))
+                    if f.tell() < file_size:
+                        f.readline()
+                    end = f.tell()
+                    ranges.append((start, end))
+                    start = end
+
+        return ranges
+
+    @staticmethod
+    def is_json_lines(filepath):
+        """
+        checks whether the file has one json object per line by looking at its first non empty line
+        :param filepath: the file path
+        :return: True if the first non empty line is a complete json object
+        """
+        return JsonReader.get_layout(filepath) == JsonLayouts.Lines
+
+    @staticmethod
+    def get_as_dict_incremental(filepath, chunk_size=READ_CHUNK_SIZE, read_stats=None):
+        """
+        incrementally parses a top level json array of objects or concatenated/pretty printed json objects and yields
+        the objects one by one. Only the current chunk and the object being parsed are kept in memory. The objects are
+        decoded by the standard library json module whatever the json backend.
+        A malformed object is skipped up to its end, found by following its strings, braces and brackets, so parsing
+        continues with the next object of the array whatever the line layout. An object that never closes, within
+        MAX_RECORD_SIZE characters or before the end of the file, is skipped up to the next '{'
+        :param filepath: the json file path
+        :param chunk_size: the number of characters read from the file at a time
+        :param read_stats: utils.compression.ReadStats accumulating the characters read and the read time
+        :return: generator of dictionaries
+        """
+        if JsonReader.check_file_exists(filepath):
+            decoder = json.JSONDecoder()
+
+            with open_file(filepath, 'r') as f:
+                if read_stats is not None:
+                    read_stats.track(f)
+
+                def read(size):
+                    start_time = time.time()
+                    chunk = f.read(size)
+                    if read_stats is not None:
+                        read_stats.read_time += time.time() - start_time
+                        read_stats.bytes_read += len(chunk)
+                    return chunk
+
+                buffer = ''
+                pos = 0
+                eof = False
+
+                while True:
+                    # skip the whitespaces and the array brackets and commas between top level objects
+                    while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+                        pos += 1
+
+                    if pos >= len(buffer):
+                        if eof:
+                            break
+                        buffer = read(chunk_size)
+                        pos = 0
+                        eof = len(buffer) == 0
+                        continue
+
+                    try:
+                        obj, pos = decoder.raw_decode(buffer, pos)
+                        if type(obj) is dict:
+                            yield obj
+                        continue
+                    except ValueError as ex:
+                        error = ex
+
+                    value_end = find_value_end(buffer, pos)
+                    if value_end is not None:
+                        # the value is complete but malformed
+                        print(str(error))
+                        pos = value_end
+                    elif not eof and len(buffer) - pos < MAX_RECORD_SIZE:
+                        # the object is not complete yet. Read at least as much as what is already buffered so
+                        # large objects are re-parsed a logarithmic number of times only
+                        chunk = read(max(chunk_size, len(buffer) - pos))
+                        eof = len(chunk) == 0
+                        buffer = buffer[pos:] + chunk
+                        pos = 0
+                    else:
+                        print('skipping a json value that does not end: {}'.format(str(error)))
+                        next_object = buffer.find('{', pos + 1)
+                        pos = next_object if next_object >= 0 else len(buffer)
+
+    @staticmethod
+    def get_layout(filepath):
+        """
+        guesses how the records are laid out in the json file by looking at the file's first non empty line
+        :param filepath: the file path
+        :return: one of JsonLayouts or None if the file has no json content
+        """
+        if JsonReader.check_file_exists(filepath):
+            with open_file(filepath, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if len(line) > 0:
+                        if line.startswith(b'['):
+                            return JsonLayouts.Array
+                        elif line.startswith(b'{') and line.endswith(b'}'):
+                            return JsonLayouts.Lines
+                        elif line.startswith(b'{'):
+                            return JsonLayouts.Objects
+                        return None
+
     @staticmethod
     def get_as_str(filepath):
         if JsonReader.check_file_exists(filepath):
-            with open(filepath, 'r') as f:
+            with open_file(filepath, 'r') as f:
                 return f.read()
 
     @staticmethod
     def get_as_str_streamed(filepath):
         if JsonReader.check_file_exists(filepath):
-            with open(filepath, 'r') as f:
+            with open_file(filepath, 'r') as f:
                 for line in f:
                     if line.startswith('{') and line.endswith('}'):
                         yield line
 
     @staticmethod
     def should_be_streamed(filepath):
-        return os.path.getsize(filepath) > FILE_SIZE_STREAMING_THRESHOLD if os.path.exists(filepath) else False
+        """
+        large files are streamed. Compressed files are always streamed since their decompressed size is unknown
+        :param filepath: the file path
+        :return: True if the file should be streamed
+        """
+        if not os.path.exists(filepath):
+            return False
+        return detect_compression(filepath) is not None or os.path.getsize(filepath) > FILE_SIZE_STREAMING_THRESHOLD
 
     @staticmethod
     def check_file_exists(filepath):
@@ -0,0 +1,141 @@
+"""
+records the progress of long transformations so an interrupted run can resume from its last checkpoint
+"""
+import glob
+import json
+import os
+import shutil
+
+CHECKPOINT_INTERVAL = 60
+
+
+class Checkpoint:
+    """
+    The manager numbers every unit of work it schedules. Once an exporter has closed the output chunk files holding all
+    the triples of a unit, it commits the unit and the closed chunk files in its own state file. A resumed run skips
+    the committed units, removes the chunk files nobody committed and lets every exporter continue numbering its chunk
+    files after its last committed one, so only the uncommitted tail of the input is transformed again.
+
+    The checkpoint directory sits next to the output, e.g. graph.nt.checkpoint, and holds manifest.json, describing the
+    run a checkpoint belongs to, and one exporter_<no>.json per exporter
+    """
+
+    def __init__(self, output_file, interval=CHECKPOINT_INTERVAL):
+        """
+        :param output_file: the output file path
+        :param interval: the minimum time between the checkpoints of an exporter in seconds
+        """
+        self.directory = output_file.rstrip('/') + '.checkpoint'
+        self.interval = interval
+        self.manifest = None
+        self.exporter_states = {}
+        self.committed_units = set()
+
+    def start(self, manifest, resume=False):
+        """
+        loads the previous checkpoint if resuming and it belongs to the same run, otherwise starts a new checkpoint
+        :param manifest: dictionary describing the run (input file, buffer size, export format ...). A resumed run must
+        have the same manifest, except for the input ranges which are taken from the checkpoint
+        :param resume: continue from the previous checkpoint
+        :return: True if the previous checkpoint was loaded
+        """
+        if resume and self.__load(manifest):
+            return True
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+        self.manifest = manifest
+        self.exporter_states = {}
+        self.committed_units = set()
+        self.__write_json('manifest.json', manifest)
+        return False
+
+    def is_committed(self, unit_no):
+        """
+        :param unit_no: the sequence number of a unit of work
+        :return: True if the triples of the unit are in committed chunk files
+        """
+        return unit_no in self.committed_units
+
+    def get_exporter_state(self, exporter_no):
+        """
+        returns the committed state of an exporter
+        :param exporter_no: the exporter number
+        :return: dictionary with the committed units as {unit_no: input position}, the committed chunk files and the
+        save counter of the last committed chunk file
+        """
+        state = self.exporter_states.get(exporter_no, {'exporter_no': exporter_no, 'units': {}, 'chunks': [],
+                                                       'save_counter': 0})
+        return {'exporter_no': exporter_no, 'units': dict(state['units']), 'chunks': list(state['chunks']),
+                'save_counter': state['save_counter']}
+
+    def save_exporter_state(self, state):
+        """
+        atomically replaces the state file of an exporter. Called by the exporters, possibly in other processes
+        :param state: dictionary as returned by get_exporter_state
+        :return: None
+        """
+        self.__write_json('exporter_{}.json'.format(state['exporter_no']), state)
+
+    def remove_uncommitted_chunks(self, get_chunk_filename):
+        """
+        removes the chunk files written after the last checkpoint of every exporter. Chunk files are numbered
+        sequentially per exporter, so the files following the last committed one are removed until a number is missing
+        :param get_chunk_filename: function(exporter_no, save_counter) returning the chunk file path
+        :return: the number of removed files
+        """
+        removed_count = 0
+
+        for exporter_no, state in self.exporter_states.items():
+            save_counter = state['save_counter'] + 1
+            while os.path.exists(get_chunk_filename(exporter_no, save_counter)):
+                os.remove(get_chunk_filename(exporter_no, save_counter))
+                removed_count += 1
+                save_counter += 1
+
+        return removed_count
+
+    def get_committed_chunks_count(self):
+        return sum([len(state['chunks']) for state in self.exporter_states.values()])
+
+    def __load(self, manifest):
+        try:
+            with open(os.path.join(self.directory, 'manifest.json')) as f:
+                previous_manifest = json.load(f)
+        except (IOError, ValueError):
+            print('no checkpoint found in {}, starting from the beginning'.format(self.directory))
+            return False
+
+        changed = [key for key in manifest if key != 'ranges' and manifest[key] != previous_manifest.get(key)]
+        if len(changed) > 0:
+            print('the checkpoint in {} belongs to another run ({} changed), starting from the beginning'.format(
+                self.directory, ', '.join(changed)))
+            return False
+
+        self.manifest = previous_manifest
+        self.exporter_states = {}
+
+        for path in glob.glob(os.path.join(self.directory, 'exporter_*.json')):
+            with open(path) as f:
+                state = json.load(f)
+            state['units'] = {int(unit_no): position for unit_no, position in state['units'].items()}
+            self.exporter_states[state['exporter_no']] = state
+
+        if self.manifest.get('partitions'):
+            # the triples of a unit partitioned by subject are spread over all the exporters, all of them must commit it
+            states = list(self.exporter_states.values())
+            self.committed_units = set(states[0]['units']).intersection(*[state['units'] for state in states[1:]]) \
+                if len(states) >= self.manifest['partitions'] else set()
+        else:
+            self.committed_units = set(unit_no for state in self.exporter_states.values()
+                                       for unit_no in state['units'])
+        return True
+
+    def __write_json(self, name, obj):
+        path = os.path.join(self.directory, name)
+
+        with open(path + '.tmp', 'w') as f:
+            json.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
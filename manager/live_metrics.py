@@ -0,0 +1,196 @@
+"""
+samples the throughput of a running transformation at a fixed interval
+"""
+import json
+import threading
+import time
+
+METRICS_INTERVAL = 10
+
+
+class LiveMetricsSampler:
+    """
+    runs on a thread of the manager process next to the statistics collector. Every interval it reads the statistics
+    collected since the previous sample and reports the records/s, triples/s and bytes/s of every transformer and
+    exporter, the depths of the queues and the progress through the input with an ETA. Every sample is printed and
+    appended as a json line to the metrics file if there is one
+    """
+
+    def __init__(self, metrics, interval=METRICS_INTERVAL, output_file=None):
+        """
+        :param metrics: the TransformationMetrics object collecting the statistics
+        :param interval: the time between samples in seconds
+        :param output_file: the json lines file the samples are appended to. Default no file
+        """
+        self.metrics = metrics
+        self.manager = metrics.manager
+        self.interval = interval
+        self.output_file = output_file
+        self.stopped = threading.Event()
+        self.thread = None
+        self.start_time = None
+        self.last_time = None
+        # the number of messages of every statistics buffer already accounted for
+        self.read_counts = {}
+        self.totals = {}
+        self.samples_count = 0
+
+    def start(self):
+        """
+        starts sampling on a background thread
+        :return: None
+        """
+        self.start_time = self.last_time = time.time()
+        self.read_counts = {}
+        self.totals = {'records': 0, 'triples': 0, 'exported': 0, 'input_bytes': 0}
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        stops sampling and takes a last sample covering the end of the run
+        :return: None
+        """
+        if self.thread is None:
+            return
+
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        self.report(self.sample())
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report(self.sample())
+
+    def sample(self):
+        """
+        reads the statistics collected since the previous sample
+        :return: the sample as a json serializable dictionary
+        """
+        now = time.time()
+        elapsed = max(now - self.last_time, 1e-9)
+        self.last_time = now
+
+        transformers = {}
+        for info in self.__read_new('transformers_msg_buffer'):
+            stats = transformers.setdefault(info.thread_no, {'records': 0, 'triples': 0, 'bytes': 0})
+            stats['records'] += info.records_count
+            stats['triples'] += info.triples_count
+
+        exporters = {}
+        for info in self.__read_new('exporters_msg_buffer'):
+            exporters.setdefault(info.thread_no, {'triples': 0, 'bytes': 0})['triples'] += info.triples_count
+
+        for info in self.__read_new('serialization_msg_buffer'):
+            if info.thread_type == 'transformer':
+                stats = transformers.setdefault(info.thread_no, {'records': 0, 'triples': 0, 'bytes': 0})
+            else:
+                stats = exporters.setdefault(info.thread_no, {'triples': 0, 'bytes': 0})
+            stats['bytes'] += info.payload_bytes
+
+        records_count = sum([stats['records'] for stats in transformers.values()])
+        triples_count = sum([stats['triples'] for stats in transformers.values()])
+        self.totals['records'] += records_count
+        self.totals['triples'] += triples_count
+        self.totals['exported'] += sum([stats['triples'] for stats in exporters.values()])
+
+        input_size, input_position = self.get_input_progress()
+        input_bytes = input_position - self.totals['input_bytes'] if input_position is not None else 0
+        if input_position is not None:
+            self.totals['input_bytes'] = input_position
+        progress = float(input_position) / input_size if input_position is not None and input_size else None
+        run_time = now - self.start_time
+        eta = run_time * (1 - progress) / progress if progress else None
+
+        return {'time': now,
+                'elapsed': run_time,
+                'records': self.totals['records'],
+                'triples': self.totals['triples'],
+                'exported_triples': self.totals['exported'],
+                'records_per_second': records_count / elapsed,
+                'triples_per_second': triples_count / elapsed,
+                'input_bytes_per_second': input_bytes / elapsed,
+                'transformers': {str(thread_no): LiveMetricsSampler.__get_rates(stats, elapsed)
+                                 for thread_no, stats in sorted(transformers.items())},
+                'exporters': {str(thread_no): LiveMetricsSampler.__get_rates(stats, elapsed)
+                              for thread_no, stats in sorted(exporters.items())},
+                'queues': self.get_queue_depths(),
+                'input_position': input_position,
+                'input_size': input_size,
+                'progress': progress,
+                'eta': eta}
+
+    def get_input_progress(self):
+        """
+        :return: tuple(input file size in bytes, offset reached in the input or None if it is not known). When the
+        transformers read byte ranges the offset is the size of the ranges they finished
+        """
+        importer = self.manager.importer
+        read_stats = getattr(importer, 'read_stats', None)
+        if read_stats is None:
+            return None, None
+
+        if self.manager.parallel_ingest and importer.supports_ranges():
+            return read_stats.compressed_bytes, sum([info.input_bytes for info in
+                                                     list(self.metrics.input_progress_msg_buffer)])
+        return read_stats.compressed_bytes, read_stats.get_position()
+
+    def get_queue_depths(self):
+        """
+        :return: dictionary of the number of messages waiting in the work queue, every exporter queue and the statistics
+        queue. None where the platform cannot tell
+        """
+        queues = [('work', self.manager.work_queue)]
+        if not self.manager.inline_exporters:
+            queues += [('exporter_{}'.format(exporter.exporter_no), exporter.input_queue)
+                       for exporter in self.manager.exporters]
+        queues.append(('stats', self.metrics.stats_queue))
+
+        depths = {}
+        for name, queue in queues:
+            try:
+                depths[name] = queue.qsize()
+            except NotImplementedError:     # qsize is not available on macOS
+                depths[name] = None
+
+        return depths
+
+    def report(self, sample):
+        """
+        prints the sample and appends it to the metrics file
+        :param sample: dictionary returned by sample
+        :return: None
+        """
+        self.samples_count += 1
+        progress = ' {:.1f}%'.format(100 * sample['progress']) if sample['progress'] is not None else ''
+        progress += ' ETA {}'.format(LiveMetricsSampler.__format_time(sample['eta'])) if sample['eta'] is not None \
+            else ''
+        print('live metrics:{} {:.0f} records/s {:.0f} triples/s {:.2f} MB/s input, queues {}'.format(
+            progress, sample['records_per_second'], sample['triples_per_second'],
+            sample['input_bytes_per_second'] / 1024.0 / 1024.0,
+            ' '.join(['{}={}'.format(name, depth) for name, depth in sample['queues'].items()])))
+        print('live metrics: transformers triples/s {} exporters triples/s {}'.format(
+            [round(stats['triples_per_second']) for stats in sample['transformers'].values()],
+            [round(stats['triples_per_second']) for stats in sample['exporters'].values()]))
+
+        if self.output_file is not None:
+            with open(self.output_file, 'a') as f:
+                f.write(json.dumps(sample) + '\n')
+
+    def __read_new(self, buffer_name):
+        buffer = getattr(self.metrics, buffer_name)
+        start = self.read_counts.get(buffer_name, 0)
+        new_messages = buffer[start:]
+        self.read_counts[buffer_name] = start + len(new_messages)
+        return new_messages
+
+    @staticmethod
+    def __get_rates(stats, elapsed):
+        return {name + '_per_second': count / elapsed for name, count in stats.items()}
+
+    @staticmethod
+    def __format_time(seconds):
+        seconds = int(seconds)
+        return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
@@ -2,18 +2,39 @@
 connects the transformation pipeline stages together
 """
 import math
+import multiprocessing as mp
 import os
 import pickle
 import time
 
-from DataExporters.data_exporter import DataExporter
-from DataImporters.json_data_importer import JsonDataImporter
+from DataExporters.data_exporter import DataExporter, RDFExportFormats
+from DataExporters.graph_store import GraphStores
+from DataExporters.ntriples_sorter import NTriplesSorter, SORT_MEMORY_BUDGET
+from DataExporters.sparql_sink import SparqlProtocols, BATCH_SIZE as SPARQL_BATCH_SIZE, CONNECTIONS_COUNT
+from DataImporters.csv_data_importer import CsvDataImporter
+from DataImporters.json_data_importer import JsonDataImporter, ImportFormats
+from DataImporters.xml_data_importer import XmlDataImporter
 from DataTransformers.data_transformer import DataTransformer
-from DataTransformers.Entity import EndMessage
+from DataTransformers.Entity import EndMessage, InputRangeMessage, RawRecordsMessage, JobMessage, ShutdownMessage, \
+    CheckpointedUnitMessage
+from DataTransformers.triple_codec import WireFormats
 from descriptor import Descriptor
-from manager.transformation_metrics import TransformationMetrics, TimeStampMessage
+from manager.checkpoint import Checkpoint, CHECKPOINT_INTERVAL
+from manager.live_metrics import METRICS_INTERVAL
+from manager.transformation_metrics import TransformationMetrics, TimeStampMessage, DecompressionInfo, \
+    QueueDepthTracker
+from utils.compression import Compressions, detect_compression, strip_compression_extension
 from utils.file_format_manager import FileFormatManager
 
+INPUT_RANGE_SIZE = 64 * 1024 * 1024
+# input files are split into at least this many byte ranges per transformer so the ranges can be balanced
+RANGES_PER_TRANSFORMER = 4
+# default capacities of the bounded queues, in batches
+WORK_QUEUE_SIZE_PER_TRANSFORMER = 2
+EXPORTER_QUEUE_SIZE = 4
+STATS_QUEUE_SIZE = 10000
+SEEN_ENTITIES_CACHE_SIZE = 100000
+
 
 class TransformationManager:
     """
@@ -21,7 +42,16 @@ class TransformationManager:
     """
 
     def __init__(self, graph_identifier, input_file, output_file, descriptor_file, export_format=None,
-                 parallelism=None, inline_exporters=False, buffer_size=1000, max_graph_size=50000):
+                 parallelism=None, inline_exporters=False, buffer_size=1000, max_graph_size=50000,
+                 wire_format=WireFormats.Auto, parallel_ingest=False, json_backend=None, output_compression=None,
+                 compression_level=None, csv_delimiter=None, coerce_types=False, work_queue_size=None,
+                 exporter_queue_size=EXPORTER_QUEUE_SIZE, stats_queue_size=STATS_QUEUE_SIZE, service_mode=False,
+                 checkpoint_interval=None, resume=False, dedup_policy=None,
+                 dedup_cache_size=SEEN_ENTITIES_CACHE_SIZE, partition_by_subject=False, sorted_output=None,
+                 sort_memory=SORT_MEMORY_BUDGET, sparql_endpoint=None, sparql_protocol=SparqlProtocols.GraphStore,
+                 sparql_batch_size=SPARQL_BATCH_SIZE, sparql_connections=CONNECTIONS_COUNT,
+                 graph_store=GraphStores.Memory, graph_store_dir=None, metrics_interval=None, metrics_file=None,
+                 profile=False):
         """
         initializing the transformation manager with all the information needed to perform the whole transformation
         process
@@ -35,34 +65,153 @@ class TransformationManager:
         :param buffer_size: records buffer size before processing or passing over
         :param max_graph_size: the maximum graph size after which the rdflib graph has to be saved to disk to free up
         memory
+        :param wire_format: the encoding of triple batches sent from transformers to exporters as defined in WireFormats
+        :param parallel_ingest: split the input file into line aligned byte ranges that transformers read and parse
+        themselves instead of parsing every record in the manager process. Compressed json lines files are decompressed
+        by the manager and parsed by the transformers
+        :param json_backend: the json decoding backend as defined in JsonDecoders. Default the fastest installed one
+        :param output_compression: compress the exported files with one of Compressions.output_codecs. Default guessed
+        from the output file extension, e.g. graph.nt.gz
+        :param compression_level: the output compression level. Default the codec's default level
+        :param csv_delimiter: the field delimiter of csv/tsv input files. Default tab for .tsv and comma otherwise
+        :param coerce_types: convert numeric and boolean csv/tsv cells to numbers and booleans instead of strings
+        :param work_queue_size: the capacity of the transformers work queue in batches. The manager stops reading the
+        input while it is full. Default 2 batches per transformer
+        :param exporter_queue_size: the capacity of every exporter input queue in triple batches. Transformers stop
+        pulling work while their exporter's queue is full
+        :param stats_queue_size: the capacity of the statistics queue in messages
+        :param service_mode: keep the transformers and exporters alive between transformations so the manager can run
+        any number of jobs with run_job. The input and output passed here are ignored
+        :param checkpoint_interval: commit the transformed units of work and the complete output files at most every
+        checkpoint_interval seconds so an interrupted run can be resumed. Default no checkpoints
+        :param resume: skip the input committed by the checkpoint of a previous run of the same transformation and
+        continue writing new output files. Enables checkpoints
+        :param dedup_policy: the policy for entities a transformer already emitted, as defined in DedupPolicies, of the
+        entities whose descriptor entry has no 'dedup' key. Default the descriptor level 'dedup' key or always emit
+        :param dedup_cache_size: the number of emitted entities every transformer remembers for deduplication
+        :param partition_by_subject: route every triple to the exporter owning the crc32 hash of its subject instead of
+        the transformer's own exporter, so every exporter writes all the triples of its subjects and no other exporter
+        writes triples of them. Needs separate exporter processes
+        :param sorted_output: once the exporters are done, merge their N-Triples/N-Quads files into this single sorted
+        file without duplicates, compressed if it ends with .gz or .zst
+        :param sort_memory: the memory budget of the merge sort in bytes
+        :param sparql_endpoint: load the triples into this SPARQL endpoint over HTTP instead of writing output files.
+        The graph identifier names the target graph
+        :param sparql_protocol: the protocol of the endpoint as defined in SparqlProtocols
+        :param sparql_batch_size: the number of triples sent per request
+        :param sparql_connections: the number of keep-alive connections, and requests in flight, per exporter
+        :param graph_store: the rdflib store, as defined in GraphStores, the exporters accumulate graphs in before
+        serializing formats that are not line based. Disk stores hold graphs of max_graph_size triples in bounded memory
+        :param graph_store_dir: the directory of the disk graphs. Default the system temp directory
+        :param metrics_interval: print the throughput, queue depths and ETA of the running transformation every
+        metrics_interval seconds. Default no live metrics, or every 10 seconds if metrics_file is passed
+        :param metrics_file: append the live metrics samples to this json lines file
+        :param profile: the transformers record the wall time, key path matches and triples of every entity and property
+        of the descriptor and the calls of every apply function, and the run metrics print them ranked by time
         """
-        self.graph_identifier = graph_identifier
-        self.input_file = input_file
-        self.output_file = output_file
+        self.sparql_endpoint = sparql_endpoint
+        self.sparql_protocol = sparql_protocol
+        self.sparql_batch_size = sparql_batch_size
+        self.sparql_connections = sparql_connections
+        self.requested_output_compression = output_compression
+        self.requested_wire_format = wire_format
+        self.compression_level = compression_level
+        self.descriptor_file = descriptor_file
         self.descriptor = Descriptor(descriptor_file)
-        self.export_format = export_format if export_format is not None \
-            else FileFormatManager.guess_export_format(self.output_file)
+        self.set_job(graph_identifier, input_file, output_file, export_format)
         self.inline_exporters = inline_exporters
         self.buffer_size = buffer_size
         self.max_graph_size = max_graph_size
+        self.parallel_ingest = parallel_ingest
+        self.dedup_policy = dedup_policy
+        self.dedup_cache_size = dedup_cache_size
+        self.partition_by_subject = partition_by_subject and not inline_exporters
+        self.sorted_output = sorted_output
+        self.sort_memory = sort_memory
+        self.graph_store = GraphStores.resolve(graph_store)
+        self.graph_store_dir = graph_store_dir
+        self.metrics_interval = metrics_interval if metrics_interval or not metrics_file else METRICS_INTERVAL
+        self.metrics_file = metrics_file
+        self.profile = profile
+        if partition_by_subject and inline_exporters:
+            print('partitioning by subject needs separate exporter processes, inline exporters are not partitioned')
+        self.json_backend = json_backend
+        self.csv_delimiter = csv_delimiter
+        self.coerce_types = coerce_types
         self.importer = None
         self.transformers = []
-        self.transformers_queues = []
+        self.work_queue = None
+        self.records_buffer = []
         self.exporters = []
         self.parallelism = parallelism if parallelism is not None else max(os.cpu_count() - 1, 1)
+        self.work_queue_size = work_queue_size if work_queue_size else self.parallelism * WORK_QUEUE_SIZE_PER_TRANSFORMER
+        self.exporter_queue_size = exporter_queue_size
+        self.stats_queue_size = stats_queue_size
+        self.work_queue_tracker = QueueDepthTracker('work', 0, self.work_queue_size)
+        self.service_mode = service_mode
+        # in service mode every transformer waits here after taking its JobMessage or EndMessage so each of them takes
+        # exactly one of the job boundary messages from the shared work queue
+        self.job_barrier = mp.Barrier(self.parallelism) if service_mode else None
+        self.resume = resume
+        self.checkpoint = None
+        if (checkpoint_interval or resume) and not service_mode:
+            self.checkpoint = Checkpoint(self.output_file if self.output_file else self.graph_identifier,
+                                         checkpoint_interval if checkpoint_interval else CHECKPOINT_INTERVAL)
+        self.units_count = 0
+        self.skipped_units_count = 0
+        self.scheduled_records_count = 0
         self.metrics_manager = TransformationMetrics(self)
 
         self.build_transformation_pipeline()
 
+    def set_job(self, graph_identifier, input_file, output_file, export_format=None):
+        """
+        points the manager to the input and output of the next transformation
+        :param graph_identifier: unique identifier for the graph under processing
+        :param input_file: the input file path
+        :param output_file: the output file path
+        :param export_format: the format used to export the generated graph. Default guessed from the output file
+        :return: None
+        """
+        self.graph_identifier = graph_identifier
+        self.input_file = input_file
+        self.output_compression = self.__resolve_output_compression(self.requested_output_compression, output_file)
+        self.output_file = strip_compression_extension(output_file) if output_file else output_file
+        self.export_format = export_format if export_format is not None \
+            else FileFormatManager.guess_export_format(self.output_file or '')
+        if self.sparql_endpoint is not None and self.export_format != RDFExportFormats.NT:
+            print('the SPARQL sink loads {} batches, the {} export format is ignored'.format(RDFExportFormats.NT,
+                                                                                        self.export_format))
+            self.export_format = RDFExportFormats.NT
+        self.wire_format = self.__resolve_wire_format(self.requested_wire_format)
+
+    def get_job_settings(self):
+        """
+        the job attributes the workers copy from the JobMessage in service mode
+        :return: dictionary
+        """
+        return {'graph_identifier': self.graph_identifier, 'input_file': self.input_file,
+                'output_file': self.output_file, 'export_format': self.export_format, 'wire_format': self.wire_format,
+                'output_compression': self.output_compression, 'importer': self.importer}
+
+    def apply_job_settings(self, settings):
+        """
+        copies the settings of a JobMessage into this manager. Called on the workers' copies of the manager
+        :param settings: dictionary created by get_job_settings
+        :return: None
+        """
+        for name, value in settings.items():
+            setattr(self, name, value)
+
     def build_transformation_pipeline(self):
         """
         Builds the transformers and exporters objects and connects them together considering if the inline_exporters flag
         is set or not. If set, all transformers will have a copy of the exporter and no separate exporter process will
         be spawned. If not set, the exporters will be spawned in a separate process and triples are passed to them from
-        transformers via multiprocessing.Queue
+        transformers via multiprocessing.Queue. All transformers pull their work from a single shared work queue
         :return:
         """
-        self.importer = self.__create_importer()
+        self.importer = self.__create_importer() if self.input_file else None
 
         if self.inline_exporters:
             exporter = DataExporter(manager=self,
@@ -70,16 +219,21 @@ class TransformationManager:
                                     max_graph_size=self.max_graph_size)
             self.exporters = exporter
 
-        self.transformers = [DataTransformer(self, self.metrics_manager.stats_queue) for _ in range(self.parallelism)]
-        self.transformers_queues = [[] for _ in range(self.parallelism)]
+        self.work_queue = mp.Queue(self.work_queue_size)
+        self.transformers = [DataTransformer(self, self.metrics_manager.stats_queue, in_queue=self.work_queue)
+                             for _ in range(self.parallelism)]
 
         if not self.inline_exporters:
             self.exporters = [DataExporter(manager=self,
                                            stats_queue=self.metrics_manager.stats_queue,
+                                           input_queue=mp.Queue(self.exporter_queue_size),
                                            max_graph_size=self.max_graph_size)
                               for _ in range(self.parallelism)]
             for i, transformer in enumerate(self.transformers):
-                transformer.connect_to_exporter(self.exporters[i])
+                if self.partition_by_subject:
+                    transformer.connect_to_all_exporters(self.exporters)
+                else:
+                    transformer.connect_to_exporter(self.exporters[i])
 
     def bootstrap_pipeline(self):
         """
@@ -93,65 +247,316 @@ class TransformationManager:
 
     def run(self):
         """
-        the entry point to run the whole pipeline logic starting by reading the records and then passing it to
-        transformers in a round robin fashion
-        :return:
+        the entry point to run the whole pipeline logic starting by reading the records and then putting them in
+        batches on the shared work queue. Transformers pull the next batch whenever they are done with the previous
+        one, so a transformer stuck on expensive records does not hold back work the others could do
+        :return: False if some triples could not be loaded into the SPARQL endpoint, True otherwise
         """
         self.metrics_manager.stats_queue.put(pickle.dumps(TimeStampMessage(0, None, 'start', time.time())))
+        if self.checkpoint is not None:
+            self.start_checkpoint()
         self.bootstrap_pipeline()
+        self.metrics_manager.start()
+
+        self.schedule_input()
+        self.finish_input()
+
+        self.metrics_manager.wait()
+        if self.sorted_output is not None:
+            self.sort_output()
+        self.metrics_manager.print_metrics()
+        if self.skipped_units_count > 0:
+            print('units of work skipped as committed by the checkpoint: {}'.format(self.skipped_units_count))
+
+        failed_batches_count = self.metrics_manager.get_failed_batches_count()
+        if failed_batches_count > 0:
+            print('{} batches could not be loaded into {}'.format(failed_batches_count, self.sparql_endpoint))
+            return False
+        return True
+
+    def sort_output(self):
+        """
+        merges the output files of all the exporters into a single sorted file without duplicates using an external merge
+        sort running on parallelism processes
+        :return: None
+        """
+        if self.sparql_endpoint is not None:
+            print('the triples were loaded into {}, there are no output files to sort'.format(self.sparql_endpoint))
+            return
+
+        if not RDFExportFormats.is_line_based_format(self.export_format):
+            print('sorting the output needs a line based export format {}, not {}'.format(
+                RDFExportFormats.line_based_formats, self.export_format))
+            return
+
+        filepath = self.output_file if self.output_file is not None else self.graph_identifier
+        chunk_files = DataExporter.get_chunk_files(filepath, self.export_format, self.output_compression)
+        print('sorting {} output files into {}'.format(len(chunk_files), self.sorted_output))
+
+        sorter = NTriplesSorter(self.sort_memory, self.parallelism)
+        self.metrics_manager.sort_stats = sorter.sort(chunk_files, self.sorted_output, level=self.compression_level)
+
+    def start_checkpoint(self):
+        """
+        starts a new checkpoint or, when resuming, loads the previous one and removes the output files written after it
+        :return: None
+        """
+        manifest = {'input_file': os.path.abspath(self.input_file),
+                    'input_size': os.path.getsize(self.input_file) if os.path.isfile(self.input_file) else None,
+                    'input_mtime': os.path.getmtime(self.input_file) if os.path.isfile(self.input_file) else None,
+                    'ingest': self.get_ingest_mode(), 'buffer_size': self.buffer_size,
+                    'output_file': self.output_file, 'export_format': self.export_format,
+                    'output_compression': self.output_compression,
+                    'partitions': self.parallelism if self.partition_by_subject else None,
+                    'ranges': self.get_input_ranges() if self.get_ingest_mode() == 'ranges' else None}
+
+        if self.checkpoint.start(manifest, self.resume):
+            filepath = self.output_file if self.output_file is not None else self.graph_identifier
+            removed_count = self.checkpoint.remove_uncommitted_chunks(
+                lambda exporter_no, save_counter: DataExporter.get_chunk_filename(
+                    filepath, exporter_no, save_counter, self.export_format, self.output_compression))
+            print('resuming from {}: {} units of work and {} output files committed, {} uncommitted output files '
+                  'removed'.format(self.checkpoint.directory, len(self.checkpoint.committed_units),
+                                   self.checkpoint.get_committed_chunks_count(), removed_count))
+
+    def run_job(self, graph_identifier, input_file, output_file, export_format=None):
+        """
+        runs one transformation on the already started workers of a service mode manager. The workers take the job
+        settings from a JobMessage then process the job's input like in run
+        :param graph_identifier: unique identifier for the graph under processing
+        :param input_file: the input file path
+        :param output_file: the output file path
+        :param export_format: the format used to export the generated graph. Default guessed from the output file
+        :return: the TransformationMetrics of the job
+        """
+        self.set_job(graph_identifier, input_file, output_file, export_format)
+        self.importer = self.__create_importer()
+        self.work_queue_tracker = QueueDepthTracker('work', 0, self.work_queue_size)
+        self.metrics_manager.reset()
+        self.metrics_manager.stats_queue.put(pickle.dumps(TimeStampMessage(0, None, 'start', time.time())))
+        self.metrics_manager.start()
+
+        for _ in self.transformers:
+            self.schedule(JobMessage(self.get_job_settings()))
+
+        # the workers wait for the end of the job even if reading the input fails
+        try:
+            self.schedule_input()
+        finally:
+            self.finish_input()
+            self.metrics_manager.wait()
+
+        return self.metrics_manager
+
+    def shutdown(self):
+        """
+        stops the workers of a service mode manager
+        :return: None
+        """
+        for _ in self.transformers:
+            self.schedule(ShutdownMessage('SHUTDOWN'))
+
+        for transformer in self.transformers:
+            transformer.runner.join()
+        if not self.inline_exporters:
+            for exporter in self.exporters:
+                exporter.runner.join()
 
-        if self.importer.is_streamed:
-            thread_turn = 0
+    def schedule_input(self):
+        """
+        reads the input through the importer and schedules it on the work queue as batches of records, byte ranges or
+        blocks of raw lines
+        :return: None
+        """
+        ingest_mode = self.get_ingest_mode()
 
+        if ingest_mode == 'ranges':
+            self.__send_input_ranges()
+
+        elif ingest_mode == 'raw_blocks':
+            self.__send_raw_blocks()
+
+        elif self.importer.is_streamed:
             for record in self.importer.get_records():
-                self.__buffer_record(thread_turn, record)
-                thread_turn += 1
+                self.__buffer_record(record)
 
         else:
             records_list = self.importer.get_records()
-            chunck_size = len(records_list) / len(self.transformers)
 
-            chunck_end = 0
-            for i in range(len(self.transformers)):
-                chunck_start = chunck_end
-                chunck_end = int(math.ceil((i + 1) * chunck_size))
-                chunck = records_list[chunck_start: chunck_end]
-                print('chunck {} starts at {} ends at {}'.format(i, chunck_start, chunck_end - 1))
+            for batch_start in range(0, len(records_list), self.buffer_size):
+                self.schedule_unit(records_list[batch_start: batch_start + self.buffer_size],
+                                   [batch_start, min(self.buffer_size, len(records_list) - batch_start)])
+
+        self.__send_records()
 
-                self.transformers[i].send_me_message(chunck)
+    def get_ingest_mode(self):
+        """
+        :return: 'ranges' if the transformers read byte ranges of the input themselves, 'raw_blocks' if they parse
+        blocks of raw lines read by the manager or 'records' if the manager parses the records
+        """
+        if self.parallel_ingest and self.importer.supports_ranges():
+            return 'ranges'
+        elif self.parallel_ingest and self.importer.supports_raw_blocks():
+            return 'raw_blocks'
+        return 'records'
 
-        for i, transformer in enumerate(self.transformers):
-            self.__send_records(i)
-            transformer.send_me_message(EndMessage('END'))
+    def finish_input(self):
+        """
+        signals the end of the input to the transformers and sends the manager's statistics
+        :return: None
+        """
+        # every transformer takes exactly one EndMessage and these are queued after all the work
+        for _ in self.transformers:
+            self.schedule(EndMessage('END'))
+
+        self.__send_decompression_stats()
 
+        self.metrics_manager.stats_queue.put(pickle.dumps(self.work_queue_tracker.get_info()))
         self.metrics_manager.stats_queue.put(pickle.dumps(TimeStampMessage(0, None, 'end', time.time())))
-        self.metrics_manager.run()
-        self.metrics_manager.print_metrics()
+        self.metrics_manager.stats_queue.put(pickle.dumps(EndMessage('END')))
 
-    def __buffer_record(self, turn, record):
+    def schedule_unit(self, unit, position):
         """
-        in round robin turn, buffer records to transformer queues
-        :param turn: the turn counter to choose which process to send this record to
+        schedules a unit of work. With checkpoints the unit is numbered, the units committed by a resumed checkpoint are
+        skipped and the others are wrapped with their number and input position
+        :param unit: list of records, InputRangeMessage or RawRecordsMessage
+        :param position: the input position of the unit as a json serializable list: [first record, records count],
+        [range start, range end] or [block number]
+        :return: None
+        """
+        if self.checkpoint is None:
+            self.schedule(unit)
+            return
+
+        self.units_count += 1
+
+        if self.checkpoint.is_committed(self.units_count):
+            self.skipped_units_count += 1
+        else:
+            self.schedule(CheckpointedUnitMessage(self.units_count, position, unit))
+
+    def schedule(self, message):
+        """
+        puts a unit of work on the shared work queue where the next idle transformer picks it up. Blocks while the
+        queue is full, which holds back reading the input until the transformers catch up
+        :param message: list of records, InputRangeMessage, RawRecordsMessage or EndMessage
+        :return: None
+        """
+        self.work_queue_tracker.put(self.work_queue, pickle.dumps(message))
+
+    def __send_input_ranges(self):
+        """
+        splits the input file (json lines or csv/tsv rows) into line aligned byte ranges and schedules them on the work
+        queue. The manager reads no record in this mode
+        :return: None
+        """
+        for i, (start, end) in enumerate(self.get_input_ranges()):
+            print('input range {} starts at {} ends at {}'.format(i, start, end))
+            self.schedule_unit(InputRangeMessage(start, end), [start, end])
+
+    def get_input_ranges(self):
+        """
+        splits the input file into line aligned byte ranges. A resumed run reuses the ranges of its checkpoint so the
+        units of work are the same
+        :return: list of tuple(start, end)
+        """
+        if self.checkpoint is not None and self.checkpoint.manifest is not None and \
+                self.checkpoint.manifest.get('ranges') is not None:
+            return [tuple(input_range) for input_range in self.checkpoint.manifest['ranges']]
+
+        ranges_count = max(len(self.transformers) * RANGES_PER_TRANSFORMER,
+                           int(math.ceil(os.path.getsize(self.input_file) / float(INPUT_RANGE_SIZE))))
+        return self.importer.get_ranges(ranges_count)
+
+    def __send_raw_blocks(self):
+        """
+        reads and decompresses blocks of raw json lines or csv/tsv rows and schedules them on the work queue.
+        Transformers parse the lines themselves so decompression here overlaps with parsing there
+        :return: None
+        """
+        for block_no, lines in enumerate(self.importer.get_raw_blocks()):
+            self.schedule_unit(RawRecordsMessage(lines), [block_no])
+
+    def __send_decompression_stats(self):
+        read_stats = getattr(self.importer, 'read_stats', None)
+
+        if read_stats is not None and read_stats.compression is not None:
+            self.metrics_manager.stats_queue.put(pickle.dumps(DecompressionInfo(read_stats.compression,
+                                                                                read_stats.compressed_bytes,
+                                                                                read_stats.bytes_read,
+                                                                                read_stats.read_time)))
+
+    def __buffer_record(self, record):
+        """
+        buffers the record and schedules the buffer as a batch once it holds buffer_size records
         :param record: the record to process
         :return: None
         """
-        transformer_idx = turn % len(self.transformers)
-        self.transformers_queues[transformer_idx].append(record)
+        self.records_buffer.append(record)
 
-        if len(self.transformers_queues[transformer_idx]) >= self.buffer_size:
-            self.__send_records(transformer_idx)
+        if len(self.records_buffer) >= self.buffer_size:
+            self.__send_records()
 
-    def __send_records(self, trans_idx):
-        if len(self.transformers_queues[trans_idx]) > 0:
-            self.transformers[trans_idx].send_me_message(self.transformers_queues[trans_idx])
-            self.transformers_queues[trans_idx] = []
+    def __send_records(self):
+        if len(self.records_buffer) > 0:
+            self.schedule_unit(self.records_buffer, [self.scheduled_records_count, len(self.records_buffer)])
+            self.scheduled_records_count += len(self.records_buffer)
+            self.records_buffer = []
+
+    def get_quads_graph_identifier(self):
+        """
+        the graph name written in N-Quads lines
+        :return: the graph identifier if the export format is N-Quads, None otherwise
+        """
+        return self.graph_identifier if self.export_format == RDFExportFormats.NQUADS else None
+
+    def __resolve_wire_format(self, wire_format):
+        """
+        pre-serialized N-Triples batches can only be appended by exporters writing line based formats. Other formats
+        get the dictionary encoding instead
+        :param wire_format: the requested wire format as defined in WireFormats
+        :return: the wire format used for this run
+        """
+        line_based = RDFExportFormats.is_line_based_format(self.export_format)
+
+        if wire_format == WireFormats.Auto or wire_format is None:
+            return WireFormats.NTriples if line_based else WireFormats.Dictionary
+        elif wire_format == WireFormats.NTriples and not line_based:
+            print('{} wire format needs a line based export format, using {} instead'.format(wire_format,
+                                                                                            WireFormats.Dictionary))
+            return WireFormats.Dictionary
+
+        return wire_format
+
+    def __resolve_output_compression(self, output_compression, output_file):
+        """
+        picks the compression codec of the exported files
+        :param output_compression: the requested codec or None to guess it from the output file extension
+        :param output_file: the output file path
+        :return: one of Compressions.output_codecs or None for uncompressed output
+        """
+        if output_compression is None and output_file and strip_compression_extension(output_file) != output_file:
+            output_compression = detect_compression(output_file)
+
+        if output_compression is not None and output_compression not in Compressions.output_codecs:
+            print('{} output compression is not supported, use one of {}'.format(output_compression,
+                                                                               Compressions.output_codecs))
+            return None
+
+        return output_compression
 
     def __create_importer(self):
         """
-        based on the input file extension, the corresponding importer is created and used to import the records
+        based on the input file extension, the corresponding importer is created and used to import the records. The
+        compression extension of compressed input files is ignored
         :return:
         """
-        ip_file_type = self.input_file.split('.')[-1]
-        # TODO: create and return other importers types here
-        if ip_file_type == 'json':
-            return JsonDataImporter(self.input_file)
+        ip_format = FileFormatManager.guess_input_format(self.input_file)
+
+        if ip_format in (ImportFormats.Csv, ImportFormats.Tsv):
+            return CsvDataImporter(self.input_file, self.csv_delimiter, self.coerce_types)
+        elif ip_format == ImportFormats.XML:
+            return XmlDataImporter(self.input_file, self.descriptor.get_xml_record_element(),
+                                   self.descriptor.get_xml_list_elements())
+        else:
+            return JsonDataImporter(self.input_file, self.json_backend)
@@ -4,8 +4,15 @@ record different metrics in the transformation pipeline
 import multiprocessing as mp
 import pickle
 import sys
+import threading
+import time
 
 from DataTransformers.Entity import EndMessage
+from manager.live_metrics import LiveMetricsSampler
+from utils.compression import Compressions
+
+# the number of the most time consuming properties printed by the profiling report
+PROFILE_REPORT_SIZE = 20
 
 
 class TimeStampMessage:
@@ -34,6 +41,135 @@ class ExportationBatchInfo:
         self.triples_count = triples_count
 
 
+class SerializationInfo:
+
+    def __init__(self, thread_no, thread_type, batches_count, payload_bytes, elapsed_time, skipped_count=0):
+        self.thread_no = thread_no
+        self.thread_type = thread_type
+        self.batches_count = batches_count
+        self.payload_bytes = payload_bytes
+        self.elapsed_time = elapsed_time
+        # the triples dropped because a term cannot be serialized as N-Triples
+        self.skipped_count = skipped_count
+
+
+class TermCacheInfo:
+
+    def __init__(self, trans_no, hits, misses, cache_size):
+        self.thread_no = trans_no
+        self.hits = hits
+        self.misses = misses
+        self.cache_size = cache_size
+
+
+class SchedulingInfo:
+
+    def __init__(self, trans_no, pulled_count, wait_time):
+        self.thread_no = trans_no
+        self.pulled_count = pulled_count
+        self.wait_time = wait_time
+
+
+class DedupInfo:
+
+    def __init__(self, trans_no, hits, misses, evictions):
+        self.thread_no = trans_no
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+
+
+class TransformationProfileInfo:
+
+    def __init__(self, trans_no, entities, properties, functions):
+        self.thread_no = trans_no
+        # entity name => (records, wall time, entity URIs, triples)
+        self.entities = entities
+        # (entity name, key path, predicate) => (records, wall time, key path matches, triples)
+        self.properties = properties
+        # function name => (calls, wall time, errors)
+        self.functions = functions
+
+
+class SparqlLoadInfo:
+
+    def __init__(self, ex_no, requests_count, triples_count, payload_bytes, latency_sum, latency_max, retries_count,
+                 failed_count, elapsed_time):
+        self.thread_no = ex_no
+        self.requests_count = requests_count
+        self.triples_count = triples_count
+        self.payload_bytes = payload_bytes
+        self.latency_sum = latency_sum
+        self.latency_max = latency_max
+        self.retries_count = retries_count
+        self.failed_count = failed_count
+        self.elapsed_time = elapsed_time
+
+
+class GraphStoreInfo:
+
+    def __init__(self, ex_no, store, graphs_count, triples_count, serialize_time, peak_rss):
+        self.thread_no = ex_no
+        self.store = store
+        self.graphs_count = graphs_count
+        self.triples_count = triples_count
+        self.serialize_time = serialize_time
+        self.peak_rss = peak_rss
+
+
+class InputProgressInfo:
+
+    def __init__(self, trans_no, input_bytes):
+        self.thread_no = trans_no
+        self.input_bytes = input_bytes
+
+
+class QueueDepthInfo:
+
+    def __init__(self, queue_name, thread_no, capacity, high_water_mark, blocked_time):
+        self.queue_name = queue_name
+        self.thread_no = thread_no
+        self.capacity = capacity
+        self.high_water_mark = high_water_mark
+        self.blocked_time = blocked_time
+
+
+class QueueDepthTracker:
+    """
+    puts messages on a bounded multiprocessing.Queue on behalf of a single producer and records the deepest the queue
+    got (sampled after every put) and how long the producer was blocked on the full queue
+    """
+
+    def __init__(self, queue_name, thread_no, capacity):
+        self.queue_name = queue_name
+        self.thread_no = thread_no
+        self.capacity = capacity
+        self.high_water_mark = 0
+        self.blocked_time = 0.0
+
+    def put(self, queue, message):
+        start_time = time.time()
+        queue.put(message)
+        self.blocked_time += time.time() - start_time
+
+        try:
+            self.high_water_mark = max(self.high_water_mark, queue.qsize())
+        except NotImplementedError:     # qsize is not available on macOS
+            pass
+
+    def get_info(self):
+        return QueueDepthInfo(self.queue_name, self.thread_no, self.capacity, self.high_water_mark, self.blocked_time)
+
+
+class DecompressionInfo:
+
+    def __init__(self, compression, compressed_bytes, decompressed_bytes, elapsed_time):
+        self.compression = compression
+        self.compressed_bytes = compressed_bytes
+        self.decompressed_bytes = decompressed_bytes
+        self.elapsed_time = elapsed_time
+
+
 class TransformationMetrics:
     """
     tracks and stores various transformation parameters such as start and end times, number of transformed records ... etc
@@ -44,14 +180,60 @@ class TransformationMetrics:
         transformer and exporter threads. It also creates the queue where all statistics message are passed to
         :param manager: TransformationManager object
         """
-        self.stats_queue = mp.Queue()
+        self.stats_queue = mp.Queue(manager.stats_queue_size)
+        self.manager = manager
+        self.exporters_count = 1 if self.manager.inline_exporters else self.manager.parallelism
+        # every exporter, or every transformer's copy of the inline exporter, and the manager send an EndMessage
+        self.expected_end_messages = self.manager.parallelism + 1
+        self.collector = None
+        self.sampler = LiveMetricsSampler(self, manager.metrics_interval, manager.metrics_file) \
+            if manager.metrics_interval else None
+        self.sort_stats = None
+        self.reset()
+
+    def reset(self):
+        """
+        drops the collected statistics so the metrics of the next job of a service mode manager start from scratch
+        :return: None
+        """
         self.timestamps_msg_buffer = []
         self.transformers_msg_buffer = []
         self.exporters_msg_buffer = []
-        self.manager = manager
-        self.exporters_count = 1 if self.manager.inline_exporters else self.manager.parallelism
+        self.term_cache_msg_buffer = []
+        self.serialization_msg_buffer = []
+        self.decompression_msg_buffer = []
+        self.scheduling_msg_buffer = []
+        self.queue_depth_msg_buffer = []
+        self.dedup_msg_buffer = []
+        self.profile_msg_buffer = []
+        self.sparql_msg_buffer = []
+        self.graph_store_msg_buffer = []
+        self.input_progress_msg_buffer = []
         self.finished_exporters = 0
 
+    def start(self):
+        """
+        drains the statistics queue on a background thread of the manager process while the pipeline runs so the
+        bounded queue never blocks the workers
+        :return: None
+        """
+        self.collector = threading.Thread(target=self.run, daemon=True)
+        self.collector.start()
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def wait(self):
+        """
+        waits until all the statistics messages are collected. The manager's own EndMessage must be on the queue
+        :return: None
+        """
+        if self.collector is not None:
+            self.collector.join()
+        else:
+            self.run()
+        if self.sampler is not None:
+            self.sampler.stop()
+
     def run(self):
         """
         starts reading and processing the statistics messages from the queue and stores them in one of three buffers.
@@ -66,7 +248,7 @@ class TransformationMetrics:
 
             if type(msg) is EndMessage:
                 self.finished_exporters += 1
-                if self.finished_exporters == self.exporters_count:
+                if self.finished_exporters == self.expected_end_messages:
                     break
             elif type(msg) is TimeStampMessage:
                 self.timestamps_msg_buffer.append(msg)
@@ -74,6 +256,26 @@ class TransformationMetrics:
                 self.transformers_msg_buffer.append(msg)
             elif type(msg) is ExportationBatchInfo:
                 self.exporters_msg_buffer.append(msg)
+            elif type(msg) is TermCacheInfo:
+                self.term_cache_msg_buffer.append(msg)
+            elif type(msg) is SerializationInfo:
+                self.serialization_msg_buffer.append(msg)
+            elif type(msg) is DecompressionInfo:
+                self.decompression_msg_buffer.append(msg)
+            elif type(msg) is SchedulingInfo:
+                self.scheduling_msg_buffer.append(msg)
+            elif type(msg) is QueueDepthInfo:
+                self.queue_depth_msg_buffer.append(msg)
+            elif type(msg) is DedupInfo:
+                self.dedup_msg_buffer.append(msg)
+            elif type(msg) is TransformationProfileInfo:
+                self.profile_msg_buffer.append(msg)
+            elif type(msg) is SparqlLoadInfo:
+                self.sparql_msg_buffer.append(msg)
+            elif type(msg) is GraphStoreInfo:
+                self.graph_store_msg_buffer.append(msg)
+            elif type(msg) is InputProgressInfo:
+                self.input_progress_msg_buffer.append(msg)
             else:
                 pass
 
@@ -124,6 +326,163 @@ class TransformationMetrics:
 
         return sum([info.triples_count for info in stats_msg])
 
+    def get_term_cache_stats(self, thread_no=None):
+        """
+        returns the rdflib term intern cache hits and misses of a particular transformer or of all transformers if None
+        :param thread_no: the transformer index
+        :return: tuple(hits, misses)
+        """
+        stats_msg = [info for info in self.term_cache_msg_buffer if thread_no is None or info.thread_no == thread_no]
+
+        return sum([info.hits for info in stats_msg]), sum([info.misses for info in stats_msg])
+
+    def get_dedup_stats(self, entity_name=None):
+        """
+        returns how many entities the transformers skipped because they already emitted them (hits) and how many they
+        emitted (misses)
+        :param entity_name: the entity name or None for all the deduplicated entities
+        :return: tuple(hits, misses, cache evictions)
+        """
+        hits = sum([count for info in self.dedup_msg_buffer for name, count in info.hits.items()
+                    if entity_name is None or name == entity_name])
+        misses = sum([count for info in self.dedup_msg_buffer for name, count in info.misses.items()
+                      if entity_name is None or name == entity_name])
+
+        return hits, misses, sum([info.evictions for info in self.dedup_msg_buffer])
+
+    def get_profile_stats(self, counters='entities'):
+        """
+        sums the profiling counters of all the transformers, ranked from the most to the least time consuming
+        :param counters: 'entities', 'properties' or 'functions'
+        :return: list of (key, counters tuple) as defined in TransformationProfileInfo
+        """
+        totals = {}
+        for info in self.profile_msg_buffer:
+            for key, stats in getattr(info, counters).items():
+                totals[key] = tuple(x + y for x, y in zip(totals[key], stats)) if key in totals else stats
+
+        return sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+
+    def get_sparql_stats(self, thread_no=None):
+        """
+        returns the requests the exporters sent to the SPARQL endpoint. Every exporter loads in parallel to the others,
+        so the load time is the longest time an exporter spent loading
+        :param thread_no: the exporter index
+        :return: tuple(requests count, triples loaded, payload bytes, average latency, maximum latency, retries count,
+        failed batches count, load time in seconds) or None if nothing was sent to an endpoint
+        """
+        stats_msg = [info for info in self.sparql_msg_buffer if thread_no is None or info.thread_no == thread_no]
+        if len(stats_msg) == 0:
+            return None
+
+        requests_count = sum([info.requests_count for info in stats_msg])
+        load_time = max([sum([info.elapsed_time for info in stats_msg if info.thread_no == exporter_no])
+                         for exporter_no in set(info.thread_no for info in stats_msg)])
+
+        return requests_count, sum([info.triples_count for info in stats_msg]), \
+            sum([info.payload_bytes for info in stats_msg]), \
+            sum([info.latency_sum for info in stats_msg]) / requests_count if requests_count > 0 else 0.0, \
+            max([info.latency_max for info in stats_msg]), sum([info.retries_count for info in stats_msg]), \
+            sum([info.failed_count for info in stats_msg]), load_time
+
+    def get_failed_batches_count(self):
+        """
+        :return: the number of triple batches the exporters could not load into the SPARQL endpoint
+        """
+        return sum([info.failed_count for info in self.sparql_msg_buffer])
+
+    def get_graph_store_stats(self, thread_no=None):
+        """
+        returns how many rdflib graphs the exporters serialized, the time they spent serializing them and the peak
+        resident memory of the exporter processes, or of the transformer processes with inline exporters
+        :param thread_no: the exporter index
+        :return: tuple(graphs count, triples count, serialization time in seconds, peak RSS in bytes) or None if no
+        exporter reported it
+        """
+        stats_msg = [info for info in self.graph_store_msg_buffer if thread_no is None or info.thread_no == thread_no]
+        if len(stats_msg) == 0:
+            return None
+
+        return sum([info.graphs_count for info in stats_msg]), sum([info.triples_count for info in stats_msg]), \
+            sum([info.serialize_time for info in stats_msg]), max([info.peak_rss for info in stats_msg])
+
+    def get_serialization_stats(self, thread_type=None, thread_no=None):
+        """
+        returns the number of triple batches passed between transformers and exporters, their total payload size and the
+        time spent encoding them in the transformers ("transformer") or decoding them in the exporters ("exporter")
+        :param thread_type: "transformer", "exporter", or None for both
+        :param thread_no: the thread index
+        :return: tuple(batches count, payload bytes, elapsed time in seconds)
+        """
+        stats_msg = [info for info in self.serialization_msg_buffer
+                     if (thread_type is None or info.thread_type == thread_type) and
+                     (thread_no is None or info.thread_no == thread_no)]
+
+        return sum([info.batches_count for info in stats_msg]), sum([info.payload_bytes for info in stats_msg]), \
+            sum([info.elapsed_time for info in stats_msg])
+
+    def get_skipped_triples_count(self):
+        """
+        :return: the number of triples dropped because a term cannot be serialized as N-Triples, whether it was
+        serialized by the transformers for the ntriples wire format or by the exporters' stream writers
+        """
+        return sum([info.skipped_count for info in self.serialization_msg_buffer])
+
+    def get_idle_stats(self, thread_no):
+        """
+        returns how long a transformer was idle: the time it waited on the empty work queue and the time between its end
+        and the end of the last transformer
+        :param thread_no: the transformer index
+        :return: tuple(pulled work units count, wait time, tail idle time) in seconds
+        """
+        stats_msg = [info for info in self.scheduling_msg_buffer if info.thread_no == thread_no]
+        end_times = {ts_msg.thread_no: ts_msg.time for ts_msg in self.timestamps_msg_buffer
+                     if ts_msg.thread_type == 'transformer' and ts_msg.type == 'end'}
+        tail_time = max(end_times.values()) - end_times[thread_no] if thread_no in end_times else 0.0
+
+        return sum([info.pulled_count for info in stats_msg]), sum([info.wait_time for info in stats_msg]), tail_time
+
+    def get_busy_time(self):
+        """
+        returns the time the transformers spent working, which is their runtime minus the time they waited for work
+        :return: the busy time of all transformers in seconds
+        """
+        busy_time = 0.0
+
+        for thread_no in set(info.thread_no for info in self.scheduling_msg_buffer):
+            busy_time += self.get_runtime(thread_type='transformer', thread_no=thread_no) - \
+                self.get_idle_stats(thread_no)[1]
+
+        return busy_time
+
+    def get_queue_depth_stats(self, queue_name):
+        """
+        returns the capacity, the high-water mark and the producers' blocked time of a queue
+        :param queue_name: 'work' for the transformers work queue or 'exporter' for the exporters input queues
+        :return: tuple(capacity, high-water mark, blocked time in seconds) or None if no producer reported the queue
+        """
+        stats_msg = [info for info in self.queue_depth_msg_buffer if info.queue_name == queue_name]
+
+        if len(stats_msg) == 0:
+            return None
+
+        return max([info.capacity for info in stats_msg]), max([info.high_water_mark for info in stats_msg]), \
+            sum([info.blocked_time for info in stats_msg])
+
+    def get_decompression_stats(self):
+        """
+        returns how much of the compressed input was read and how long reading and decompressing it took
+        :return: tuple(compression, compressed bytes, decompressed bytes, elapsed time in seconds) or None if the input
+        is not compressed
+        """
+        if len(self.decompression_msg_buffer) == 0:
+            return None
+
+        return self.decompression_msg_buffer[0].compression, \
+            sum([info.compressed_bytes for info in self.decompression_msg_buffer]), \
+            sum([info.decompressed_bytes for info in self.decompression_msg_buffer]), \
+            sum([info.elapsed_time for info in self.decompression_msg_buffer])
+
     def print_metrics(self):
         """
         print the run metrics to the console
@@ -142,6 +501,128 @@ Run metrics:
         print('number of transformer threads: {}'.format(len(self.manager.transformers)))
         print('number of exporter threads: {}'.format(self.exporters_count))
 
+        if getattr(self.manager, 'partition_by_subject', False):
+            partition_sizes = [self.get_exportation_stats(thread_no=thread_no)
+                               for thread_no in set(info.thread_no for info in self.exporters_msg_buffer)]
+            if len(partition_sizes) > 0:
+                print('triples partitioned by subject: smallest partition {} triples, largest {}'.format(
+                    min(partition_sizes), max(partition_sizes)))
+
+        for thread_no in sorted(info.thread_no for info in self.scheduling_msg_buffer):
+            pulled_count, wait_time, tail_time = self.get_idle_stats(thread_no)
+            print('transformer {}: {} work units pulled, idle {:.2f} seconds waiting for work, {:.2f} seconds at the '
+                  'tail'.format(thread_no, pulled_count, wait_time, tail_time))
+
+        for queue_name in ('work', 'exporter'):
+            queue_stats = self.get_queue_depth_stats(queue_name)
+            if queue_stats is not None:
+                print('{} queue: capacity {} batches, high-water mark {}, producers blocked {:.2f} seconds'.format(
+                    queue_name, *queue_stats))
+
+        json_backend = getattr(self.manager.importer, 'json_backend', None)
+        if json_backend is not None:
+            print('json decoder: {}'.format(json_backend))
+
+        decompression_stats = self.get_decompression_stats()
+        if decompression_stats is not None:
+            compression, compressed_bytes, decompressed_bytes, read_time = decompression_stats
+            print('input compression: {} ({:.2f} MB => {:.2f} MB)'.format(compression, compressed_bytes / 1024.0 / 1024.0,
+                                                                        decompressed_bytes / 1024.0 / 1024.0))
+            print('input decompression time: {0:.2f} seconds'.format(read_time))
+            if read_time > 0:
+                print('input decompression throughput: {:.2f} MB/s'.format(decompressed_bytes / 1024.0 / 1024.0 /
+                                                                           read_time))
+
+        output_compression = getattr(self.manager, 'output_compression', None)
+        if output_compression is not None:
+            level = self.manager.compression_level
+            print('output compression: {} level {}'.format(output_compression, level if level is not None else
+                                                           Compressions.default_levels[output_compression]))
+
+        batches_count, payload_bytes, ser_time = self.get_serialization_stats(thread_type='transformer')
+        if batches_count > 0:
+            print('wire format: {}'.format(self.manager.wire_format))
+            print('triple batches sent to exporters: {} ({:.2f} MB)'.format(batches_count, payload_bytes / 1024.0 / 1024.0))
+            print('triple batches serialization time: {0:.2f} seconds'.format(ser_time))
+            print('triple batches deserialization time: {0:.2f} seconds'.format(
+                self.get_serialization_stats(thread_type='exporter')[2]))
+
+        skipped_count = self.get_skipped_triples_count()
+        if skipped_count > 0:
+            print('triples skipped with a term that cannot be serialized: {}'.format(skipped_count))
+
+        cache_hits, cache_misses = self.get_term_cache_stats()
+        if cache_hits + cache_misses > 0:
+            print('term cache hits: {} misses: {} hit rate: {:.2f}%'.format(cache_hits, cache_misses,
+                                                                           100.0 * cache_hits /
+                                                                           (cache_hits + cache_misses)))
+
+        graph_store_stats = self.get_graph_store_stats()
+        if graph_store_stats is not None:
+            graphs_count, graph_triples, serialize_time, peak_rss = graph_store_stats
+            if graphs_count > 0:
+                print('graph store: {}, {} graphs of {} triples serialized in {:.2f} seconds'.format(
+                    self.graph_store_msg_buffer[0].store, graphs_count, graph_triples, serialize_time))
+            print('exporters peak RSS: {:.2f} MB'.format(peak_rss / 1024.0 / 1024.0))
+
+        sparql_stats = self.get_sparql_stats()
+        if sparql_stats is not None:
+            requests_count, triples_count, payload_bytes, avg_latency, max_latency, retries_count, failed_count, \
+                load_time = sparql_stats
+            print('sparql endpoint: {} ({})'.format(self.manager.sparql_endpoint, self.manager.sparql_protocol))
+            print('sparql load: {} triples in {} requests ({:.2f} MB), {} retries, {} failed batches'.format(
+                triples_count, requests_count, payload_bytes / 1024.0 / 1024.0, retries_count, failed_count))
+            print('sparql request latency: average {:.3f} seconds, maximum {:.3f} seconds'.format(avg_latency,
+                                                                                              max_latency))
+            if load_time > 0:
+                print('sparql load throughput: {:.2f} triples/s, {:.2f} MB/s'.format(
+                    triples_count / load_time, payload_bytes / 1024.0 / 1024.0 / load_time))
+
+        if self.sort_stats is not None:
+            print('sorted output: {} triples from {} files, {} duplicates removed'.format(
+                self.sort_stats.output_triples, self.sort_stats.input_files_count,
+                self.sort_stats.get_duplicates_count()))
+            print('sorted output: {} runs sorted in {:.2f} seconds, merged in {} passes in {:.2f} seconds'.format(
+                self.sort_stats.runs_count, self.sort_stats.sort_time, self.sort_stats.merge_passes,
+                self.sort_stats.merge_time))
+
+        entity_names = sorted(set(name for info in self.dedup_msg_buffer for name in info.misses))
+        for entity_name in entity_names:
+            hits, misses, _ = self.get_dedup_stats(entity_name)
+            print('entity dedup {}: {} emitted, {} skipped, hit rate: {:.2f}%'.format(entity_name, misses, hits,
+                                                                                   100.0 * hits / (hits + misses)))
+        if len(entity_names) > 0:
+            print('entity dedup cache evictions: {}'.format(self.get_dedup_stats()[2]))
+
+        if len(self.profile_msg_buffer) > 0:
+            self.print_profile()
+
+    def print_profile(self):
+        """
+        prints the ranked profiling report. Times are summed over the transformers, the shares are of the time spent
+        running the plan
+        :return: None
+        """
+        entities = self.get_profile_stats('entities')
+        total_time = max(sum([stats[1] for _, stats in entities]), 1e-9)
+        print('transformation profile: {:.2f} seconds running the plan'.format(total_time))
+
+        for name, (records, wall_time, uris, triples) in entities:
+            print('profile entity {}: {:.3f} seconds ({:.1f}%), {} records, {} entities, {} triples'.format(
+                name, wall_time, 100 * wall_time / total_time, records, uris, triples))
+
+        properties = self.get_profile_stats('properties')
+        for (entity_name, keypath, predicate), (records, wall_time, matches, triples) in \
+                properties[:PROFILE_REPORT_SIZE]:
+            print('profile property {} {} => {}: {:.3f} seconds ({:.1f}%), {} records, {} matches, {} triples'.format(
+                entity_name, keypath, predicate, wall_time, 100 * wall_time / total_time, records, matches, triples))
+        if len(properties) > PROFILE_REPORT_SIZE:
+            print('profile: {} faster properties not shown'.format(len(properties) - PROFILE_REPORT_SIZE))
+
+        for name, (calls, wall_time, errors) in self.get_profile_stats('functions'):
+            print('profile function {}: {:.3f} seconds ({:.1f}%), {} calls, {} errors'.format(
+                name, wall_time, 100 * wall_time / total_time, calls, errors))
+
     @staticmethod
     def __filter_stats(info, batch_no, thread_no):
         if (batch_no is None or info.thread_type == batch_no) and \
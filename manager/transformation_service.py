@@ -0,0 +1,275 @@
+"""
+keeps warm transformation pipelines alive and runs transformation jobs on them as they arrive
+"""
+import glob
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+
+from manager.transformation_manager import TransformationManager
+
+
+class TransformationJob:
+    """
+    a transformation request: the input to transform, where to write the graph and with which descriptor
+    """
+    def __init__(self, input_file, output_file, export_format=None, graph_identifier='', descriptor_file=None):
+        """
+        :param input_file: the input file path
+        :param output_file: the output file path
+        :param export_format: the format used to export the generated graph. Default guessed from the output file
+        :param graph_identifier: unique identifier for the graph under processing
+        :param descriptor_file: the descriptor json file. Default the service's descriptor
+        """
+        self.input_file = input_file
+        self.output_file = output_file
+        self.export_format = export_format
+        self.graph_identifier = graph_identifier
+        self.descriptor_file = descriptor_file
+        self.received_time = time.time()
+        self.result = None
+        self.done = threading.Event()
+
+    @staticmethod
+    def from_dict(job_dict):
+        """
+        creates a job from its json representation, e.g.
+        {"input": "tweets.json", "output": "tweets.nt", "format": "nt", "graph": "http://twitter.com/"}
+        :param job_dict: dictionary
+        :return: TransformationJob
+        """
+        if not isinstance(job_dict, dict):
+            raise ValueError('a job must be a json object, got {}'.format(json.dumps(job_dict)))
+
+        return TransformationJob(job_dict['input'], job_dict['output'], job_dict.get('format'),
+                                 job_dict.get('graph', ''), job_dict.get('descriptor'))
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+
+class TransformationService:
+    """
+    runs transformation jobs on pools of transformers and exporters that are started once per descriptor and stay
+    alive between jobs, so a job pays neither the process start up nor the descriptor compilation. Jobs are submitted
+    as json files dropped in a spool directory or as json lines sent to a unix socket, and run one at a time in the
+    order they arrive
+    """
+
+    def __init__(self, descriptor_file=None, spool_dir=None, socket_path=None, poll_interval=1.0, **manager_options):
+        """
+        :param descriptor_file: the descriptor used by jobs that do not name one
+        :param spool_dir: directory watched for job files named *.job. A claimed job file is renamed to *.running then
+        to *.done or *.failed and its result is written to the same directory as *.result.json
+        :param socket_path: path of the unix socket accepting one json job per line. The job result is sent back as a
+        json line once the job is done
+        :param poll_interval: the spool directory polling interval in seconds
+        :param manager_options: the TransformationManager options of the pools, e.g. parallelism or buffer_size
+        """
+        self.descriptor_file = descriptor_file
+        self.spool_dir = spool_dir
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.manager_options = manager_options
+        self.pools = {}
+        self.pools_busy_time = {}
+        self.pools_start_time = {}
+        self.jobs = queue.Queue()
+        self.jobs_count = 0
+        self.failed_jobs_count = 0
+        self.stopped = threading.Event()
+        self.server = None
+
+    def serve(self):
+        """
+        starts the job sources and runs the submitted jobs until stop is called
+        :return: None
+        """
+        # forking the workers before any other thread exists is safer, so the default pool starts eagerly
+        if self.descriptor_file is not None:
+            self.get_pool(self.descriptor_file)
+
+        if self.spool_dir is not None:
+            threading.Thread(target=self.__watch_spool_dir, daemon=True).start()
+            print('watching {} for transformation jobs'.format(self.spool_dir))
+
+        if self.socket_path is not None:
+            self.__start_socket_server()
+            print('listening on {} for transformation jobs'.format(self.socket_path))
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            job.finish(self.run_job(job))
+
+        self.shutdown()
+
+    def submit(self, job):
+        """
+        queues a job to be run by serve
+        :param job: TransformationJob
+        :return: the job, whose done event is set once its result is ready
+        """
+        self.jobs.put(job)
+        return job
+
+    def stop(self):
+        """
+        asks serve to return once the queued jobs are done
+        :return: None
+        """
+        self.stopped.set()
+        self.jobs.put(None)
+
+    def run_job(self, job):
+        """
+        runs a job on the warm pool of its descriptor
+        :param job: TransformationJob
+        :return: the job result as dictionary with the records and triples counts, the latency from the job receipt to
+        its end, the transformation runtime and the utilisation of the pool
+        """
+        descriptor_file = job.descriptor_file if job.descriptor_file is not None else self.descriptor_file
+        start_time = time.time()
+
+        try:
+            if not os.path.isfile(job.input_file):
+                raise IOError('input file {} does not exist'.format(job.input_file))
+
+            pool = self.get_pool(descriptor_file)
+            metrics = pool.run_job(job.graph_identifier, job.input_file, job.output_file, job.export_format)
+            metrics.print_metrics()
+            if metrics.get_failed_batches_count() > 0:
+                raise IOError('{} batches could not be loaded into {}'.format(metrics.get_failed_batches_count(),
+                                                                              pool.sparql_endpoint))
+        except Exception as ex:
+            print('transformation job {} failed: {}'.format(job.input_file, str(ex)))
+            self.failed_jobs_count += 1
+            return {'status': 'failed', 'input': job.input_file, 'error': str(ex),
+                    'latency': time.time() - job.received_time}
+
+        end_time = time.time()
+        self.jobs_count += 1
+        self.pools_busy_time[descriptor_file] += metrics.get_busy_time()
+        records_count, triples_count = metrics.get_transformation_stats()
+
+        result = {'status': 'done', 'input': job.input_file, 'output': job.output_file, 'records': records_count,
+                  'triples': triples_count, 'latency': end_time - job.received_time,
+                  'queued_time': start_time - job.received_time, 'runtime': metrics.get_runtime(),
+                  'pool_utilisation': self.get_pool_utilisation(descriptor_file)}
+
+        print('transformation job {} done: {} records, {} triples, {:.2f} seconds latency, {:.1f}% pool '
+              'utilisation'.format(job.input_file, records_count, triples_count, result['latency'],
+                                   100 * result['pool_utilisation']))
+        return result
+
+    def get_pool(self, descriptor_file):
+        """
+        returns the warm pool of a descriptor, starting it on the first job using the descriptor
+        :param descriptor_file: the descriptor json file
+        :return: a started service mode TransformationManager
+        """
+        if descriptor_file not in self.pools:
+            print('starting a transformation pool for {}'.format(descriptor_file))
+            pool = TransformationManager('', None, None, descriptor_file, service_mode=True, **self.manager_options)
+            pool.bootstrap_pipeline()
+            self.pools[descriptor_file] = pool
+            self.pools_busy_time[descriptor_file] = 0.0
+            self.pools_start_time[descriptor_file] = time.time()
+
+        return self.pools[descriptor_file]
+
+    def get_pool_utilisation(self, descriptor_file):
+        """
+        returns the share of the pool's transformer time spent transforming since the pool started
+        :param descriptor_file: the descriptor json file of the pool
+        :return: float between 0 and 1
+        """
+        pool = self.pools[descriptor_file]
+        available_time = (time.time() - self.pools_start_time[descriptor_file]) * pool.parallelism
+
+        return min(self.pools_busy_time[descriptor_file] / available_time, 1.0) if available_time > 0 else 0.0
+
+    def get_status(self):
+        """
+        :return: dictionary with the number of finished, failed and queued jobs and the utilisation of every pool
+        """
+        return {'jobs': self.jobs_count, 'failed_jobs': self.failed_jobs_count, 'queued_jobs': self.jobs.qsize(),
+                'pools': {descriptor_file: self.get_pool_utilisation(descriptor_file)
+                          for descriptor_file in list(self.pools)}}
+
+    def shutdown(self):
+        """
+        stops the job sources and the workers of all pools
+        :return: None
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            os.remove(self.socket_path)
+
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    def __watch_spool_dir(self):
+        while not self.stopped.is_set():
+            for job_file in sorted(glob.glob(os.path.join(self.spool_dir, '*.job'))):
+                # a job file that cannot be run must not stop the watcher of a long running service
+                try:
+                    self.__run_job_file(job_file)
+                except Exception as ex:
+                    print('could not run job file {}: {}'.format(job_file, str(ex)))
+            self.stopped.wait(self.poll_interval)
+
+    def __run_job_file(self, job_file):
+        name = job_file[:-len('.job')]
+
+        try:
+            # renaming claims the file, another service watching the same directory loses the race
+            os.rename(job_file, name + '.running')
+        except OSError:
+            return
+
+        try:
+            with open(name + '.running') as f:
+                job = self.submit(TransformationJob.from_dict(json.load(f)))
+            job.done.wait()
+            result = job.result
+        except (ValueError, KeyError) as ex:
+            result = {'status': 'failed', 'error': 'invalid job file: {}'.format(str(ex))}
+
+        with open(name + '.result.json', 'w') as f:
+            json.dump(result, f)
+        os.rename(name + '.running', name + ('.done' if result['status'] == 'done' else '.failed'))
+
+    def __start_socket_server(self):
+        service = self
+
+        class JobRequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if len(line.strip()) == 0:
+                        continue
+                    try:
+                        request = json.loads(line.decode('utf-8'))
+                        if isinstance(request, dict) and request.get('command') == 'status':
+                            result = service.get_status()
+                        else:
+                            job = service.submit(TransformationJob.from_dict(request))
+                            job.done.wait()
+                            result = job.result
+                    except (ValueError, KeyError) as ex:
+                        result = {'status': 'failed', 'error': 'invalid job: {}'.format(str(ex))}
+
+                    self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, JobRequestHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
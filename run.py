@@ -1,25 +1,165 @@
+import argparse
+import glob
+import os
 import sys
+
+from DataExporters.binary_triples import convert_to_ntriples
 from DataExporters.data_exporter import RDFExportFormats
+from DataExporters.graph_store import GraphStores
+from DataExporters.sparql_sink import SparqlProtocols
+from DataTransformers.entity_cache import DedupPolicies
+from DataTransformers.triple_codec import WireFormats
+from utils.compression import Compressions
+from json_object import JsonDecoders
 from manager.transformation_manager import TransformationManager
+from manager.transformation_service import TransformationService
+
+
+def int_or_default(value, default):
+    return int(value) if value is not None and value.isdigit() else default
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Transforms structured and semi-structured data into RDF graphs')
+    parser.add_argument('graph_identifier', nargs='?', default='')
+    parser.add_argument('input_path', nargs='?', default='')
+    parser.add_argument('output_path', nargs='?', default='')
+    parser.add_argument('descriptor_path', nargs='?', default='')
+    parser.add_argument('export_format', nargs='?')
+    parser.add_argument('number_of_threads', nargs='?')
+    parser.add_argument('inline_exporters', nargs='?', default='false')
+    parser.add_argument('buffer_size', nargs='?')
+    parser.add_argument('max_graph_size', nargs='?')
+    parser.add_argument('--wire-format', default=WireFormats.Auto, choices=WireFormats.all_formats,
+                        help='encoding of the triple batches sent from transformers to exporters')
+    parser.add_argument('--parallel-ingest', action='store_true',
+                        help='let every transformer read and parse its own byte range of a json lines or csv/tsv '
+                             'input file')
+    parser.add_argument('--json-backend', default=JsonDecoders.Auto, choices=JsonDecoders.all_backends,
+                        help='json decoder used by the importers. auto picks the fastest installed one. Concatenated '
+                             'json objects and large or compressed json arrays are always parsed with json')
+    parser.add_argument('--output-compression', choices=Compressions.output_codecs,
+                        help='compress the exported files. Guessed from the output path extension if not set')
+    parser.add_argument('--compression-level', type=int,
+                        help='the output compression level. Defaults to 6 for gz and 3 for zst')
+    parser.add_argument('--csv-delimiter', help='the field delimiter of csv/tsv input files. Default tab for .tsv files '
+                                                'and comma otherwise')
+    parser.add_argument('--coerce-types', action='store_true',
+                        help='convert numeric and boolean csv/tsv cells to numbers and booleans and skip empty cells')
+    parser.add_argument('--work-queue-size', type=int,
+                        help='the capacity of the transformers work queue in batches. Default 2 per transformer')
+    parser.add_argument('--exporter-queue-size', type=int, default=4,
+                        help='the capacity of every exporter input queue in triple batches')
+    parser.add_argument('--dedup', choices=DedupPolicies.all_policies,
+                        help='first_wins emits the triples of an entity only the first time a transformer sees its URI. '
+                             'Applies to the entities without a dedup key in the descriptor')
+    parser.add_argument('--dedup-cache-size', type=int, default=100000,
+                        help='the number of emitted entities every transformer remembers for deduplication')
+    parser.add_argument('--partition-by-subject', action='store_true',
+                        help='send every triple to the exporter owning the hash of its subject so the output files of '
+                             'an exporter hold all the triples of their subjects')
+    parser.add_argument('--sorted-output',
+                        help='merge the N-Triples/N-Quads output files into this single sorted file without duplicate '
+                             'triples once the transformation is done. Compressed if it ends with .gz or .zst')
+    parser.add_argument('--sort-memory', type=int, default=256,
+                        help='the memory budget of the output merge sort in MB')
+    parser.add_argument('--graph-store', choices=GraphStores.all_stores, default=GraphStores.Memory,
+                        help='the rdflib store the exporters build graphs in before serializing formats that are not '
+                             'line based. sqlite and sleepycat keep graphs on disk so --max-graph-size can be large')
+    parser.add_argument('--graph-store-dir', help='the directory of the disk graphs. Default the system temp directory')
+    parser.add_argument('--metrics-interval', type=float,
+                        help='print the throughput, queue depths and ETA of the running transformation every this many '
+                             'seconds')
+    parser.add_argument('--metrics-file', help='append the live metrics samples to this json lines file')
+    parser.add_argument('--profile', action='store_true',
+                        help='record the wall time, matches and triples of every descriptor entity, property and apply '
+                             'function and print them ranked by time')
+    parser.add_argument('--sparql-endpoint',
+                        help='load the triples into this SPARQL endpoint instead of writing output files, into the '
+                             'graph named by graph_identifier')
+    parser.add_argument('--sparql-protocol', choices=SparqlProtocols.all_protocols, default=SparqlProtocols.GraphStore,
+                        help='POST N-Triples to a Graph Store Protocol endpoint (gsp) or INSERT DATA requests to an '
+                             'Update endpoint (update)')
+    parser.add_argument('--sparql-batch-size', type=int, default=10000,
+                        help='the number of triples sent per request to the SPARQL endpoint')
+    parser.add_argument('--sparql-connections', type=int, default=4,
+                        help='the number of keep-alive connections, and requests in flight, per exporter')
+    parser.add_argument('--checkpoint-interval', type=float,
+                        help='commit the transformed input and the complete output files at most every this many '
+                             'seconds so an interrupted run can be resumed')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip the input committed by the checkpoint of a previous run and continue its output')
+    parser.add_argument('--binary-to-nt', nargs=2, metavar=('BINARY_PATH', 'NT_PATH'),
+                        help='convert a binary triples (rdfb) file, or the directory of the files written by the '
+                             'exporters, into a single N-Triples file and exit')
+    parser.add_argument('--serve', metavar='DESCRIPTOR_PATH',
+                        help='run as a service keeping a warm pool of workers for the descriptor and accepting jobs '
+                             'from --spool-dir and --socket. The positional input and output paths are ignored')
+    parser.add_argument('--spool-dir', help='directory watched for *.job files in service mode')
+    parser.add_argument('--socket', help='unix socket accepting json line jobs in service mode')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='the spool directory polling interval in seconds')
+    return parser.parse_args()
+
+
+def get_pipeline_options(args):
+    return dict(parallelism=int_or_default(args.number_of_threads, None),
+                inline_exporters=args.inline_exporters.lower() == 'true',
+                buffer_size=int_or_default(args.buffer_size, 1000),
+                max_graph_size=int_or_default(args.max_graph_size, 50000),
+                wire_format=args.wire_format,
+                parallel_ingest=args.parallel_ingest,
+                json_backend=args.json_backend,
+                output_compression=args.output_compression,
+                compression_level=args.compression_level,
+                csv_delimiter=args.csv_delimiter,
+                coerce_types=args.coerce_types,
+                work_queue_size=args.work_queue_size,
+                exporter_queue_size=args.exporter_queue_size,
+                dedup_policy=args.dedup,
+                dedup_cache_size=args.dedup_cache_size,
+                partition_by_subject=args.partition_by_subject,
+                sparql_endpoint=args.sparql_endpoint,
+                sparql_protocol=args.sparql_protocol,
+                sparql_batch_size=args.sparql_batch_size,
+                sparql_connections=args.sparql_connections,
+                graph_store=args.graph_store,
+                graph_store_dir=args.graph_store_dir,
+                metrics_interval=args.metrics_interval,
+                metrics_file=args.metrics_file,
+                profile=args.profile)
+
 
 if __name__ == "__main__":
-    graph_iden = sys.argv[1] if len(sys.argv) > 1 else ""
-    input_path = sys.argv[2] if len(sys.argv) > 2 else ""
-    output_path = sys.argv[3] if len(sys.argv) > 3 else ""
-    descriptor_path = sys.argv[4] if len(sys.argv) > 4 else ""
-    export_format = sys.argv[5] if len(sys.argv) > 5 and RDFExportFormats.is_recognized_format(sys.argv[5]) else None
-    parallelism = int(sys.argv[6]) if len(sys.argv) > 6 and sys.argv[6].isdigit() else None
-    inline_exporters = True if len(sys.argv) > 7 and sys.argv[7].lower() == 'true' else False
-    buffer_size = int(sys.argv[8]) if len(sys.argv) > 8 and sys.argv[8].isdigit() else 1000
-    max_graph_size = int(sys.argv[9]) if len(sys.argv) > 9 and sys.argv[9].isdigit() else 50000
-
-    trans_mngr = TransformationManager(graph_identifier=graph_iden,
-                                       input_file=input_path,
-                                       output_file=output_path,
-                                       descriptor_file=descriptor_path,
-                                       export_format=export_format,
-                                       parallelism=parallelism,
-                                       inline_exporters=True,
-                                       buffer_size=buffer_size,
-                                       max_graph_size=max_graph_size)
-    trans_mngr.run()
+    args = parse_arguments()
+
+    if args.binary_to_nt is not None:
+        binary_path, nt_path = args.binary_to_nt
+        binary_files = sorted(glob.glob(os.path.join(binary_path, '*.rdfb*'))) if os.path.isdir(binary_path) \
+            else [binary_path]
+        triples_count = convert_to_ntriples(binary_files, nt_path)
+        print('{} triples from {} files written to {}'.format(triples_count, len(binary_files), nt_path))
+    elif args.serve is not None:
+        service = TransformationService(descriptor_file=args.serve,
+                                        spool_dir=args.spool_dir,
+                                        socket_path=args.socket,
+                                        poll_interval=args.poll_interval,
+                                        **get_pipeline_options(args))
+        try:
+            service.serve()
+        except KeyboardInterrupt:
+            service.shutdown()
+    else:
+        trans_mngr = TransformationManager(graph_identifier=args.graph_identifier,
+                                           input_file=args.input_path,
+                                           output_file=args.output_path,
+                                           descriptor_file=args.descriptor_path,
+                                           export_format=args.export_format
+                                           if RDFExportFormats.is_recognized_format(args.export_format) else None,
+                                           sorted_output=args.sorted_output,
+                                           sort_memory=args.sort_memory * 1024 * 1024,
+                                           checkpoint_interval=args.checkpoint_interval,
+                                           resume=args.resume,
+                                           **get_pipeline_options(args))
+        if not trans_mngr.run():
+            sys.exit(1)
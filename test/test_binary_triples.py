@@ -0,0 +1,46 @@
+import pytest
+import rdflib
+
+from DataExporters.binary_triples import BinaryTriplesWriter, BinaryTriplesReader, convert_to_ntriples
+from DataExporters.ntriples_writer import ntriples_line
+from DataTransformers.Entity import RDFTriple
+
+SUBJ = rdflib.URIRef('http://twitter.com/someone')
+PRED = rdflib.URIRef('http://sioc.com/#description')
+TRIPLES = [RDFTriple(SUBJ, PRED, rdflib.Literal('say "salam"\nnow', lang='ar')),
+           RDFTriple(SUBJ, PRED, rdflib.Literal('42', datatype=rdflib.XSD.integer)),
+           RDFTriple(rdflib.BNode('b1'), PRED, SUBJ)]
+
+
+@pytest.mark.parametrize('extension, compression', [('', None), ('.gz', 'gz')])
+def test_round_trip(tmpdir, extension, compression):
+    filepath = str(tmpdir.join('out.rdfb' + extension))
+    writer = BinaryTriplesWriter(filepath, compression=compression)
+    written = writer.write(TRIPLES[:2]) + writer.write(TRIPLES + [RDFTriple(SUBJ, PRED, rdflib.URIRef('http://a b'))])
+    writer.close()
+
+    reader = BinaryTriplesReader(filepath)
+    assert (written, writer.skipped_count, len(reader), reader.terms_count) == (5, 1, 5, 5)
+    assert list(reader.triple_ids())[:3] == [(0, 1, 2), (0, 1, 3), (0, 1, 2)]
+    assert list(reader.triples())[2:] == [triple.to_tuple() for triple in TRIPLES]
+    assert reader.get_term(4) == '_:b1'
+    reader.close()
+    assert sorted(path.basename for path in tmpdir.listdir()) == ['out.rdfb' + extension]
+
+
+def test_convert_to_ntriples(tmpdir):
+    paths = [str(tmpdir.join('out_{}.rdfb'.format(i))) for i in range(2)]
+    for path, triples in zip(paths, (TRIPLES[:1], TRIPLES[1:])):
+        writer = BinaryTriplesWriter(path)
+        writer.write(triples)
+        writer.close()
+
+    assert convert_to_ntriples(paths, str(tmpdir.join('out.nt'))) == 3
+    assert tmpdir.join('out.nt').read_text('utf-8') == ''.join([ntriples_line(triple) for triple in TRIPLES])
+
+
+def test_other_files_are_rejected(tmpdir):
+    tmpdir.join('out.nt').write('<http://a> <http://b> <http://c> .\n' * 4)
+
+    with pytest.raises(ValueError):
+        BinaryTriplesReader(str(tmpdir.join('out.nt')))
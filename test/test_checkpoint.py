@@ -0,0 +1,50 @@
+from manager.checkpoint import Checkpoint
+
+MANIFEST = {'input_file': 'input.json', 'buffer_size': 100, 'ranges': [[0, 10], [10, 20]]}
+
+
+def chunk_filename(tmpdir):
+    return lambda exporter_no, save_counter: str(tmpdir.join('out_{}_{}.nt'.format(exporter_no, save_counter)))
+
+
+def test_resume_loads_the_committed_units(tmpdir):
+    checkpoint = Checkpoint(str(tmpdir.join('out.nt')))
+    assert checkpoint.start(MANIFEST, resume=True) is False
+
+    state = checkpoint.get_exporter_state(1)
+    state['units'].update({1: [0, 10], 3: [20, 10]})
+    state['chunks'].append(chunk_filename(tmpdir)(1, 1))
+    state['save_counter'] = 1
+    checkpoint.save_exporter_state(state)
+
+    resumed = Checkpoint(str(tmpdir.join('out.nt')))
+    assert resumed.start(dict(MANIFEST, ranges=None), resume=True) is True
+    assert [resumed.is_committed(unit_no) for unit_no in (1, 2, 3)] == [True, False, True]
+    assert resumed.get_exporter_state(1)['units'][3] == [20, 10]
+    assert resumed.manifest['ranges'] == MANIFEST['ranges']
+    assert resumed.get_committed_chunks_count() == 1
+
+
+def test_uncommitted_chunks_are_removed(tmpdir):
+    checkpoint = Checkpoint(str(tmpdir.join('out.nt')))
+    checkpoint.start(MANIFEST)
+    checkpoint.save_exporter_state(dict(checkpoint.get_exporter_state(1), save_counter=1))
+    for save_counter in (1, 2, 3):
+        tmpdir.join('out_1_{}.nt'.format(save_counter)).write('')
+
+    resumed = Checkpoint(str(tmpdir.join('out.nt')))
+    resumed.start(MANIFEST, resume=True)
+
+    assert resumed.remove_uncommitted_chunks(chunk_filename(tmpdir)) == 2
+    assert sorted(path.basename for path in tmpdir.listdir('*.nt')) == ['out_1_1.nt']
+
+
+def test_checkpoint_of_another_run_is_discarded(tmpdir):
+    checkpoint = Checkpoint(str(tmpdir.join('out.nt')))
+    checkpoint.start(MANIFEST)
+    checkpoint.save_exporter_state(dict(checkpoint.get_exporter_state(1), units={1: [0, 10]}))
+
+    resumed = Checkpoint(str(tmpdir.join('out.nt')))
+
+    assert resumed.start(dict(MANIFEST, buffer_size=200), resume=True) is False
+    assert not resumed.is_committed(1)
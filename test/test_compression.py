@@ -0,0 +1,72 @@
+import bz2
+import gzip
+import json
+import lzma
+
+import pytest
+
+from DataImporters.json_data_importer import JsonDataImporter
+from utils.compression import Compressions, detect_compression, open_file, open_output, strip_compression_extension, \
+    zstandard
+
+RECORDS = [{'id': i, 'text': 'tweet {}'.format(i)} for i in range(20)]
+CONTENT = ''.join(json.dumps(rec) + '\n' for rec in RECORDS).encode('utf-8')
+
+
+def write_compressed(tmpdir, name, compress):
+    filepath = str(tmpdir.join(name))
+    with open(filepath, 'wb') as f:
+        f.write(compress(CONTENT))
+    return filepath
+
+
+@pytest.mark.parametrize('name,compress', [('records.json.gz', gzip.compress),
+                                           ('records.json.bz2', bz2.compress),
+                                           ('records.json.xz', lzma.compress)])
+def test_compressed_json_lines_are_streamed(tmpdir, name, compress):
+    importer = JsonDataImporter(write_compressed(tmpdir, name, compress))
+
+    assert importer.is_streamed
+    assert not importer.supports_ranges()
+    assert list(importer.get_records()) == RECORDS
+    assert importer.read_stats.bytes_read == len(CONTENT)
+
+
+@pytest.mark.skipif(zstandard is None, reason='zstandard is not installed')
+def test_zstd_input(tmpdir):
+    filepath = write_compressed(tmpdir, 'records.jsonl.zst', zstandard.ZstdCompressor().compress)
+
+    with open_file(filepath, 'r') as f:
+        assert f.read().encode('utf-8') == CONTENT
+
+
+def test_raw_blocks_decode_to_the_same_records(tmpdir):
+    importer = JsonDataImporter(write_compressed(tmpdir, 'records.json.gz', gzip.compress))
+
+    assert [rec for lines in importer.get_raw_blocks() for rec in importer.decode_raw_block(lines)] == RECORDS
+
+
+def test_compression_detection(tmpdir):
+    unlabeled = write_compressed(tmpdir, 'records.data', gzip.compress)
+
+    assert detect_compression(unlabeled) == Compressions.Gzip
+    assert detect_compression('records.json.zst') == Compressions.Zstd
+    assert detect_compression(str(tmpdir.join('missing.json'))) is None
+    assert strip_compression_extension('/data/records.json.bz2') == '/data/records.json'
+    assert strip_compression_extension('/data.gz/records.json') == '/data.gz/records.json'
+
+
+@pytest.mark.parametrize('compression,decompress', [(Compressions.Gzip, gzip.decompress)] +
+                         ([(Compressions.Zstd, lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data))]
+                          if zstandard is not None else []))
+def test_background_compressed_output(tmpdir, compression, decompress):
+    filepath = str(tmpdir.join('out.nt.' + compression))
+    stream, writer = open_output(filepath, 'w', compression, level=1, buffer_size=64)
+    for i in range(1000):
+        stream.write('<http://a/{}> <http://p> "x" .\n'.format(i))
+    stream.close()
+    writer.wait()
+
+    with open(filepath, 'rb') as f:
+        assert decompress(f.read()) == ''.join('<http://a/{}> <http://p> "x" .\n'.format(i)
+                                               for i in range(1000)).encode('utf-8')
@@ -0,0 +1,37 @@
+from DataImporters.csv_data_importer import CsvDataImporter, coerce_value
+
+
+def write_table(tmpdir, name, delimiter, count):
+    filepath = tmpdir.join(name)
+    lines = [delimiter.join(['id', 'name', 'score', 'zip'])]
+    lines += [delimiter.join([str(i), '"name, {}"'.format(i) if delimiter == ',' else 'name {}'.format(i),
+                              '{}.5'.format(i) if i % 3 else '', '0{}'.format(i)]) for i in range(count)]
+    filepath.write('﻿' + '\n'.join(lines) + '\n')
+    return str(filepath)
+
+
+def test_rows_become_column_keyed_records(tmpdir):
+    importer = CsvDataImporter(write_table(tmpdir, 'table.csv', ',', 5))
+    records = list(importer.get_records())
+
+    assert importer.header == ['id', 'name', 'score', 'zip']
+    assert records[1] == {'id': '1', 'name': 'name, 1', 'score': '1.5', 'zip': '01'}
+    assert len(records) == 5
+
+
+def test_type_coercion(tmpdir):
+    importer = CsvDataImporter(write_table(tmpdir, 'table.tsv', '\t', 5), coerce_types=True, batch_rows=2)
+    records = list(importer.get_records())
+
+    assert records[1] == {'id': 1, 'name': 'name 1', 'score': 1.5, 'zip': '01'}
+    assert records[3]['score'] is None
+    assert [coerce_value(v) for v in ['-3', '1e3', 'true', 'FALSE', '', '007']] == [-3, 1000.0, True, False, None, '007']
+
+
+def test_byte_ranges_cover_every_row_once(tmpdir):
+    importer = CsvDataImporter(write_table(tmpdir, 'table.csv', ',', 101))
+    ranges = importer.get_ranges(4)
+    ids = [rec['id'] for start, end in ranges for rec in importer.get_records_in_range(start, end)]
+
+    assert ranges[0][0] == importer.data_offset
+    assert ids == [str(i) for i in range(101)]
@@ -0,0 +1,32 @@
+import zlib
+
+import rdflib
+
+from DataTransformers.Entity import RDFTriple
+from DataTransformers.data_transformer import DataTransformer
+
+
+def make_triples(subjects_count, triples_per_subject):
+    predicate = rdflib.URIRef('http://example.org/p')
+    return [RDFTriple(rdflib.URIRef('http://example.org/s{}'.format(i)), predicate, rdflib.Literal(j))
+            for i in range(subjects_count) for j in range(triples_per_subject)]
+
+
+def test_partitions_hold_disjoint_subjects():
+    triples = make_triples(50, 3)
+    partitions = DataTransformer.partition_triples(triples, 4)
+
+    assert sum(len(partition) for partition in partitions) == len(triples)
+    for i, partition in enumerate(partitions):
+        assert all(zlib.crc32(triple.subject.encode('utf-8')) % 4 == i for triple in partition)
+
+    subjects = [set(triple.subject for triple in partition) for partition in partitions]
+    assert sum(len(partition_subjects) for partition_subjects in subjects) == 50
+
+
+def test_partitioning_is_stable():
+    first = DataTransformer.partition_triples(make_triples(20, 2), 3)
+    second = DataTransformer.partition_triples(make_triples(20, 2)[::-1], 3)
+
+    assert [set(t.subject for t in partition) for partition in first] == \
+        [set(t.subject for t in partition) for partition in second]
@@ -0,0 +1,77 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+import rdflib
+
+from DataTransformers.data_transformer import DataTransformer
+from DataTransformers.entity_cache import DedupPolicies, SeenEntityCache
+from descriptor import Descriptor
+
+DESCRIPTOR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'descriptor.json')
+USER = rdflib.URIRef('http://twitter.com/someone')
+HAS_CREATOR = rdflib.URIRef('http://sioc.com/#has_creator')
+
+
+def test_repeated_entities_are_seen():
+    cache = SeenEntityCache()
+
+    assert [cache.seen('tweep', uri) for uri in ('u1', 'u2', 'u1', 'u1')] == [False, False, True, True]
+    assert cache.seen('location', 'u1') is False
+    assert (cache.hits, cache.misses) == ({'tweep': 2}, {'tweep': 2, 'location': 1})
+
+
+def test_least_recently_seen_entity_is_evicted():
+    cache = SeenEntityCache(max_size=2)
+
+    cache.seen('tweep', 'u1')
+    cache.seen('tweep', 'u2')
+    cache.seen('tweep', 'u1')
+    cache.seen('tweep', 'u3')
+
+    assert cache.evictions == 1
+    assert len(cache) == 2
+    assert cache.seen('tweep', 'u1') is True
+    assert cache.seen('tweep', 'u2') is False
+
+
+def get_transformer(tmpdir, entity_policy=None, option_policy=None, descriptor_policy=None):
+    with open(DESCRIPTOR_PATH) as f:
+        desc_dict = json.load(f)
+    if entity_policy is not None:
+        desc_dict['entities']['tweep']['dedup'] = entity_policy
+    if descriptor_policy is not None:
+        desc_dict['dedup'] = descriptor_policy
+    tmpdir.join('descriptor.json').write(json.dumps(desc_dict))
+
+    manager = SimpleNamespace(descriptor=Descriptor(str(tmpdir.join('descriptor.json'))), inline_exporters=True,
+                              exporters=None, buffer_size=10, exporter_queue_size=4, dedup_policy=option_policy,
+                              dedup_cache_size=10, profile=False)
+    return DataTransformer(manager, None)
+
+
+def test_repeated_entity_triples_are_skipped_but_linked(tmpdir):
+    transformer = get_transformer(tmpdir, entity_policy=DedupPolicies.FirstWins)
+    records = [{'id_str': str(i), 'text': 'tweet {}'.format(i), 'user': {'screen_name': 'someone', 'id_str': '7'}}
+               for i in range(2)]
+    first, second = [transformer.transform(record) for record in records]
+
+    assert any(triple.subject == USER for triple in first)
+    assert not any(triple.subject == USER for triple in second)
+    assert [triple.object for triple in second if triple.predicate == HAS_CREATOR] == [USER]
+    assert transformer.seen_entities.hits == {'tweep': 1}
+
+
+@pytest.mark.parametrize('entity_policy, option_policy, descriptor_policy, dedup', [
+    (None, None, None, False),
+    (None, None, DedupPolicies.FirstWins, True),
+    (None, DedupPolicies.AlwaysEmit, DedupPolicies.FirstWins, False),
+    (None, DedupPolicies.FirstWins, DedupPolicies.AlwaysEmit, True),
+    (DedupPolicies.FirstWins, DedupPolicies.AlwaysEmit, None, True),
+    (DedupPolicies.AlwaysEmit, None, DedupPolicies.FirstWins, False)])
+def test_policy_order(tmpdir, entity_policy, option_policy, descriptor_policy, dedup):
+    transformer = get_transformer(tmpdir, entity_policy, option_policy, descriptor_policy)
+    flags = dict(zip([entity_plan.name for entity_plan in transformer.plan.entities], transformer.dedup_flags))
+
+    assert flags['tweep'] is dedup
@@ -0,0 +1,37 @@
+import os
+
+import rdflib
+
+from DataExporters.graph_store import GraphStore, GraphStores
+
+SUBJ = rdflib.URIRef('http://twitter.com/someone')
+PRED = rdflib.URIRef('http://sioc.com/#description')
+TRIPLES = [(SUBJ, PRED, rdflib.Literal('salam', lang='ar')),
+           (SUBJ, PRED, rdflib.Literal('42', datatype=rdflib.XSD.integer)),
+           (SUBJ, rdflib.RDF.type, rdflib.URIRef('http://rdfs.org/sioc/ns#Post')),
+           (rdflib.BNode('b1'), PRED, rdflib.Literal('a\x1fb'))]
+
+
+def test_sqlite_graph_matches_memory_graph(tmpdir):
+    store = GraphStore(GraphStores.SQLite, str(tmpdir))
+    graph = store.new_graph('http://twitter.com/')
+    memory_graph = GraphStore().new_graph('http://twitter.com/')
+    for triple in TRIPLES + TRIPLES[:2]:
+        graph.add(triple)
+        memory_graph.add(triple)
+
+    assert len(graph) == 4
+    assert set(graph) == set(memory_graph)
+    assert set(graph.objects(SUBJ, PRED)) == {TRIPLES[0][2], TRIPLES[1][2]}
+    assert list(graph.subjects(None, rdflib.Literal('a\x1fb'))) == [rdflib.BNode('b1')]
+    assert graph.serialize(format='turtle') == memory_graph.serialize(format='turtle')
+
+    store.destroy_graph(graph)
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_missing_store_dependencies_fall_back():
+    from rdflib.plugins.sleepycat import has_bsddb
+
+    assert GraphStores.resolve(None) == GraphStores.Memory
+    assert GraphStores.resolve(GraphStores.Sleepycat) == (GraphStores.Sleepycat if has_bsddb else GraphStores.SQLite)
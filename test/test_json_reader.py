@@ -0,0 +1,91 @@
+import json
+
+from DataImporters.json_data_importer import JsonDataImporter
+from json_object import JsonDecoders, JsonReader
+
+
+def write_json_lines(tmpdir, count):
+    filepath = str(tmpdir.join('records.json'))
+    with open(filepath, 'w') as f:
+        for i in range(count):
+            f.write(json.dumps({'id': i, 'text': 'x' * (i % 7)}) + '\n')
+    return filepath
+
+
+def test_line_aligned_ranges_cover_every_record_once(tmpdir):
+    filepath = write_json_lines(tmpdir, 101)
+    ranges = JsonReader.get_line_aligned_ranges(filepath, 4)
+    records = [rec['id'] for start, end in ranges for rec in JsonReader.get_as_dict_streamed_range(filepath, start, end)]
+
+    assert ranges[0][0] == 0
+    assert all(prev[1] == cur[0] for prev, cur in zip(ranges, ranges[1:]))
+    assert records == list(range(101))
+
+
+def test_is_json_lines(tmpdir):
+    array_file = tmpdir.join('array.json')
+    array_file.write('[\n  {"id": 1}\n]\n')
+
+    assert JsonReader.is_json_lines(write_json_lines(tmpdir, 2))
+    assert not JsonReader.is_json_lines(str(array_file))
+
+
+def test_incremental_parsing_of_arrays_and_concatenated_objects(tmpdir):
+    records = [{'id': i, 'text': 'line\n{x}, [y]' * i, 'nested': {'list': [1, 2, {'a': 'b'}]}} for i in range(50)]
+    array_file = tmpdir.join('array.json')
+    array_file.write(json.dumps(records, indent=4))
+    objects_file = tmpdir.join('objects.json')
+    objects_file.write('\n'.join(json.dumps(rec, indent=2) for rec in records))
+
+    assert list(JsonReader.get_as_dict_incremental(str(array_file), chunk_size=64)) == records
+    assert list(JsonReader.get_as_dict_incremental(str(objects_file), chunk_size=64)) == records
+    assert JsonReader.get_layout(str(array_file)) == 'array'
+    assert JsonReader.get_layout(str(objects_file)) == 'objects'
+
+
+def test_incremental_parsing_skips_malformed_objects(tmpdir):
+    filepath = tmpdir.join('broken.json')
+    filepath.write('{"id": 1}\n{"id": \n{"id": 3}\n')
+
+    assert [rec['id'] for rec in JsonReader.get_as_dict_incremental(str(filepath), chunk_size=4)] == [1, 3]
+
+
+def test_json_decoders_accept_bytes():
+    for backend in JsonDecoders.get_available_backends():
+        name, loads = JsonDecoders.get_decoder(backend)
+
+        assert name == backend
+        assert loads(b'{"text": "\xd9\x85"}') == {'text': 'م'}
+
+    assert JsonDecoders.get_decoder('not-a-json-backend')[0] == JsonDecoders.Stdlib
+
+
+def test_malformed_objects_of_minified_arrays_are_skipped(tmpdir):
+    filepath = tmpdir.join('minified.json')
+    filepath.write('[{"a":1}, {"b": bad}, {"c": "x}"}, {"d": 4}]')
+    records = [{'id': i, 'text': 'x' * i} for i in range(40)]
+    big_file = tmpdir.join('big.json')
+    big_file.write(json.dumps(records).replace('"id": 20', '"id": bad'))
+
+    assert list(JsonReader.get_as_dict_incremental(str(filepath), chunk_size=4)) == [{'a': 1}, {'c': 'x}'}, {'d': 4}]
+    assert list(JsonReader.get_as_dict_incremental(str(big_file), chunk_size=16)) == records[:20] + records[21:]
+
+
+def test_nested_values_of_malformed_objects_are_not_records(tmpdir):
+    filepath = tmpdir.join('pretty.json')
+    filepath.write('[\n {"id": 1, "name": bad,\n  "entities":\n   {"id": 99, "kind": "nested"}\n },\n {"id": 2}\n]')
+
+    assert list(JsonReader.get_as_dict_incremental(str(filepath), chunk_size=8)) == [{'id': 2}]
+
+
+def test_incrementally_parsed_layouts_report_the_stdlib_decoder(tmpdir):
+    backend = JsonDecoders.get_available_backends()[0]
+    array_file = tmpdir.join('array.json')
+    array_file.write(json.dumps([{'id': 1}]))
+    objects_file = tmpdir.join('objects.json')
+    objects_file.write(json.dumps({'id': 1}, indent=2))
+
+    assert JsonDataImporter(write_json_lines(tmpdir, 2), backend).json_backend == backend
+    assert JsonDataImporter(str(array_file), backend).json_backend == backend
+    assert JsonDataImporter(str(objects_file), backend).json_backend == JsonDecoders.Stdlib
+    assert list(JsonDataImporter(str(objects_file), backend).get_records()) == [{'id': 1}]
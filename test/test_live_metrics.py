@@ -0,0 +1,44 @@
+import json
+import multiprocessing as mp
+from types import SimpleNamespace
+
+from manager.live_metrics import LiveMetricsSampler
+from manager.transformation_metrics import TransformationBatchInfo, ExportationBatchInfo
+from utils.compression import ReadStats, open_file
+
+
+def test_read_stats_position_follows_the_file(tmpdir):
+    filepath = str(tmpdir.join('records.json'))
+    tmpdir.join('records.json').write('{"id": 1}\n' * 1000)
+    read_stats = ReadStats(None, 10000)
+    assert read_stats.get_position() is None
+
+    with open_file(filepath, 'rb') as f:
+        read_stats.track(f)
+        f.read(5000)
+        assert 5000 <= read_stats.get_position() <= 10000
+    assert read_stats.get_position() == 10000
+
+
+def test_samples_report_rates_progress_and_queues(tmpdir):
+    read_stats = ReadStats(None, 1000)
+    read_stats.get_position = lambda: 250
+    manager = SimpleNamespace(importer=SimpleNamespace(read_stats=read_stats), parallel_ingest=False,
+                              work_queue=mp.Queue(), inline_exporters=True, exporters=[])
+    metrics = SimpleNamespace(manager=manager, stats_queue=mp.Queue(), transformers_msg_buffer=[],
+                              exporters_msg_buffer=[], serialization_msg_buffer=[], input_progress_msg_buffer=[])
+    sampler = LiveMetricsSampler(metrics, 60, str(tmpdir.join('metrics.jsonl')))
+    sampler.start()
+    metrics.transformers_msg_buffer += [TransformationBatchInfo(0, 0, 10, 100), TransformationBatchInfo(1, 0, 10, 50)]
+    metrics.exporters_msg_buffer.append(ExportationBatchInfo(0, 0, 150))
+
+    sample = sampler.sample()
+    assert (sample['records'], sample['triples'], sample['exported_triples']) == (20, 150, 150)
+    assert sample['progress'] == 0.25 and sample['eta'] > 0
+    assert sorted(sample['transformers']) == ['0', '1']
+    assert set(sample['queues']) == {'work', 'stats'}
+
+    metrics.transformers_msg_buffer.append(TransformationBatchInfo(0, 1, 5, 10))
+    sampler.stop()
+    samples = [json.loads(line) for line in tmpdir.join('metrics.jsonl').readlines()]
+    assert len(samples) == 1 and samples[0]['records'] == 25
@@ -0,0 +1,35 @@
+from utils.MultilevelDictionary import KeyPath, MultilevelDictionary
+
+
+RECORD = {
+    'id_str': '1',
+    'user': {'screen_name': 'someone', 'lang': None},
+    'entities': {'hashtags': [{'text': 'one'}, {'text': 'two'}, {'other': 'x'}]},
+}
+
+
+def test_get_from_dict_returns_expanded_keypaths():
+    matches = MultilevelDictionary.get_from_dict(RECORD, '/entities/hashtags/[*]/text')
+
+    assert [m.keypath for m in matches] == ['/entities/hashtags/0/text/', '/entities/hashtags/1/text/']
+    assert [m.match for m in matches] == ['one', 'two']
+
+
+def test_compiled_keypath_values():
+    assert KeyPath.compile('/user/screen_name').values(RECORD) == ['someone']
+    assert KeyPath.compile('/entities/hashtags/[1]/text').values(RECORD) == ['two']
+    assert KeyPath.compile('/entities/hashtags/[5]/text').values(RECORD) == []
+    assert KeyPath.compile('/user/lang').values(RECORD) == []
+    assert KeyPath.compile('/id_str/missing').values(RECORD) == []
+    assert KeyPath.compile('/').values(RECORD) == [RECORD]
+
+
+def test_compiled_keypaths_are_cached():
+    assert KeyPath.compile('/user/screen_name') is KeyPath.compile('/user/screen_name')
+
+
+def test_multilevel_dictionary_get():
+    ml_dict = MultilevelDictionary(RECORD)
+
+    assert [m.match for m in ml_dict.get('/user/')] == [RECORD['user']]
+    assert ml_dict['id_str'] == '1'
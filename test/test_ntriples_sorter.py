@@ -0,0 +1,40 @@
+import gzip
+import random
+
+from DataExporters.ntriples_sorter import NTriplesSorter
+
+
+def write_chunks(tmpdir, chunks_count, lines_count):
+    random.seed(7)
+    lines = ['<http://example.org/s{}> <http://example.org/p> "{}" .\n'.format(random.randint(0, 300), i % 5)
+             for i in range(chunks_count * lines_count)]
+    paths = []
+
+    for i in range(chunks_count):
+        chunk = ''.join(lines[i * lines_count: (i + 1) * lines_count])
+        if i % 2:
+            path = str(tmpdir.join('chunk_{}.nt.gz'.format(i)))
+            with gzip.open(path, 'wt') as f:
+                f.write(chunk)
+        else:
+            path = str(tmpdir.join('chunk_{}.nt'.format(i)))
+            tmpdir.join('chunk_{}.nt'.format(i)).write(chunk)
+        paths.append(path)
+
+    return paths, lines
+
+
+def test_sorted_output_is_unique_and_ordered(tmpdir):
+    paths, lines = write_chunks(tmpdir, 5, 400)
+    output = str(tmpdir.join('sorted.nt.gz'))
+
+    stats = NTriplesSorter(memory_budget=4096, workers=2, max_fan_in=3).sort(paths, output)
+
+    with gzip.open(output, 'rb') as f:
+        sorted_lines = f.readlines()
+    expected = sorted(set(line.encode('utf-8') for line in lines))
+
+    assert sorted_lines == expected
+    assert (stats.input_triples, stats.output_triples) == (len(lines), len(expected))
+    assert stats.runs_count > 3 and stats.merge_passes > 1
+    assert tmpdir.listdir(lambda path: path.basename.startswith('sort_runs_')) == []
@@ -0,0 +1,39 @@
+import rdflib
+
+from DataExporters.ntriples_writer import NTriplesWriter, ntriples_line
+from DataTransformers.Entity import RDFTriple
+
+SUBJ = rdflib.URIRef('http://twitter.com/someone')
+PRED = rdflib.URIRef('http://sioc.com/#description')
+
+
+def test_literal_escaping_and_data_types():
+    obj = rdflib.Literal('say "hi"\nnow \\', datatype=rdflib.URIRef('xsd:string'))
+
+    assert ntriples_line(RDFTriple(SUBJ, PRED, obj)) == \
+        '<http://twitter.com/someone> <http://sioc.com/#description> "say \\"hi\\"\\nnow \\\\"^^<xsd:string> .\n'
+    assert ntriples_line(RDFTriple(SUBJ, PRED, rdflib.Literal('salam', lang='ar'))).endswith(' "salam"@ar .\n')
+
+
+def test_quads_and_invalid_uris(tmpdir):
+    filepath = str(tmpdir.join('out.nq'))
+    writer = NTriplesWriter(filepath, graph_identifier='http://twitter.com/')
+    written = writer.write([RDFTriple(SUBJ, PRED, rdflib.URIRef('http://twitter.com/a b')),
+                            RDFTriple(SUBJ, PRED, rdflib.URIRef('http://twitter.com/other'))])
+    writer.close()
+
+    assert (written, writer.skipped_count) == (1, 1)
+    with open(filepath, encoding='utf-8') as f:
+        assert f.read() == '<http://twitter.com/someone> <http://sioc.com/#description> ' \
+                           '<http://twitter.com/other> <http://twitter.com/> .\n'
+
+
+def test_reopening_a_file_truncates_it(tmpdir):
+    filepath = str(tmpdir.join('out.nt'))
+    for _ in range(2):
+        writer = NTriplesWriter(filepath)
+        writer.write([RDFTriple(SUBJ, PRED, rdflib.Literal('salam'))])
+        writer.close()
+
+    with open(filepath, encoding='utf-8') as f:
+        assert f.readlines() == ['<http://twitter.com/someone> <http://sioc.com/#description> "salam" .\n']
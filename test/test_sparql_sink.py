@@ -0,0 +1,127 @@
+import http.server
+import queue
+import threading
+import time
+import urllib.parse
+from types import SimpleNamespace
+
+import pytest
+import rdflib
+
+from DataExporters.data_exporter import DataExporter
+from DataExporters.graph_store import GraphStores
+from DataExporters.sparql_sink import SparqlSink, SparqlProtocols
+from DataTransformers.Entity import RDFTriple
+from manager.checkpoint import Checkpoint
+
+SUBJ = rdflib.URIRef('http://twitter.com/someone')
+PRED = rdflib.URIRef('http://sioc.com/#description')
+
+
+class EndpointHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers['Content-Type'], body))
+            server.connections.add(self.client_address)
+            fail = server.failures > 0
+            server.failures -= 1 if fail else 0
+
+        self.send_response(503 if fail else 204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), EndpointHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.connections = set()
+    server.failures = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get_url(server):
+    return 'http://127.0.0.1:{}/store'.format(server.server_address[1])
+
+
+def test_graph_store_batches_on_keep_alive_connections(endpoint):
+    sink = SparqlSink(get_url(endpoint), 'http://twitter.com/', batch_size=10, connections_count=2)
+    for i in range(5):
+        sink.write([RDFTriple(SUBJ, PRED, rdflib.Literal('tweet {} {}'.format(i, j))) for j in range(9)])
+    sink.close()
+
+    info = sink.get_info(1)
+    lines = [line for _, _, body in endpoint.requests for line in body.splitlines()]
+    assert (info.triples_count, info.requests_count, info.failed_count) == (45, 3, 0)
+    assert len(set(lines)) == 45
+    assert all(path == '/store?' + urllib.parse.urlencode({'graph': 'http://twitter.com/'}) and
+               content_type == 'application/n-triples' for path, content_type, _ in endpoint.requests)
+    assert len(endpoint.connections) <= 2
+
+
+def test_update_requests_are_retried(endpoint):
+    endpoint.failures = 2
+    sink = SparqlSink(get_url(endpoint), protocol=SparqlProtocols.Update, connections_count=1, retry_delay=0.01)
+    sink.write_text('<http://a> <http://b> <http://c> .\n', 1)
+    sink.close()
+
+    info = sink.get_info(1)
+    assert (info.triples_count, info.requests_count, info.retries_count, info.failed_count) == (1, 3, 2, 0)
+    assert endpoint.requests[-1] == ('/store', 'application/sparql-update',
+                                     'INSERT DATA {\n<http://a> <http://b> <http://c> .\n}')
+
+
+def test_rejected_batches_are_counted(endpoint):
+    endpoint.failures = 10
+    sink = SparqlSink(get_url(endpoint), max_retries=1, retry_delay=0.01)
+    sink.write_text('<http://a> <http://b> <http://c> .\n', 1)
+    sink.close()
+
+    assert (sink.get_info(1).triples_count, sink.get_info(1).failed_count) == (0, 1)
+
+
+def test_drain_keeps_the_connections_and_load_is_timed_from_the_first_batch(endpoint):
+    sink = SparqlSink(get_url(endpoint), connections_count=1)
+    time.sleep(0.2)
+    for i in range(3):
+        sink.write_text('<http://a> <http://b> "{}" .\n'.format(i), 1)
+        sink.drain()
+        assert len(endpoint.requests) == i + 1
+    sink.close()
+
+    assert sink.get_info(1).triples_count == 3 and len(endpoint.connections) == 1
+    assert sink.get_info(1).elapsed_time < 0.2
+
+
+def test_failed_batches_are_not_committed(endpoint, tmpdir):
+    endpoint.failures = 10
+    checkpoint = Checkpoint(str(tmpdir.join('out.nt')), interval=0)
+    checkpoint.start({'input_file': 'input.json'})
+    manager = SimpleNamespace(output_file=None, graph_identifier='http://twitter.com/', export_format='nt',
+                              graph_store=GraphStores.Memory, graph_store_dir=None, buffer_size=10,
+                              output_compression=None, compression_level=None, sparql_endpoint=get_url(endpoint),
+                              sparql_protocol=SparqlProtocols.GraphStore, sparql_batch_size=10, sparql_connections=1,
+                              service_mode=False, partition_by_subject=False, parallelism=1, checkpoint=checkpoint)
+    exporter = DataExporter(manager, queue.Queue())
+    exporter.restore_checkpoint()
+    exporter.stream_writer = SparqlSink(get_url(endpoint), max_retries=0, connections_count=1)
+
+    exporter.receive_triples([RDFTriple(SUBJ, PRED, rdflib.Literal('salam'))])
+    exporter.unit_done(1, [0, 10])
+    assert exporter.load_failed and exporter.stream_writer is not None
+
+    exporter.finish_exportation()
+    resumed = Checkpoint(str(tmpdir.join('out.nt')))
+    resumed.start({'input_file': 'input.json'}, resume=True)
+    assert not resumed.is_committed(1)
@@ -0,0 +1,47 @@
+import os
+
+import rdflib
+
+from DataTransformers.Entity import Entity
+from DataTransformers.term_cache import TermCache
+from descriptor import Descriptor
+
+DESCRIPTOR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'descriptor.json')
+
+
+def test_literals_are_interned():
+    cache = TermCache()
+    first = cache.get_literal('en', cache.get_datatype('xsd:string'))
+
+    assert first is cache.get_literal('en', cache.get_datatype('xsd:string'))
+    assert first == rdflib.Literal('en', datatype=rdflib.URIRef('xsd:string'))
+    assert cache.get_literal(True) is not cache.get_literal(1)
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_long_literals_are_not_interned():
+    cache = TermCache(max_literal_length=4)
+
+    assert cache.get_literal('a long text') is not cache.get_literal('a long text')
+    assert len(cache) == 0
+
+
+def test_cache_is_bounded():
+    cache = TermCache(max_size=2)
+
+    for i in range(5):
+        cache.get_uri('http://example.com/{}'.format(i))
+
+    assert len(cache.uris) <= 2
+
+
+def test_entity_uris_are_not_interned():
+    descriptor = Descriptor(DESCRIPTOR_PATH)
+    for i in range(3):
+        entity = Entity('tweet', 'http://twitter.com/status/{}'.format(i), rdflib.URIRef('http://sioc.com/#Post'),
+                        descriptor)
+        entity.add_property('sioc:has_creator', 'http://twitter.com/someone', 'entity')
+        entity.add_property('sioc:id', str(i), 'literal')
+
+    assert entity.triples[1].object == rdflib.URIRef('http://twitter.com/someone')
+    assert list(descriptor.term_cache.uris) == ['sioc:has_creator', 'sioc:id']
@@ -0,0 +1,35 @@
+import multiprocessing as mp
+import threading
+
+from manager.transformation_metrics import QueueDepthTracker
+
+
+def test_queue_depth_tracker_records_the_high_water_mark():
+    bounded = mp.Queue(3)
+    tracker = QueueDepthTracker('work', 0, 3)
+
+    for i in range(3):
+        tracker.put(bounded, i)
+    for _ in range(3):
+        bounded.get()
+    tracker.put(bounded, 3)
+
+    info = tracker.get_info()
+    assert (info.queue_name, info.capacity, info.high_water_mark) == ('work', 3, 3)
+    assert info.blocked_time >= 0
+
+
+def test_queue_depth_tracker_records_the_time_blocked_on_a_full_queue():
+    bounded = mp.Queue(1)
+    tracker = QueueDepthTracker('exporter', 1, 1)
+    tracker.put(bounded, 0)
+    consumer = threading.Timer(0.2, bounded.get)
+    consumer.start()
+
+    tracker.put(bounded, 1)
+    consumer.join()
+
+    info = tracker.get_info()
+    assert (info.thread_no, info.high_water_mark) == (1, 1)
+    assert info.blocked_time >= 0.15
+    assert bounded.get(timeout=1) == 1
@@ -0,0 +1,38 @@
+import os
+
+import rdflib
+
+from descriptor import Descriptor
+
+DESCRIPTOR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'descriptor.json')
+
+
+def get_entity_plan(plan, name):
+    return [entity for entity in plan.entities if entity.name == name][0]
+
+
+def test_plan_is_compiled_once():
+    descriptor = Descriptor(DESCRIPTOR_PATH)
+
+    assert descriptor.get_transformation_plan() is descriptor.get_transformation_plan()
+
+
+def test_plan_resolves_terms():
+    plan = Descriptor(DESCRIPTOR_PATH).get_transformation_plan()
+    tweep = get_entity_plan(plan, 'tweep')
+    id_prop = [prop for prop in tweep.properties if prop.keypath.keypath == '/user/id_str'][0]
+
+    assert tweep.type == rdflib.URIRef('http://sioc.com/#UserAccount')
+    assert id_prop.predicate == rdflib.URIRef('http://sioc.com/#id')
+    assert id_prop.object_entity is None
+
+
+def test_plan_object_entity_substitutions_are_relative():
+    descriptor = Descriptor(DESCRIPTOR_PATH)
+    tweet = get_entity_plan(descriptor.get_transformation_plan(), 'tweet')
+    creator = [prop for prop in tweet.properties if prop.keypath.keypath == '/user/'][0]
+
+    assert creator.object_entity.entity_name == 'tweep'
+    assert [(var, kp.keypath) for var, kp in creator.object_entity.substitutions] == [('/user/screen_name',
+                                                                                         '/screen_name')]
+    assert creator.object_entity.build_uri({'screen_name': 'someone'}) == 'http://twitter.com/someone'
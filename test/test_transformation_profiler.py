@@ -0,0 +1,43 @@
+import os
+from types import SimpleNamespace
+
+from DataTransformers.data_transformer import DataTransformer
+from DataTransformers.entity_cache import DedupPolicies
+from descriptor import Descriptor
+from manager.transformation_metrics import TransformationMetrics
+
+DESCRIPTOR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'descriptor.json')
+RECORDS = [{'id_str': str(i), 'text': 'tweet {}'.format(i), 'created_at': 'Mon Feb 11 10:00:00 +0000 2019' if i else 0,
+            'user': {'id_str': '7', 'screen_name': 'someone', 'created_at': 'Mon Feb 11 10:00:00 +0000 2019'}}
+           for i in range(3)]
+
+
+def get_transformer(profile):
+    manager = SimpleNamespace(descriptor=Descriptor(DESCRIPTOR_PATH), inline_exporters=True, exporters=None,
+                              buffer_size=10, exporter_queue_size=4, dedup_policy=DedupPolicies.AlwaysEmit,
+                              dedup_cache_size=10, profile=profile)
+    return DataTransformer(manager, None)
+
+
+def test_profiling_counts_entities_properties_and_functions():
+    transformer = get_transformer(True)
+    triples = [triple.to_tuple() for record in RECORDS for triple in transformer.profile_transform(record)]
+    info = transformer.profiler.get_info(0)
+
+    assert triples == [triple.to_tuple() for record in RECORDS for triple in get_transformer(False).transform(record)]
+    assert sum(stats[3] for stats in info.entities.values()) == len(triples)
+    # every tweet entity has its rdf:type triple and the triples of its properties
+    tweet_properties = [stats for key, stats in info.properties.items() if key[0] == 'tweet']
+    assert info.entities['tweet'][:1] + info.entities['tweet'][2:] == (3, 3, 3 + sum(s[3] for s in tweet_properties))
+    assert info.properties[('tweet', '/text', 'http://sioc.com/#content')][2:] == (3, 3)
+    assert info.properties[('tweet', '/place/', 'http://twitter.com/ontology/tweetedfrom')][2:] == (0, 0)
+    # both created_at properties apply the function, the first tweet's date cannot be converted
+    calls, wall_time, errors = info.functions['utils.convenience.convert_to_rdf_datetime']
+    assert (calls, errors) == (6, 1) and wall_time > 0
+
+    metrics = SimpleNamespace(profile_msg_buffer=[info, info])
+    ranked = TransformationMetrics.get_profile_stats(metrics, 'entities')
+    assert ranked[0][1][1] >= ranked[-1][1][1] and dict(ranked)['tweet'][0] == 6
+
+    transformer.profiler.reset()
+    assert transformer.profiler.get_info(0).functions['utils.convenience.convert_to_rdf_datetime'] == (0, 0.0, 0)
@@ -0,0 +1,66 @@
+import glob
+import json
+import threading
+import time
+
+from manager.transformation_service import TransformationService, TransformationJob
+
+DESCRIPTOR = {
+    "prefixes": {"ex": "http://example.org/", "foaf": "http://xmlns.com/foaf/0.1/",
+                 "xsd": "http://www.w3.org/2001/XMLSchema#"},
+    "graph": "http://example.org",
+    "entities": {"person": {"name": "person", "uri_template": "http://example.org/person/{/id}", "type": "foaf:Person",
+                            "path": "/", "properties": {"/name": [{"predicate": "foaf:name", "score": 1.0,
+                                                                   "data_type": "xsd:string",
+                                                                   "object_type": "literal"}]}}}
+}
+
+
+def write_inputs(tmpdir):
+    descriptor_file = tmpdir.join('descriptor.json')
+    descriptor_file.write(json.dumps(DESCRIPTOR))
+    for name, count in (('a', 30), ('b', 50)):
+        tmpdir.join(name + '.csv').write('id,name\n' + ''.join('{0},name {0}\n'.format(i) for i in range(count)))
+    return str(descriptor_file)
+
+
+def read_lines(output_dir):
+    return set(line for path in glob.glob(output_dir + '/*') for line in open(path) if line.strip())
+
+
+def test_jobs_reuse_the_warm_pool(tmpdir):
+    service = TransformationService(write_inputs(tmpdir), parallelism=2, buffer_size=10)
+    jobs = [service.submit(TransformationJob(str(tmpdir.join(name + '.csv')), str(tmpdir.join(name + '.nt')), 'nt'))
+            for name in ('a', 'b')]
+    failed_job = service.submit(TransformationJob(str(tmpdir.join('missing.csv')), str(tmpdir.join('c.nt')), 'nt'))
+    service.stop()
+    service.serve()
+
+    assert [(job.result['records'], job.result['triples']) for job in jobs] == [(30, 60), (50, 100)]
+    assert failed_job.result['status'] == 'failed'
+    assert len(service.pools) == 1
+    assert 0 < service.get_status()['pools'][service.descriptor_file] <= 1
+    assert len(read_lines(str(tmpdir.join('a.nt')))) == 60
+    assert len(read_lines(str(tmpdir.join('b.nt')))) == 100
+
+
+def test_a_malformed_spool_job_does_not_stop_the_watcher(tmpdir):
+    spool_dir = tmpdir.mkdir('spool')
+    spool_dir.join('1.job').write('["x"]')
+    spool_dir.join('2.job').write(json.dumps({'input': str(tmpdir.join('a.csv')), 'output': str(tmpdir.join('a.nt')),
+                                              'format': 'nt'}))
+    service = TransformationService(write_inputs(tmpdir), spool_dir=str(spool_dir), poll_interval=0.1,
+                                    parallelism=1, buffer_size=10)
+    server = threading.Thread(target=service.serve)
+    server.start()
+
+    deadline = time.time() + 60
+    while not spool_dir.join('2.done').exists() and time.time() < deadline:
+        time.sleep(0.1)
+    service.stop()
+    server.join()
+
+    assert spool_dir.join('1.failed').exists()
+    assert 'must be a json object' in json.loads(spool_dir.join('1.result.json').read())['error']
+    assert json.loads(spool_dir.join('2.result.json').read())['records'] == 30
+    assert len(read_lines(str(tmpdir.join('a.nt')))) == 60
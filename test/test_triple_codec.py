@@ -0,0 +1,32 @@
+import rdflib
+
+from DataTransformers.Entity import RDFTriple
+from DataTransformers.triple_codec import TripleBatchCodec, EncodedNTriples
+
+SUBJ = rdflib.URIRef('http://twitter.com/someone')
+TRIPLES = [RDFTriple(SUBJ, rdflib.URIRef('http://sioc.com/#name'), rdflib.Literal('someone', datatype='xsd:string')),
+           RDFTriple(SUBJ, rdflib.URIRef('http://purl.org/dc/terms/language'), rdflib.Literal('مرحبا', lang='ar')),
+           RDFTriple(SUBJ, rdflib.URIRef('http://twitter.com/ontology/quoted'), rdflib.BNode('b1')),
+           RDFTriple(SUBJ, rdflib.URIRef('http://sioc.com/#name'), rdflib.Literal('someone', datatype='xsd:string'))]
+
+
+def test_dictionary_round_trip():
+    payload = TripleBatchCodec.encode_dictionary(TRIPLES)
+    decoded = TripleBatchCodec.decode(payload)
+
+    assert TripleBatchCodec.is_encoded(payload)
+    assert [t.to_tuple() for t in decoded] == [t.to_tuple() for t in TRIPLES]
+    assert decoded[0].object.datatype == rdflib.URIRef('xsd:string')
+    assert decoded[1].object.language == 'ar'
+
+
+def test_ntriples_batches():
+    invalid = RDFTriple(TRIPLES[0].subject, TRIPLES[0].predicate, rdflib.URIRef('http://twitter.com/a b'))
+    payload, skipped_count = TripleBatchCodec.encode_ntriples([invalid] + TRIPLES[:1], 'http://twitter.com/')
+    decoded = TripleBatchCodec.decode(payload)
+
+    assert skipped_count == 1
+    assert type(decoded) is EncodedNTriples
+    assert decoded.triples_count == 1
+    assert decoded.text == '<http://twitter.com/someone> <http://sioc.com/#name> "someone"^^<xsd:string> ' \
+                           '<http://twitter.com/> .\n'
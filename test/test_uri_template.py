@@ -0,0 +1,40 @@
+import pytest
+
+from utils.uri_template import UriTemplate, UriTemplateException
+
+
+def test_parse_template_segments():
+    assert UriTemplate.parse('http://twitter.com/{/user/screen_name}/status/{/id_str}') == [
+        (False, 'http://twitter.com/'), (True, '/user/screen_name'), (False, '/status/'), (True, '/id_str')]
+    assert UriTemplate.parse('{/expanded_url}') == [(True, '/expanded_url')]
+    assert UriTemplate.parse('http://example.com/{unclosed') == [(False, 'http://example.com/{unclosed')]
+
+
+def test_build_uris_with_fan_out():
+    template = UriTemplate('http://twitter.com/hashtag#{/entities/hashtags/[*]/text}')
+    record = {'entities': {'hashtags': [{'text': 'one'}, {'text': 'two'}]}}
+
+    assert template.build_uris(record) == ['http://twitter.com/hashtag#one', 'http://twitter.com/hashtag#two']
+    assert template.build_uris({'entities': {'hashtags': []}}) == []
+
+
+def test_build_uris_requires_matching_substitution_counts():
+    template = UriTemplate('http://example.com/{/a/[*]}/{/b/[*]}')
+
+    with pytest.raises(UriTemplateException):
+        template.build_uris({'a': [1, 2], 'b': [1]})
+
+
+def test_expand_keeps_unsubstituted_variables():
+    template = UriTemplate('http://twitter.com/{/user/screen_name}/status/{/id_str}')
+
+    assert template.expand({'/id_str': 5}) == 'http://twitter.com/{/user/screen_name}/status/5'
+
+
+def test_percent_encoding_of_substituted_values():
+    record = {'tag': 'two words', 'url': 'http://example.com/a b?x=1'}
+
+    assert UriTemplate('http://t.com/hashtag#{/tag}', encode=True).build_uris(record) == \
+        ['http://t.com/hashtag#two%20words']
+    assert UriTemplate('{/url}', encode=True).build_uris(record) == ['http://example.com/a%20b?x=1']
+    assert UriTemplate('http://t.com/hashtag#{/tag}').build_uris(record) == ['http://t.com/hashtag#two words']
@@ -0,0 +1,38 @@
+from xml.etree import ElementTree
+
+from DataImporters.xml_data_importer import XmlDataImporter, element_to_object
+from utils.MultilevelDictionary import KeyPath
+
+FEED = '''<?xml version="1.0"?>
+<feed xmlns="http://example.org/feed">
+  <meta><title>ignored</title></meta>
+  <entries>
+    <entry id="1"><title>first</title><tag>a</tag><tag>b</tag><author><name>x</name></author></entry>
+    <entry id="2"><title>second</title><tag>c</tag><empty/></entry>
+  </entries>
+</feed>
+'''
+
+
+def test_element_to_object_shapes():
+    element = ElementTree.fromstring('<e lang="en">text<child>1</child><child>2</child><single>3</single></e>')
+
+    assert element_to_object(element) == {'@lang': 'en', 'child': ['1', '2'], 'single': '3', '#text': 'text'}
+    assert element_to_object(element, {'single'})['single'] == ['3']
+
+
+def test_records_are_streamed_from_the_configured_element(tmpdir):
+    filepath = tmpdir.join('feed.xml')
+    filepath.write(FEED)
+    records = list(XmlDataImporter(str(filepath), 'entry', {'tag'}).get_records())
+
+    assert records == [{'@id': '1', 'title': 'first', 'tag': ['a', 'b'], 'author': {'name': 'x'}},
+                       {'@id': '2', 'title': 'second', 'tag': ['c'], 'empty': None}]
+    assert [KeyPath.compile('/tag/[*]').values(record) for record in records] == [['a', 'b'], ['c']]
+
+
+def test_records_default_to_the_root_children(tmpdir):
+    filepath = tmpdir.join('rows.xml')
+    filepath.write('<rows><row><a>1</a></row><row><a>2</a></row></rows>')
+
+    assert list(XmlDataImporter(str(filepath)).get_records()) == [{'a': '1'}, {'a': '2'}]
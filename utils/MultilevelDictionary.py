@@ -2,7 +2,6 @@
 Unlimited levels of dictionaries with an interface to access and assign values via keypaths
 """
 
-import anytree
 from utils.convenience import vectorize_object, devectorize_list
 
 
@@ -17,6 +16,163 @@ class MultilevelDictionaryKeyPathMatch:
         self.match = match
 
 
+class KeyPath:
+    """
+    compiled form of a key path. The key path string is parsed once into a list of steps (dictionary keys, list indices
+    or [*]) and the compiled object is reused to walk any number of records directly without building intermediate
+    expansion trees
+    """
+
+    KEY = 0
+    INDEX = 1
+    ALL = 2
+
+    max_cache_size = 4096
+    __compiled = {}
+
+    def __init__(self, keypath):
+        """
+        parses the key path into its steps
+        :param keypath: key path such as '/entities/hashtags/[*]/text'
+        """
+        self.keypath = keypath
+        self.is_root = keypath == '/'
+        self.steps = [] if self.is_root else [KeyPath.__compile_component(comp) for comp in KeyPath.split(keypath)]
+
+    def __repr__(self):
+        return 'KeyPath({})'.format(self.keypath)
+
+    def get_list_keys(self):
+        """
+        returns the dictionary keys the key path expects to hold lists, i.e. the keys followed by [index] or [*]
+        :return: list of keys
+        """
+        return [component for (kind, component, _), (next_kind, _, _) in zip(self.steps, self.steps[1:])
+                if kind == KeyPath.KEY and next_kind != KeyPath.KEY]
+
+    @staticmethod
+    def compile(keypath):
+        """
+        returns the compiled KeyPath for the passed key path string. Compiled key paths are cached per process so
+        repeated lookups with the same key path string are parsed only once
+        :param keypath: the key path string
+        :return: KeyPath object
+        """
+        compiled = KeyPath.__compiled.get(keypath)
+
+        if compiled is None:
+            if len(KeyPath.__compiled) >= KeyPath.max_cache_size:
+                KeyPath.__compiled.clear()
+            compiled = KeyPath(keypath)
+            KeyPath.__compiled[keypath] = compiled
+
+        return compiled
+
+    def values(self, collection_obj):
+        """
+        walks the collection object following the compiled steps and returns the matched values only. This is the fast
+        path used by the transformer since it does not need the key path of every match
+        :param collection_obj: nested dicts and lists to apply the key path on
+        :return: list of the matched values that are not None
+        """
+        if self.is_root:
+            return [collection_obj]
+
+        current = [collection_obj]
+
+        for kind, component, arg in self.steps:
+            matched = []
+
+            for obj in current:
+                obj_type = type(obj)
+
+                if obj_type is dict:
+                    if component in obj:
+                        matched.append(obj[component])
+                elif obj_type is list:
+                    if kind == KeyPath.ALL:
+                        matched.extend(obj)
+                    elif kind == KeyPath.INDEX and arg < len(obj):
+                        matched.append(obj[arg])
+
+            if len(matched) == 0:
+                return matched
+
+            current = matched
+
+        return [val for val in current if val is not None]
+
+    def matches(self, collection_obj):
+        """
+        walks the collection object following the compiled steps and returns the matches with their expanded key paths
+        :param collection_obj: nested dicts and lists to apply the key path on
+        :return: list of MultilevelDictionaryKeyPathMatch for values that are not None
+        """
+        if self.is_root:
+            return [MultilevelDictionaryKeyPathMatch(self.keypath, collection_obj)]
+
+        current = [('/', collection_obj)]
+
+        for kind, component, arg in self.steps:
+            matched = []
+
+            for path, obj in current:
+                obj_type = type(obj)
+
+                if obj_type is dict:
+                    if component in obj:
+                        matched.append(('{}{}/'.format(path, component), obj[component]))
+                elif obj_type is list:
+                    if kind == KeyPath.ALL:
+                        matched.extend(('{}{}/'.format(path, i), item) for i, item in enumerate(obj))
+                    elif kind == KeyPath.INDEX and arg < len(obj):
+                        matched.append(('{}{}/'.format(path, arg), obj[arg]))
+
+            if len(matched) == 0:
+                return []
+
+            current = matched
+
+        return [MultilevelDictionaryKeyPathMatch(path, val) for path, val in current if val is not None]
+
+    @staticmethod
+    def split(key_path):
+        """
+        splits the key path string into its components ignoring the leading and trailing slashes
+        :param key_path: the key path string
+        :return: list of key path components
+        """
+        kp_components = key_path.split('/')
+
+        if key_path.startswith('/'):
+            kp_components = kp_components[1:]
+
+        if key_path.endswith('/'):
+            kp_components = kp_components[:-1]
+
+        return kp_components
+
+    @staticmethod
+    def __compile_component(kp_comp):
+        """
+        converts a single key path component to a step tuple (kind, component, index)
+        :param kp_comp: key path component such as 'user', '[0]' or '[*]'
+        :return: tuple(kind, component, index)
+        """
+        if kp_comp.startswith('[') and kp_comp.endswith(']'):
+            index_str = kp_comp[1:-1]
+
+            if index_str == '*':
+                return KeyPath.ALL, kp_comp, None
+            elif index_str.isdigit():
+                try:
+                    return KeyPath.INDEX, kp_comp, int(index_str)
+                except ValueError:
+                    pass
+
+        return KeyPath.KEY, kp_comp, None
+
+
 class MultilevelDictionary:
 
     def __init__(self, init_dict=None):
@@ -73,100 +229,7 @@ class MultilevelDictionary:
         :param keypath: the key path to get the value at
         :return: list of MultilevelDictionaryKeyPathMatch if key_path exists in the dictionary, empty list otherwise
         """
-        if keypath == '/':
-            return [MultilevelDictionaryKeyPathMatch(keypath, dictionary)]
-
-        current_object = dictionary
-
-        tree_root, kp_list = MultilevelDictionary.__build_keypath_expansion_tree(keypath, current_object)
-        keypath_tree_results = []
-        MultilevelDictionary.__get_keypath_results(kp_list, keypath_tree_results, tree_root)
-
-        if len(keypath_tree_results) == 0:
-            # print('key path {} has no matches in the record'.format(keypath))
-            pass
-
-        return [MultilevelDictionaryKeyPathMatch(node.keypath, node.keypath_value) for node in keypath_tree_results
-                if node.keypath_value is not None]
-
-    @staticmethod
-    def __get_keypath_results(kp_list, results_list, tree_node):
-        """
-        this method accepts the path expansion tree and extracts the matches found for the key path which are the leaf
-        nodes in the expansion tree
-        :param kp_list: the original keypath as list to make sure leaf nodes fulfills the whole path
-        :param results_list: list to store the matched results
-        :param tree_node: the key path expansion tree
-        :return: None. The results are stored in the results_list
-        """
-        for child in tree_node.children:
-            if child.is_leaf and MultilevelDictionary.__node_path_fulfills_keypath(child, kp_list):
-                results_list.append(child)
-            else:
-                MultilevelDictionary.__get_keypath_results(kp_list, results_list, child)
-
-    @staticmethod
-    def __node_path_fulfills_keypath(node, kp_list):
-        return node.tree_level == len(kp_list)
-
-    @staticmethod
-    def __build_keypath_expansion_tree(key_path, collection_obj):
-        """
-        given a keypath, this static method accepts a key path string and a collection object of nested lists and dicts.
-        It returns a tree structure of all possible and valid paths from key path within the collection object
-        :param key_path: the key path used to construct the key path tree
-        :param collection_obj: the collection object where the key path is applied on
-        :return: the root of the constructed key path tree
-        """
-        kp_list = MultilevelDictionary.__get_keypath_list(key_path)
-        kp_root_node = anytree.AnyNode(keypath='/', keypath_value=None, tree_level=0)
-        MultilevelDictionary.__expand_keypath(kp_root_node, kp_list, collection_obj)
-
-        return kp_root_node, kp_list
-
-    @staticmethod
-    def __expand_keypath(parent_node, kp_list, collection_obj):
-        first_kp_comp = kp_list[0] if len(kp_list) > 0 else None
-
-        if first_kp_comp is None or collection_obj is None or \
-           not MultilevelDictionary.__is_valid_keypath_component(first_kp_comp, collection_obj):
-            return
-
-        if type(collection_obj) is list and MultilevelDictionary.__is_list_path_component(first_kp_comp):
-            index_str = first_kp_comp[1:-1]
-
-            if index_str == '*':
-                for i, item in enumerate(collection_obj):
-                    node = anytree.AnyNode(parent_node, keypath='{}{}/'.format(parent_node.keypath, str(i)),
-                                           keypath_value=item, tree_level=parent_node.tree_level + 1)
-                    MultilevelDictionary.__expand_keypath(node, kp_list[1:], item)
-            else:
-                try:
-                    index = int(index_str)
-
-                    if index < len(collection_obj):
-                        node = anytree.AnyNode(parent_node, keypath='{}{}/'.format(parent_node.keypath, str(index)),
-                                               keypath_value=collection_obj[index],
-                                               tree_level=parent_node.tree_level + 1)
-                        MultilevelDictionary.__expand_keypath(node, kp_list[1:], collection_obj[index])
-                except IndexError as ex:
-                    # TODO: handle if the index format is invalid
-                    raise ex
-
-        elif type(collection_obj) is dict and first_kp_comp in collection_obj:
-            node = anytree.AnyNode(parent_node, keypath='{}{}/'.format(parent_node.keypath, first_kp_comp),
-                                   keypath_value=collection_obj[first_kp_comp],
-                                   tree_level=parent_node.tree_level + 1)
-            MultilevelDictionary.__expand_keypath(node, kp_list[1:], collection_obj[first_kp_comp])
-
-    @staticmethod
-    def __is_valid_keypath_component(kp_component, collection_obj):
-        return MultilevelDictionary.__is_list_path_component(kp_component) or \
-                kp_component in collection_obj
-
-    @staticmethod
-    def __is_list_path_component(kp_comp):
-        return kp_comp.startswith('[') and kp_comp.endswith(']') and (kp_comp[1:-1].isdigit() or kp_comp[1:-1] == '*')
+        return KeyPath.compile(keypath).matches(dictionary)
 
     @staticmethod
     def __is_keypath(kp):
@@ -174,13 +237,4 @@ class MultilevelDictionary:
 
     @staticmethod
     def __get_keypath_list(key_path):
-
-        kp_components = key_path.split('/')
-
-        if key_path.startswith('/'):
-            kp_components = kp_components[1:]
-
-        if key_path.endswith('/'):
-            kp_components = kp_components[:-1]
-
-        return kp_components
+        return KeyPath.split(key_path)
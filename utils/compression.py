@@ -0,0 +1,265 @@
+"""
+transparent streaming (de)compression of input and output files
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+READ_BUFFER_SIZE = 1024 * 1024
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+# the number of write buffers waiting for the compression thread before writers block
+MAX_PENDING_CHUNKS = 4
+
+
+class Compressions:
+    """
+    supported compression codecs. The values are the file extensions of the codecs
+    """
+    Gzip = 'gz'
+    Bzip2 = 'bz2'
+    Xz = 'xz'
+    Zstd = 'zst'
+
+    all_codecs = [Gzip, Bzip2, Xz, Zstd]
+
+    extensions = {'gz': Gzip, 'gzip': Gzip, 'bz2': Bzip2, 'xz': Xz, 'lzma': Xz, 'zst': Zstd, 'zstd': Zstd}
+
+    magic_numbers = [(b'\x1f\x8b', Gzip), (b'BZh', Bzip2), (b'\xfd7zXZ\x00', Xz), (b'\x28\xb5\x2f\xfd', Zstd)]
+
+    # codecs the exporters can write and their default compression levels
+    output_codecs = [Gzip, Zstd]
+    default_levels = {Gzip: 6, Zstd: 3}
+
+
+class CompressionException(Exception):
+    pass
+
+
+def detect_compression(filepath):
+    """
+    detects the compression codec of a file from its extension or, if the extension is unknown, from its magic number
+    :param filepath: the file path
+    :return: one of Compressions or None for uncompressed files
+    """
+    extension = filepath.split('.')[-1].lower() if '.' in os.path.basename(filepath) else None
+
+    if extension in Compressions.extensions:
+        return Compressions.extensions[extension]
+
+    if os.path.isfile(filepath):
+        with open(filepath, 'rb') as f:
+            header = f.read(6)
+        for magic, codec in Compressions.magic_numbers:
+            if header.startswith(magic):
+                return codec
+
+    return None
+
+
+def strip_compression_extension(filepath):
+    """
+    removes the compression extension from the file path, for example 'tweets.json.gz' => 'tweets.json'
+    :param filepath: the file path
+    :return: the file path without the compression extension
+    """
+    if '.' in os.path.basename(filepath) and filepath.split('.')[-1].lower() in Compressions.extensions:
+        return filepath[:filepath.rindex('.')]
+    return filepath
+
+
+def open_file(filepath, mode='rb', compression=None, newline=None):
+    """
+    opens the file for reading with streaming decompression
+    :param filepath: the file path
+    :param mode: 'rb' for bytes or 'r'/'rt' for text
+    :param compression: one of Compressions. Detected from the file if None
+    :param newline: the newline mode of text files as in the built in open
+    :return: file object
+    """
+    codec = compression if compression is not None else detect_compression(filepath)
+
+    if codec is None:
+        stream = open(filepath, 'rb', buffering=READ_BUFFER_SIZE)
+    elif codec == Compressions.Gzip:
+        stream = io.BufferedReader(gzip.open(filepath, 'rb'), READ_BUFFER_SIZE)
+    elif codec == Compressions.Bzip2:
+        stream = io.BufferedReader(bz2.open(filepath, 'rb'), READ_BUFFER_SIZE)
+    elif codec == Compressions.Xz:
+        stream = io.BufferedReader(lzma.open(filepath, 'rb'), READ_BUFFER_SIZE)
+    elif codec == Compressions.Zstd:
+        if zstandard is None:
+            raise CompressionException('reading {} needs the zstandard package'.format(filepath))
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'),
+                                                                              closefd=True), READ_BUFFER_SIZE)
+    else:
+        raise CompressionException('unsupported compression {}'.format(codec))
+
+    return stream if 'b' in mode else io.TextIOWrapper(stream, encoding='utf-8', newline=newline)
+
+
+class ReadStats:
+    """
+    accumulates the number of (decompressed) bytes read from an input file and the time spent reading them
+    """
+    def __init__(self, compression=None, compressed_bytes=0):
+        self.compression = compression
+        self.compressed_bytes = compressed_bytes
+        self.bytes_read = 0
+        self.read_time = 0.0
+        self.stream = None
+
+    def track(self, stream):
+        """
+        remembers the stream reading the input file so get_position can tell how far the file was read
+        :param stream: file object returned by open_file
+        :return: None
+        """
+        self.stream = stream
+
+    def get_position(self):
+        """
+        returns the offset reached in the input file on disk, which is the compressed offset of compressed files. Safe to
+        call from another thread while the file is read
+        :return: the offset in bytes or None if it is not known
+        """
+        stream = self.stream
+        if stream is None:
+            return None
+        if stream.closed:
+            return self.compressed_bytes
+
+        try:
+            return os.lseek(stream.fileno(), 0, os.SEEK_CUR)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            return self.bytes_read if self.compression is None else None
+
+
+class TimedReader:
+    """
+    binary file object wrapper that accounts the bytes read and the read time in a ReadStats object. Meant for consumers
+    that read in chunks, like xml.etree.ElementTree.iterparse, where timing every read is cheap
+    """
+    def __init__(self, stream, read_stats):
+        self.stream = stream
+        self.read_stats = read_stats
+
+    def read(self, size=-1):
+        start_time = time.time()
+        data = self.stream.read(size)
+        self.read_stats.read_time += time.time() - start_time
+        self.read_stats.bytes_read += len(data)
+        return data
+
+
+class CompressedWriter(io.RawIOBase):
+    """
+    binary file object that compresses what is written to it on a background thread. Writes only queue the data so
+    the caller keeps producing while the previous chunks are compressed (zlib and zstd release the GIL while they
+    compress). The queue is bounded so a slow disk or compressor blocks the writer instead of growing memory. Wrap it in
+    io.BufferedWriter to hand large chunks to the thread, as open_output does
+    """
+
+    def __init__(self, filepath, compression, level=None):
+        """
+        :param filepath: the output file path
+        :param compression: one of Compressions.output_codecs
+        :param level: the compression level. Default the codec's level in Compressions.default_levels
+        """
+        io.RawIOBase.__init__(self)
+        self.filepath = filepath
+        self.compression = compression
+        self.level = level if level is not None else Compressions.default_levels.get(compression)
+        self.bytes_written = 0
+        self.error = None
+        self.file = open(filepath, 'wb')
+        self.compressor = self.__create_compressor()
+        self.chunks = queue.Queue(MAX_PENDING_CHUNKS)
+        self.thread = threading.Thread(target=self.__compress_chunks, daemon=True)
+        self.thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.error is not None:
+            raise self.error
+        self.chunks.put(bytes(data))
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self):
+        """
+        queues the end of the stream without waiting for the compression thread. Call wait to make sure the compressed
+        file is complete
+        :return: None
+        """
+        if not self.closed:
+            self.chunks.put(None)
+        io.RawIOBase.close(self)
+
+    def wait(self):
+        """
+        closes the writer and blocks until the compression thread has written and closed the compressed file
+        :return: None
+        """
+        self.close()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __create_compressor(self):
+        if self.compression == Compressions.Gzip:
+            return gzip.GzipFile(filename='', mode='wb', compresslevel=self.level, fileobj=self.file)
+        elif self.compression == Compressions.Zstd:
+            if zstandard is None:
+                raise CompressionException('writing {} needs the zstandard package'.format(self.filepath))
+            return zstandard.ZstdCompressor(level=self.level).stream_writer(self.file, closefd=False)
+        else:
+            raise CompressionException('unsupported output compression {}'.format(self.compression))
+
+    def __compress_chunks(self):
+        try:
+            while True:
+                chunk = self.chunks.get()
+                if chunk is None:
+                    break
+                self.compressor.write(chunk)
+        except Exception as ex:
+            self.error = ex
+            # keep consuming so writers blocked on the full queue are released
+            while self.chunks.get() is not None:
+                pass
+        finally:
+            self.compressor.close()
+            self.file.close()
+
+
+def open_output(filepath, mode='wb', compression=None, level=None, buffer_size=WRITE_BUFFER_SIZE):
+    """
+    opens the file for writing, compressing it on a background thread if compression is passed
+    :param filepath: the file path
+    :param mode: 'wb' for bytes or 'w'/'wt' for text
+    :param compression: one of Compressions.output_codecs or None for uncompressed output
+    :param level: the compression level
+    :param buffer_size: the size of the write buffer, which is also the size of the chunks compressed at a time
+    :return: tuple(file object, CompressedWriter or None). Closing the file object does not wait for the compression,
+    call wait on the CompressedWriter for that
+    """
+    if compression is None:
+        binary = 'b' in mode
+        return open(filepath, mode, buffering=buffer_size, encoding=None if binary else 'utf-8'), None
+
+    writer = CompressedWriter(filepath, compression, level)
+    stream = io.BufferedWriter(writer, buffer_size)
+
+    return (stream if 'b' in mode else io.TextIOWrapper(stream, encoding='utf-8')), writer
@@ -3,6 +3,7 @@ Handles tasks related to file formats. For ex. guessing import and export format
 """
 from DataExporters.data_exporter import RDFExportFormats
 from DataImporters.json_data_importer import ImportFormats
+from utils.compression import strip_compression_extension
 
 
 class FileFormatManager:
@@ -10,9 +11,18 @@ class FileFormatManager:
     ext_to_format = {
         'ttl': 'turtle',
         'xml': 'xml',
+        'rdfb': 'rdfb',
         'json': 'json'
     }
 
+    ext_to_import_format = {
+        'json': ImportFormats.Json,
+        'jsonl': ImportFormats.Json,
+        'xml': ImportFormats.XML,
+        'csv': ImportFormats.Csv,
+        'tsv': ImportFormats.Tsv
+    }
+
     @staticmethod
     def guess_export_format(ex_f_name):
         ex_format = FileFormatManager.__guess_format(ex_f_name)
@@ -23,11 +33,11 @@ class FileFormatManager:
             return RDFExportFormats.Turtle
 
     @staticmethod
-    def __guess_input_format(im_f_name):
-        ip_format = FileFormatManager.__guess_format(im_f_name)
+    def guess_input_format(im_f_name):
+        ip_format = FileFormatManager.__guess_format(strip_compression_extension(im_f_name))
 
-        if ip_format is not None and ip_format in FileFormatManager.ext_to_format:
-            return FileFormatManager.ext_to_format[ip_format]
+        if ip_format is not None and ip_format.lower() in FileFormatManager.ext_to_import_format:
+            return FileFormatManager.ext_to_import_format[ip_format.lower()]
         else:
             return ImportFormats.Json
 
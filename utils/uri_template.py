@@ -0,0 +1,165 @@
+"""
+URI templates such as 'http://twitter.com/{/user/screen_name}/status/{/id_str}' parsed once into literal and variable
+segments so that building a URI is a single join
+"""
+from urllib.parse import quote
+
+from utils.MultilevelDictionary import KeyPath
+
+# characters kept as is when percent-encoding substituted values. Reserved URI delimiters are kept so templates that
+# substitute whole URIs, like '{/entities/media/[*]/expanded_url}', still produce the same URI
+URI_SAFE_CHARACTERS = "!#$%&'()*+,/:;=?@[]~"
+
+
+class UriTemplateException(Exception):
+    pass
+
+
+class UriTemplate:
+    """
+    compiled uri template. The template is split into a list of parts where the literal parts are kept as strings and
+    the variable parts are placeholders filled with the substituted values when a URI is built
+    """
+
+    max_cache_size = 1024
+    __compiled = {}
+
+    def __init__(self, template, encode=False):
+        """
+        parses the uri template into literal and variable segments
+        :param template: the uri template in form 'http://example/com#{/path/var/1}/ex/{/path/var/2}'
+        :param encode: percent-encode the substituted values
+        """
+        self.template = template
+        self.encode = encode
+        self.parts = []
+        self.variable_positions = {}    # variable => list of indices in self.parts
+
+        for is_variable, text in UriTemplate.parse(template):
+            if is_variable:
+                self.variable_positions.setdefault(text, []).append(len(self.parts))
+                self.parts.append('{{{}}}'.format(text))
+            else:
+                self.parts.append(text)
+
+        self.variables = list(self.variable_positions.keys())
+        self.keypaths = [(variable, KeyPath.compile(variable)) for variable in self.variables]
+
+    def __repr__(self):
+        return 'UriTemplate({})'.format(self.template)
+
+    @staticmethod
+    def compile(template, encode=False):
+        """
+        returns the compiled UriTemplate for the passed template string. Compiled templates are cached per process
+        :param template: the uri template string
+        :param encode: percent-encode the substituted values
+        :return: UriTemplate object
+        """
+        key = (template, encode)
+        compiled = UriTemplate.__compiled.get(key)
+
+        if compiled is None:
+            if len(UriTemplate.__compiled) >= UriTemplate.max_cache_size:
+                UriTemplate.__compiled.clear()
+            compiled = UriTemplate(template, encode)
+            UriTemplate.__compiled[key] = compiled
+
+        return compiled
+
+    @staticmethod
+    def parse(template):
+        """
+        splits the uri template into segments. A '{' without a closing '}' is kept as literal text
+        :param template: the uri template string
+        :return: list of tuple(is_variable, text)
+        """
+        segments = []
+        idx = 0
+
+        while idx < len(template):
+            start_index = template.find('{', idx)
+            end_index = template.find('}', start_index) if start_index >= 0 else -1
+
+            if start_index < 0 or end_index < 0:
+                segments.append((False, template[idx:]))
+                break
+
+            if start_index > idx:
+                segments.append((False, template[idx:start_index]))
+            segments.append((True, template[start_index + 1:end_index]))
+            idx = end_index + 1
+
+        return segments
+
+    def expand(self, substitutions):
+        """
+        builds a single URI
+        :param substitutions: dictionary mapping template variable to its value. Variables missing from the dictionary
+        are kept as is in the URI
+        :return: URI string
+        """
+        parts = list(self.parts)
+
+        for variable, value in substitutions.items():
+            positions = self.variable_positions.get(variable)
+            if positions is not None:
+                value = self.__format_value(value)
+                for pos in positions:
+                    parts[pos] = value
+
+        return ''.join(parts)
+
+    def expand_all(self, substitutions, subs_count):
+        """
+        builds subs_count URIs at once. This is used when a template variable references all items of a list with [*]
+        :param substitutions: dictionary mapping template variable to the list of its values {'/path/': ['v1', 'v2']}
+        :param subs_count: the number of URIs to build
+        :return: list of URI strings
+        """
+        if subs_count == 0:
+            return []
+
+        filled = [(self.variable_positions[variable], [self.__format_value(val) for val in values])
+                  for variable, values in substitutions.items() if variable in self.variable_positions]
+        uris = []
+
+        for i in range(subs_count):
+            parts = list(self.parts)
+            for positions, values in filled:
+                for pos in positions:
+                    parts[pos] = values[i]
+            uris.append(''.join(parts))
+
+        return uris
+
+    def build_uris(self, record):
+        """
+        looks up the template variables in the record and builds all the URIs they produce. Every variable must match
+        the same number of values. If any variable has no match, no URI is built
+        :param record: the input record as nested dicts and lists
+        :return: list of URI strings
+        """
+        substitutions = {}
+        subs_count = None
+
+        for variable, keypath in self.keypaths:
+            values = keypath.values(record)
+
+            if len(values) == 0:
+                return []
+            elif subs_count is None or subs_count == len(values):
+                subs_count = len(values)
+            else:
+                raise UriTemplateException('all variables in uri template {} must have the same number of '
+                                           'substitutions'.format(self.template))
+            substitutions[variable] = values
+
+        if subs_count is None:  # templates without variables do not reference the record
+            return []
+
+        return self.expand_all(substitutions, subs_count)
+
+    def __format_value(self, value):
+        value = value if type(value) is str else str(value)
+        return quote(value, safe=URI_SAFE_CHARACTERS) if self.encode else value